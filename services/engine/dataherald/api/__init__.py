@@ -1,6 +1,5 @@
-import io
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List
 
 from fastapi import BackgroundTasks
 
@@ -52,6 +51,11 @@ class API(Component, ABC):
         """Returns the current server time in nanoseconds to check if the server is alive"""
         pass
 
+    @abstractmethod
+    def get_metrics(self) -> dict:
+        """Returns the counters of the caches of the engine"""
+        pass
+
     @abstractmethod
     def scan_db(
         self, scanner_request: ScannerRequest, background_tasks: BackgroundTasks
@@ -135,7 +139,7 @@ class API(Component, ABC):
         pass
 
     @abstractmethod
-    def export_csv_file(self, sql_generation_id: str) -> io.StringIO:
+    def export_csv_file(self, sql_generation_id: str) -> Iterator[str]:
         pass
 
     @abstractmethod
@@ -1,16 +1,16 @@
 import asyncio
 import datetime
-import io
 import json
 import logging
 import os
 import time
 from queue import Queue
-from typing import List
+from typing import Iterator, List
 import re
 
 from bson.objectid import InvalidId, ObjectId
 from fastapi import BackgroundTasks, HTTPException
+from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from overrides import override
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -51,6 +51,7 @@ from dataherald.db_scanner.repository.base import (
 )
 from dataherald.db_scanner.repository.query_history import QueryHistoryRepository
 from dataherald.finetuning.openai_finetuning import OpenAIFineTuning
+from dataherald.finetuning.status_cache import finetuning_status_cache
 from dataherald.repositories.database_connections import (
     DatabaseConnectionNotFoundError,
     DatabaseConnectionRepository,
@@ -66,12 +67,15 @@ from dataherald.repositories.prompts import PromptNotFoundError
 from dataherald.repositories.sql_generations import SQLGenerationNotFoundError
 from dataherald.services.nl_generations import NLGenerationService
 from dataherald.services.prompts import PromptService
+from dataherald.services.table_embeddings import TableEmbeddingService
 from dataherald.services.sql_generations import (
     EmptySQLGenerationError,
     SQLGenerationService,
 )
 from dataherald.services.chat_history import ChatHistoryService
+from dataherald.smart_cache import SmartCache
 from dataherald.sql_database.base import (
+    DBConnections,
     SQLDatabase,
     SQLInjectionError,
 )
@@ -79,6 +83,7 @@ from dataherald.sql_database.models.types import DatabaseConnection
 from dataherald.sql_database.services.database_connection import (
     DatabaseConnectionService,
 )
+from dataherald.sql_generator.connection_context import connection_contexts
 from dataherald.types import (
     BaseLLM,
     CancelFineTuningRequest,
@@ -95,6 +100,7 @@ from dataherald.types import (
     TableDescriptionRequest,
     UpdateInstruction,
 )
+from dataherald.utils.embedding_cache import CachedEmbeddings
 from dataherald.utils.encrypt import FernetEncrypt
 from dataherald.utils.error_codes import error_response, stream_error_response
 from dataherald.utils.sql_utils import (
@@ -105,6 +111,7 @@ from dataherald.utils.sql_utils import (
 logger = logging.getLogger(__name__)
 
 MAX_ROWS_TO_CREATE_CSV_FILE = 50
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-large")
 
 
 def async_scanning(scanner, database, table_descriptions, storage):
@@ -116,6 +123,20 @@ def async_scanning(scanner, database, table_descriptions, storage):
     )
 
 
+def async_table_embeddings(system, storage, db_connection):
+    if system.settings["azure_api_key"] is not None:
+        embedding = AzureOpenAIEmbeddings(
+            azure_api_key=db_connection.decrypt_api_key(), model=EMBEDDING_MODEL
+        )
+    else:
+        embedding = OpenAIEmbeddings(
+            openai_api_key=db_connection.decrypt_api_key(), model=EMBEDDING_MODEL
+        )
+    TableEmbeddingService(storage).refresh(
+        db_connection.id, CachedEmbeddings(embedding, EMBEDDING_MODEL), EMBEDDING_MODEL
+    )
+
+
 def async_fine_tuning(system, storage, model):
     openai_fine_tuning = OpenAIFineTuning(system, storage, model)
     openai_fine_tuning.create_fintuning_dataset()
@@ -132,11 +153,24 @@ class FastAPI(API):
         self.system = system
         self.storage = self.system.instance(DB)
 
+    def invalidate_caches(self, db_connection_id: str) -> None:
+        """Drops the cached generations and agent context of a db connection after it changed"""
+        self.system.instance(SmartCache).invalidate(str(db_connection_id))
+        connection_contexts.invalidate(db_connection_id)
+
     @override
     def heartbeat(self) -> int:
         """Returns the current server time in nanoseconds to check if the server is alive"""
         return int(time.time_ns())
 
+    @override
+    def get_metrics(self) -> dict:
+        """Returns the counters of the caches of the engine"""
+        return {
+            "smart_cache": self.system.instance(SmartCache).metrics(),
+            "db_connections": DBConnections.metrics(),
+        }
+
     @override
     def scan_db(
         self, scanner_request: ScannerRequest, background_tasks: BackgroundTasks
@@ -180,6 +214,10 @@ class FastAPI(API):
                 background_tasks.add_task(
                     async_scanning, scanner, database, table_descriptions, self.storage
                 )
+            background_tasks.add_task(self.invalidate_caches, db_connection_id)
+            background_tasks.add_task(
+                async_table_embeddings, self.system, self.storage, db_connection
+            )
         return [TableDescriptionResponse(**row.dict()) for row in rows]
 
     @override
@@ -234,12 +272,14 @@ class FastAPI(API):
                 data[None] = sql_database.get_tables_and_views()
 
             scanner_repository = TableDescriptionRepository(self.storage)
+            table_descriptions = scanner.refresh_tables(
+                data, str(db_connection.id), scanner_repository
+            )
+            self.invalidate_caches(db_connection.id)
 
             return [
                 TableDescriptionResponse(**record.dict())
-                for record in scanner.refresh_tables(
-                    data, str(db_connection.id), scanner_repository
-                )
+                for record in table_descriptions
             ]
         except Exception as e:
             return error_response(e, refresh_table_description.dict(), "refresh_failed")
@@ -277,9 +317,11 @@ class FastAPI(API):
                 ssh_settings=database_connection_request.ssh_settings,
                 file_storage=database_connection_request.file_storage,
                 metadata=database_connection_request.metadata,
+                sql_validation=database_connection_request.sql_validation,
             )
 
-            sql_database = SQLDatabase.get_sql_engine(db_connection, True)
+            DBConnections.invalidate(db_connection_id)
+            sql_database = SQLDatabase.get_sql_engine(db_connection)
 
             # Get tables and views and create missing table-descriptions as NOT_SCANNED and update DEPRECATED
             scanner_repository = TableDescriptionRepository(self.storage)
@@ -288,6 +330,7 @@ class FastAPI(API):
             tables = sql_database.get_tables_and_views()
             db_connection = db_connection_repository.update(db_connection)
             scanner.refresh_tables(tables, str(db_connection.id), scanner_repository)
+            self.invalidate_caches(db_connection.id)
         except Exception as e:
             # Encrypt sensible values
             fernet_encrypt = FernetEncrypt()
@@ -327,6 +370,10 @@ class FastAPI(API):
             table_description = scanner_repository.update_fields(
                 table, table_description_request
             )
+            TableEmbeddingService(self.storage).invalidate(
+                table.id, table.db_connection_id
+            )
+            self.invalidate_caches(table.db_connection_id)
             return TableDescriptionResponse(**table_description.dict())
         except InvalidColumnNameError as e:
             raise HTTPException(status_code=400, detail=str(e)) from e
@@ -431,6 +478,9 @@ class FastAPI(API):
                 {"items": [row.dict() for row in golden_sqls]},
                 "golden_sql_not_created",
             )
+        db_connection_ids = {golden_sql.db_connection_id for golden_sql in golden_sqls}
+        for db_connection_id in db_connection_ids:
+            self.invalidate_caches(db_connection_id)
         return [GoldenSQLResponse(**golden_sql.dict()) for golden_sql in golden_sqls]
 
     @override
@@ -466,13 +516,11 @@ class FastAPI(API):
         return results[1].get("result", [])
 
     @override
-    def export_csv_file(self, sql_generation_id: str) -> io.StringIO:
+    def export_csv_file(self, sql_generation_id: str) -> Iterator[str]:
         """Exports a SQL query to a CSV file"""
         sql_generation_service = SQLGenerationService(self.system, self.storage)
         try:
-            csv_dataframe = sql_generation_service.create_dataframe(sql_generation_id)
-            csv_stream = io.StringIO()
-            csv_dataframe.to_csv(csv_stream, index=False)
+            csv_stream = sql_generation_service.create_csv_stream(sql_generation_id)
         except SQLGenerationNotFoundError as e:
             raise HTTPException(status_code=404, detail=str(e)) from e
         except SQLInjectionError as e:
@@ -485,8 +533,11 @@ class FastAPI(API):
 
     @override
     def delete_golden_sql(self, golden_sql_id: str) -> dict:
+        golden_sql = GoldenSQLRepository(self.storage).find_by_id(golden_sql_id)
         context_store = self.system.instance(ContextStore)
         status = context_store.remove_golden_sqls([golden_sql_id])
+        if golden_sql:
+            self.invalidate_caches(golden_sql.db_connection_id)
         return {"status": status}
 
     @override
@@ -534,6 +585,7 @@ class FastAPI(API):
                 metadata=instruction_request.metadata,
             )
             instruction = instruction_repository.insert(instruction)
+            self.invalidate_caches(instruction.db_connection_id)
         except Exception as e:
             return error_response(
                 e, instruction_request.dict(), "instruction_not_created"
@@ -562,9 +614,11 @@ class FastAPI(API):
     @override
     def delete_instruction(self, instruction_id: str) -> dict:
         instruction_repository = InstructionRepository(self.storage)
+        instruction = instruction_repository.find_by_id(instruction_id)
         deleted = instruction_repository.delete_by_id(instruction_id)
         if deleted == 0:
             raise HTTPException(status_code=404, detail="Instruction not found")
+        self.invalidate_caches(instruction.db_connection_id)
         return {"status": "success"}
 
     @override
@@ -584,6 +638,7 @@ class FastAPI(API):
             metadata=instruction_request.metadata,
         )
         instruction_repository.update(updated_instruction)
+        self.invalidate_caches(instruction.db_connection_id)
         return InstructionResponse(**updated_instruction.dict())
 
     @override
@@ -679,8 +734,9 @@ class FastAPI(API):
             )
 
         openai_fine_tuning = OpenAIFineTuning(self.system, self.storage, model)
-
-        return openai_fine_tuning.cancel_finetuning_job()
+        model = openai_fine_tuning.cancel_finetuning_job()
+        finetuning_status_cache.put(model)
+        return model
 
     @override
     def get_finetunings(self, db_connection_id: str | None = None) -> list[Finetuning]:
@@ -691,9 +747,12 @@ class FastAPI(API):
         models = model_repository.find_by(query)
         result = []
         for model in models:
-            openai_fine_tuning = OpenAIFineTuning(self.system, self.storage, model)
             result.append(
-                Finetuning(**openai_fine_tuning.retrieve_finetuning_job().dict())
+                Finetuning(
+                    **finetuning_status_cache.get(
+                        self.system, self.storage, model.id
+                    ).dict()
+                )
             )
         return result
 
@@ -701,18 +760,19 @@ class FastAPI(API):
     def delete_finetuning_job(self, finetuning_job_id: str) -> dict:
         model_repository = FinetuningsRepository(self.storage)
         deleted = model_repository.delete_by_id(finetuning_job_id)
+        finetuning_status_cache.invalidate(finetuning_job_id)
         if deleted == 0:
             raise HTTPException(status_code=404, detail="Model not found")
         return {"status": "success"}
 
     @override
     def get_finetuning_job(self, finetuning_job_id: str) -> Finetuning:
-        model_repository = FinetuningsRepository(self.storage)
-        model = model_repository.find_by_id(finetuning_job_id)
+        model = finetuning_status_cache.get(
+            self.system, self.storage, finetuning_job_id
+        )
         if not model:
             raise HTTPException(status_code=404, detail="Model not found")
-        openai_fine_tuning = OpenAIFineTuning(self.system, self.storage, model)
-        return openai_fine_tuning.retrieve_finetuning_job()
+        return model
 
     @override
     def update_finetuning_job(
@@ -723,6 +783,7 @@ class FastAPI(API):
         if not model:
             raise HTTPException(status_code=404, detail="Model not found")
         model.metadata = update_metadata_request.metadata
+        finetuning_status_cache.invalidate(finetuning_job_id)
         return model_repository.update(model)
 
     @override
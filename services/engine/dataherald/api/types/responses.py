@@ -39,6 +39,7 @@ class SQLGenerationResponse(BaseResponse):
     tokens_used: int | None
     confidence_score: float | None
     error: str | None
+    generation_path: str | None
 
     @validator("completed_at", pre=True, always=True)
     def completed_at_as_string(cls, v):
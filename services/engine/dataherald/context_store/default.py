@@ -2,7 +2,6 @@ import logging
 from typing import List, Tuple
 
 from overrides import override
-from sql_metadata import Parser
 
 from dataherald.config import System
 from dataherald.context_store import ContextStore
@@ -12,16 +11,49 @@ from dataherald.repositories.database_connections import (
 )
 from dataherald.repositories.golden_sqls import GoldenSQLRepository
 from dataherald.repositories.instructions import InstructionRepository
+from dataherald.services.lexical_index import golden_sql_lexical_indexes
+from dataherald.sql_database.models.types import DatabaseConnection
+from dataherald.sql_generator.connection_context import connection_contexts
 from dataherald.types import GoldenSQL, GoldenSQLRequest, Prompt
-from dataherald.utils.sql_utils import extract_the_schemas_from_sql
+from dataherald.utils.sql_utils import extract_sql_metadata
 
 logger = logging.getLogger(__name__)
 
+RRF_K = 60
+# The vector store and the lexical index return this many candidates per requested sample
+HYBRID_CANDIDATES_FACTOR = 3
+
 
 class MalformedGoldenSQLError(Exception):
     pass
 
 
+def validate_golden_sql(sql: str, schemas: List[str] | None = None) -> dict:
+    """Returns the tables, schemas and columns of the sql, raises MalformedGoldenSQLError if
+    the sql can't be parsed or uses none of the schemas"""
+    try:
+        sql_metadata = extract_sql_metadata(sql)
+    except Exception as e:
+        raise MalformedGoldenSQLError(
+            f"SQL {sql} is malformed. Please check the syntax."
+        ) from e
+    if schemas:
+        if not any(schema in sql_metadata["schemas"] for schema in schemas):
+            raise MalformedGoldenSQLError(
+                f"SQL {sql} does not contain any of the schemas {schemas}"
+            )
+    return sql_metadata
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> dict:
+    """Scores each id with the sum of 1 / (k + rank) over the rankings it appears in"""
+    scores = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, start=1):
+            scores[id] = scores.get(id, 0) + 1 / (k + rank)
+    return scores
+
+
 class DefaultContextStore(ContextStore):
     def __init__(self, system: System):
         super().__init__(system)
@@ -31,85 +63,127 @@ class DefaultContextStore(ContextStore):
         self, prompt: Prompt, number_of_samples: int = 3
     ) -> Tuple[List[dict] | None, List[dict] | None]:
         logger.info(f"Getting context for {prompt.text}")
+        number_of_candidates = number_of_samples * HYBRID_CANDIDATES_FACTOR
         closest_questions = self.vector_store.query(
             query_texts=[prompt.text],
             db_connection_id=prompt.db_connection_id,
             collection=self.golden_sql_collection,
-            num_results=number_of_samples,
+            num_results=number_of_candidates,
+        )
+        lexical_matches = golden_sql_lexical_indexes.search(
+            self.db, prompt.db_connection_id, prompt.text, number_of_candidates
         )
+        similarities = {
+            str(question["id"]): question["score"] for question in closest_questions
+        }
+        scores = reciprocal_rank_fusion(
+            [
+                [str(question["id"]) for question in closest_questions],
+                [golden_sql.id for golden_sql in lexical_matches],
+            ]
+        )
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:number_of_samples]
 
-        samples = []
-        golden_sqls_repository = GoldenSQLRepository(self.db)
+        # The matches stored with their golden sql don't need to be read from the DB
+        golden_sqls = {
+            golden_sql.id: {
+                "prompt_text": golden_sql.prompt_text,
+                "sql": golden_sql.sql,
+                "tables": golden_sql.tables,
+            }
+            for golden_sql in lexical_matches
+        }
         for question in closest_questions:
-            golden_sql = golden_sqls_repository.find_by_id(question["id"])
-            if golden_sql is not None:
-                samples.append(
-                    {
-                        "prompt_text": golden_sql.prompt_text,
-                        "sql": golden_sql.sql,
-                        "score": question["score"],
-                    }
-                )
+            if "sql" in question:
+                golden_sqls[str(question["id"])] = {
+                    "prompt_text": question["prompt_text"],
+                    "sql": question["sql"],
+                    "tables": question.get("tables"),
+                }
+        missing_ids = [id for id in ranked_ids if id not in golden_sqls]
+        if missing_ids:
+            golden_sqls_repository = GoldenSQLRepository(self.db)
+            for golden_sql in golden_sqls_repository.find_by_ids(missing_ids):
+                golden_sqls[golden_sql.id] = {
+                    "prompt_text": golden_sql.prompt_text,
+                    "sql": golden_sql.sql,
+                    "tables": golden_sql.tables,
+                }
+        samples = [
+            {
+                **golden_sqls[id],
+                "score": scores[id],
+                "similarity": similarities.get(id),
+            }
+            for id in ranked_ids
+            if id in golden_sqls
+        ]
         if len(samples) == 0:
             samples = None
-        instructions = []
-        instruction_repository = InstructionRepository(self.db)
-        all_instructions = instruction_repository.find_all()
-        for instruction in all_instructions:
-            if instruction.db_connection_id == prompt.db_connection_id:
-                instructions.append(
-                    {
-                        "instruction": instruction.instruction,
-                    }
-                )
+        instructions = connection_contexts.get(prompt.db_connection_id).get(
+            ("instructions",), lambda: self.get_instructions(prompt.db_connection_id)
+        )
         if len(instructions) == 0:
             instructions = None
+        else:
+            instructions = list(instructions)
 
         return samples, instructions
 
+    def get_instructions(self, db_connection_id: str) -> List[dict]:
+        instruction_repository = InstructionRepository(self.db)
+        return [
+            {
+                "instruction": instruction.instruction,
+            }
+            for instruction in instruction_repository.find_by_db_connection_id(
+                db_connection_id
+            )
+        ]
+
     @override
     def add_golden_sqls(self, golden_sqls: List[GoldenSQLRequest]) -> List[GoldenSQL]:
         """Creates embeddings of the questions and adds them to the VectorDB. Also adds the golden sqls to the DB"""
-        golden_sqls_repository = GoldenSQLRepository(self.db)
-        db_connection_repository = DatabaseConnectionRepository(self.db)
-        stored_golden_sqls = []
+        db_connections = self.get_db_connections(
+            [record.db_connection_id for record in golden_sqls]
+        )
+        # Every record is validated before storing any of them
+        records = []
         for record in golden_sqls:
-            try:
-                Parser(record.sql).tables  # noqa: B018
-            except Exception as e:
-                raise MalformedGoldenSQLError(
-                    f"SQL {record.sql} is malformed. Please check the syntax."
-                ) from e
-
-            db_connection = db_connection_repository.find_by_id(record.db_connection_id)
-            if not db_connection:
-                raise DatabaseConnectionNotFoundError(
-                    f"Database connection not found, {record.db_connection_id}"
+            sql_metadata = validate_golden_sql(
+                record.sql, db_connections[str(record.db_connection_id)].schemas
+            )
+            records.append(
+                GoldenSQL(
+                    prompt_text=record.prompt_text,
+                    sql=record.sql,
+                    db_connection_id=record.db_connection_id,
+                    metadata=record.metadata,
+                    **sql_metadata,
                 )
-
-            if db_connection.schemas:
-                schema_not_found = True
-                used_schemas = extract_the_schemas_from_sql(record.sql)
-                for schema in db_connection.schemas:
-                    if schema in used_schemas:
-                        schema_not_found = False
-                        break
-                if schema_not_found:
-                    raise MalformedGoldenSQLError(
-                        f"SQL {record.sql} does not contain any of the schemas {db_connection.schemas}"
-                    )
-
-            prompt_text = record.prompt_text
-            golden_sql = GoldenSQL(
-                prompt_text=prompt_text,
-                sql=record.sql,
-                db_connection_id=record.db_connection_id,
-                metadata=record.metadata,
             )
-            stored_golden_sqls.append(golden_sqls_repository.insert(golden_sql))
+        if not records:
+            return []
+        stored_golden_sqls = GoldenSQLRepository(self.db).insert_many(records)
         self.vector_store.add_records(stored_golden_sqls, self.golden_sql_collection)
+        golden_sql_lexical_indexes.add(stored_golden_sqls)
         return stored_golden_sqls
 
+    def get_db_connections(
+        self, db_connection_ids: List[str]
+    ) -> dict[str, DatabaseConnection]:
+        """Reads each db connection once, the golden sqls of a request usually share it"""
+        db_connection_repository = DatabaseConnectionRepository(self.db)
+        db_connections = {}
+        for db_connection_id in {str(id) for id in db_connection_ids}:
+            db_connection = db_connection_repository.find_by_id(db_connection_id)
+            if not db_connection:
+                raise DatabaseConnectionNotFoundError(
+                    f"Database connection not found, {db_connection_id}"
+                )
+            db_connections[db_connection_id] = db_connection
+        return db_connections
+
     @override
     def remove_golden_sqls(self, ids: List) -> bool:
         """Removes the golden sqls from the DB and the VectorDB"""
@@ -121,4 +195,5 @@ class DefaultContextStore(ContextStore):
             deleted = golden_sqls_repository.delete_by_id(id)
             if deleted == 0:
                 logger.warning(f"Golden record with id {id} not found")
+        golden_sql_lexical_indexes.remove(ids)
         return True
@@ -12,6 +12,14 @@ class DB(Component, ABC):
     def insert_one(self, collection: str, obj: dict) -> int:
         pass
 
+    @abstractmethod
+    def insert_many(self, collection: str, objs: list[dict]) -> list:
+        pass
+
+    @abstractmethod
+    def upsert_many(self, collection: str, objs: list[dict]) -> list:
+        pass
+
     @abstractmethod
     def rename(self, old_collection_name: str, new_collection_name) -> None:
         pass
@@ -1,6 +1,6 @@
 from bson.objectid import ObjectId
 from overrides import override
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReplaceOne
 
 from dataherald.config import System
 from dataherald.db import DB
@@ -31,6 +31,24 @@ class MongoDB(DB):
             ("_id", ASCENDING)
         ])
 
+        # Index for the instructions of a db connection, read on every generation
+        self._data_store["instructions"].create_index([("db_connection_id", ASCENDING)])
+
+        # Index for the entity lookups of the DbColumnEntityChecker tool
+        self._data_store["column_entity_indexes"].create_index([
+            ("table_description_id", ASCENDING),
+            ("column_name", ASCENDING)
+        ])
+
+        # Index for the stored embeddings of the tables ranked by the agent tools
+        self._data_store["table_embeddings"].create_index([
+            ("table_description_id", ASCENDING),
+            ("model", ASCENDING)
+        ])
+
+        # Index for loading the golden sqls of a db connection into the lexical index
+        self._data_store["golden_sqls"].create_index([("db_connection_id", ASCENDING)])
+
     @override
     def find_one(self, collection: str, query: dict) -> dict:
         return self._data_store[collection].find_one(query)
@@ -39,6 +57,22 @@ class MongoDB(DB):
     def insert_one(self, collection: str, obj: dict) -> int:
         return self._data_store[collection].insert_one(obj).inserted_id
 
+    @override
+    def insert_many(self, collection: str, objs: list[dict]) -> list:
+        if not objs:
+            return []
+        return self._data_store[collection].insert_many(objs).inserted_ids
+
+    @override
+    def upsert_many(self, collection: str, objs: list[dict]) -> list:
+        """Inserts or replaces the objects by their _id"""
+        if not objs:
+            return []
+        self._data_store[collection].bulk_write(
+            [ReplaceOne({"_id": obj["_id"]}, obj, upsert=True) for obj in objs]
+        )
+        return [obj["_id"] for obj in objs]
+
     @override
     def rename(self, old_collection_name: str, new_collection_name) -> None:
         self._data_store[old_collection_name].rename(new_collection_name)
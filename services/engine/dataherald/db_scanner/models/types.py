@@ -20,6 +20,11 @@ class ColumnDetail(BaseModel):
     foreign_key: ForeignKeyDetail | None
 
 
+class ColumnProfile(BaseModel):
+    distinct_count: int | None
+    categories: list[Any] | None
+
+
 class TableDescriptionStatus(Enum):
     NOT_SCANNED = "NOT_SCANNED"
     SYNCHRONIZING = "SYNCHRONIZING"
@@ -38,6 +43,7 @@ class TableDescription(BaseModel):
     columns: list[ColumnDetail] = []
     examples: list = []
     last_schema_sync: datetime | None
+    schema_fingerprint: str | None
     status: str = TableDescriptionStatus.SCANNED.value
     error_message: str | None
     metadata: dict | None
@@ -50,6 +56,27 @@ class TableDescription(BaseModel):
         return value.replace(tzinfo=timezone.utc)  # Set the timezone to UTC
 
 
+class TableEmbedding(BaseModel):
+    id: str | None
+    table_description_id: str
+    db_connection_id: str
+    model: str
+    representation_hash: str
+    embedding: list[float]
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class ColumnEntityIndex(BaseModel):
+    id: str | None
+    table_description_id: str
+    db_connection_id: str
+    column_name: str
+    values: list[str]
+    # The column has more distinct values than ENTITY_INDEX_MAX_VALUES, only a sample is kept
+    sampled: bool = False
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
 class QueryHistory(BaseModel):
     id: str | None
     db_connection_id: str
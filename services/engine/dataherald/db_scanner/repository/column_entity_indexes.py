@@ -0,0 +1,43 @@
+from dataherald.db_scanner.models.types import ColumnEntityIndex
+
+DB_COLLECTION = "column_entity_indexes"
+
+
+class ColumnEntityIndexRepository:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def save(self, column_entity_index: ColumnEntityIndex) -> ColumnEntityIndex:
+        column_entity_index_dict = column_entity_index.dict(exclude={"id"})
+        column_entity_index.id = str(
+            self.storage.update_or_create(
+                DB_COLLECTION,
+                {
+                    "table_description_id": column_entity_index.table_description_id,
+                    "column_name": column_entity_index.column_name,
+                },
+                column_entity_index_dict,
+            )
+        )
+        return column_entity_index
+
+    def find_by_column(
+        self, table_description_id: str, column_name: str
+    ) -> ColumnEntityIndex | None:
+        row = self.storage.find_one(
+            DB_COLLECTION,
+            {"table_description_id": table_description_id, "column_name": column_name},
+        )
+        if not row:
+            return None
+        row["id"] = str(row["_id"])
+        return ColumnEntityIndex(**row)
+
+    def delete_by_table_description_id(self, table_description_id: str) -> int:
+        rows = self.storage.find(
+            DB_COLLECTION, {"table_description_id": table_description_id}
+        )
+        deleted = 0
+        for row in rows:
+            deleted += self.storage.delete_by_id(DB_COLLECTION, str(row["_id"]))
+        return deleted
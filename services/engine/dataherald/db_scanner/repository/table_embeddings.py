@@ -0,0 +1,44 @@
+from dataherald.db_scanner.models.types import TableEmbedding
+
+DB_COLLECTION = "table_embeddings"
+
+
+class TableEmbeddingRepository:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def save(self, table_embedding: TableEmbedding) -> TableEmbedding:
+        table_embedding_dict = table_embedding.dict(exclude={"id"})
+        table_embedding.id = str(
+            self.storage.update_or_create(
+                DB_COLLECTION,
+                {
+                    "table_description_id": table_embedding.table_description_id,
+                    "model": table_embedding.model,
+                },
+                table_embedding_dict,
+            )
+        )
+        return table_embedding
+
+    def find_by_table_description_ids(
+        self, table_description_ids: list[str], model: str
+    ) -> dict[str, TableEmbedding]:
+        rows = self.storage.find(
+            DB_COLLECTION,
+            {"table_description_id": {"$in": table_description_ids}, "model": model},
+        )
+        result = {}
+        for row in rows:
+            row["id"] = str(row["_id"])
+            result[row["table_description_id"]] = TableEmbedding(**row)
+        return result
+
+    def delete_by_table_description_id(self, table_description_id: str) -> int:
+        rows = self.storage.find(
+            DB_COLLECTION, {"table_description_id": table_description_id}
+        )
+        deleted = 0
+        for row in rows:
+            deleted += self.storage.delete_by_id(DB_COLLECTION, str(row["_id"]))
+        return deleted
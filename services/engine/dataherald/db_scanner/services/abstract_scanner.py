@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.sql_database.base import SQLDatabase
 
 
@@ -12,6 +12,22 @@ class AbstractScanner(ABC):
         """Returns a list if it is a catalog otherwise return None"""
         pass
 
+    @abstractmethod
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        """Returns the approximate distinct count and the categories of the columns of a table
+        using a fixed number of queries"""
+        pass
+
+    @abstractmethod
+    def get_table_stats(
+        self, table: str, db_engine: SQLDatabase, schema: str | None = None
+    ) -> dict | None:
+        """Returns the row count and last modification of a table if the dialect exposes them,
+        the table is looked up in the schema or in the current one when it is None"""
+        pass
+
     @abstractmethod
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str
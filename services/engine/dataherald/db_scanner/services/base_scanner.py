@@ -3,8 +3,11 @@ from overrides import override
 from sqlalchemy.sql import func
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.db_scanner.services.abstract_scanner import AbstractScanner
+from dataherald.db_scanner.services.column_profiler import (
+    profile_distinct_values,
+)
 from dataherald.sql_database.base import SQLDatabase
 
 MIN_CATEGORY_VALUE = 1
@@ -21,6 +24,22 @@ class BaseScanner(AbstractScanner):
             return [str(category[0]) for category in cardinality]
         return None
 
+    @override
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        # Bounded like cardinality_values instead of an exact COUNT(DISTINCT) per column
+        return profile_distinct_values(columns, db_engine)
+
+    @override
+    def get_table_stats(
+        self,
+        table: str,  # noqa: ARG002
+        db_engine: SQLDatabase,  # noqa: ARG002
+        schema: str | None = None,  # noqa: ARG002
+    ) -> dict | None:
+        return None
+
     @override
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str  # noqa: ARG002
@@ -6,8 +6,12 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql import func
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.db_scanner.services.abstract_scanner import AbstractScanner
+from dataherald.db_scanner.services.column_profiler import (
+    build_column_profiles,
+    count_distinct_values,
+)
 from dataherald.sql_database.base import SQLDatabase
 
 MIN_CATEGORY_VALUE = 1
@@ -35,6 +39,34 @@ class BigQueryScanner(AbstractScanner):
 
         return None
 
+    @override
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        distinct_counts = count_distinct_values(
+            columns, db_engine, func.APPROX_COUNT_DISTINCT
+        )
+        return build_column_profiles(columns, db_engine, distinct_counts)
+
+    @override
+    def get_table_stats(
+        self, table: str, db_engine: SQLDatabase, schema: str | None = None
+    ) -> dict | None:
+        # The dataset is an identifier, it can't be a bound parameter
+        dataset = schema or db_engine.engine.url.database
+        if not dataset:
+            return None
+        row = db_engine.engine.execute(
+            sqlalchemy.text(
+                f"SELECT row_count, last_modified_time FROM `{dataset}.__TABLES__` "  # noqa: S608
+                "WHERE table_id = :table"
+            ),
+            table=table,
+        ).first()
+        if not row:
+            return None
+        return {"row_count": row[0], "last_modified": row[1]}
+
     @override
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str
@@ -3,8 +3,12 @@ from overrides import override
 from sqlalchemy.sql import func
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.db_scanner.services.abstract_scanner import AbstractScanner
+from dataherald.db_scanner.services.column_profiler import (
+    build_column_profiles,
+    count_distinct_values,
+)
 from dataherald.sql_database.base import SQLDatabase
 
 MIN_CATEGORY_VALUE = 1
@@ -29,6 +33,29 @@ class ClickHouseScanner(AbstractScanner):
 
         return None
 
+    @override
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        distinct_counts = count_distinct_values(columns, db_engine, func.uniqHLL12)
+        return build_column_profiles(columns, db_engine, distinct_counts)
+
+    @override
+    def get_table_stats(
+        self, table: str, db_engine: SQLDatabase, schema: str | None = None
+    ) -> dict | None:
+        row = db_engine.engine.execute(
+            sqlalchemy.text(
+                "SELECT total_rows, metadata_modification_time FROM system.tables "
+                "WHERE database = coalesce(:schema, currentDatabase()) AND name = :table"
+            ),
+            schema=schema,
+            table=table,
+        ).first()
+        if not row:
+            return None
+        return {"row_count": row[0], "last_modified": str(row[1])}
+
     @override
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str  # noqa: ARG002
@@ -0,0 +1,100 @@
+from typing import Callable
+
+import sqlalchemy
+from sqlalchemy.sql.schema import Column
+
+from dataherald.db_scanner.models.types import ColumnProfile
+from dataherald.sql_database.base import SQLDatabase
+
+MIN_CATEGORY_VALUE = 1
+MAX_CATEGORY_VALUE = 100
+
+
+def count_distinct_values(
+    columns: list[Column], db_engine: SQLDatabase, count_function: Callable
+) -> dict[str, int | None]:
+    """Counts the distinct values of all the columns with a single query"""
+    query = sqlalchemy.select([count_function(column) for column in columns])
+    row = db_engine.engine.execute(query).first()
+    return {
+        column.name: int(row[index]) if row and row[index] is not None else None
+        for index, column in enumerate(columns)
+    }
+
+
+def select_categories(
+    columns: list[Column], db_engine: SQLDatabase
+) -> dict[str, list[str]]:
+    return select_distinct_values(columns, db_engine, MAX_CATEGORY_VALUE + 1)
+
+
+def select_distinct_values(
+    columns: list[Column], db_engine: SQLDatabase, limit: int
+) -> dict[str, list[str]]:
+    """Fetches up to limit distinct values of all the columns with a single UNION ALL query"""
+    selects = []
+    for index, column in enumerate(columns):
+        values = (
+            sqlalchemy.select([column.label("value")])
+            .distinct()
+            .limit(limit)
+            .subquery()
+        )
+        selects.append(
+            sqlalchemy.select(
+                [
+                    sqlalchemy.literal_column(str(index)).label("column_index"),
+                    sqlalchemy.cast(values.c.value, sqlalchemy.String).label("value"),
+                ]
+            )
+        )
+    query = selects[0] if len(selects) == 1 else sqlalchemy.union_all(*selects)
+
+    categories = {column.name: [] for column in columns}
+    for row in db_engine.engine.execute(query).fetchall():
+        categories[columns[int(row[0])].name].append(str(row[1]))
+    return categories
+
+
+def profile_distinct_values(
+    columns: list[Column], db_engine: SQLDatabase
+) -> dict[str, ColumnProfile]:
+    """Profiles the columns from up to MAX_CATEGORY_VALUE + 1 distinct values of each one, the
+    distinct count is only known when there are fewer"""
+    categories = select_categories(columns, db_engine)
+    profiles = {}
+    for column in columns:
+        values = categories[column.name]
+        distinct_count = len(values) if len(values) <= MAX_CATEGORY_VALUE else None
+        profiles[column.name] = ColumnProfile(
+            distinct_count=distinct_count,
+            categories=(
+                values
+                if distinct_count is not None and distinct_count > MIN_CATEGORY_VALUE
+                else None
+            ),
+        )
+    return profiles
+
+
+def build_column_profiles(
+    columns: list[Column],
+    db_engine: SQLDatabase,
+    distinct_counts: dict[str, int | None],
+) -> dict[str, ColumnProfile]:
+    category_columns = [
+        column
+        for column in columns
+        if distinct_counts.get(column.name) is not None
+        and MIN_CATEGORY_VALUE < distinct_counts[column.name] <= MAX_CATEGORY_VALUE
+    ]
+    categories = (
+        select_categories(category_columns, db_engine) if category_columns else {}
+    )
+    return {
+        column.name: ColumnProfile(
+            distinct_count=distinct_counts.get(column.name),
+            categories=categories.get(column.name),
+        )
+        for column in columns
+    }
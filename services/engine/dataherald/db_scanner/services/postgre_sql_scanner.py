@@ -1,7 +1,8 @@
 from overrides import override
+from sqlalchemy import text
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.db_scanner.services.abstract_scanner import AbstractScanner
 from dataherald.sql_database.base import SQLDatabase
 
@@ -23,6 +24,61 @@ class PostgreSqlScanner(AbstractScanner):
             return rs[0]["most_common_vals"]
         return None
 
+    @override
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        if not columns:
+            return {}
+        # The reflected tables have no schema when it is the one of the search path
+        rs = db_engine.engine.execute(
+            text(
+                "SELECT attname, n_distinct, most_common_vals::TEXT::TEXT[] "
+                "FROM pg_catalog.pg_stats "
+                "WHERE schemaname = COALESCE(:schema, current_schema()) "
+                "AND tablename = :table"
+            ),
+            schema=columns[0].table.schema,
+            table=columns[0].table.name,
+        ).fetchall()
+        stats = {row["attname"]: row for row in rs}
+
+        profiles = {}
+        for column in columns:
+            row = stats.get(column.name)
+            if row is None:
+                profiles[column.name] = ColumnProfile()
+                continue
+            distinct_count = int(row["n_distinct"]) if row["n_distinct"] >= 0 else None
+            categories = None
+            if MIN_CATEGORY_VALUE < row["n_distinct"] <= MAX_CATEGORY_VALUE:
+                categories = row["most_common_vals"]
+            profiles[column.name] = ColumnProfile(
+                distinct_count=distinct_count, categories=categories
+            )
+        return profiles
+
+    @override
+    def get_table_stats(
+        self, table: str, db_engine: SQLDatabase, schema: str | None = None
+    ) -> dict | None:
+        row = db_engine.engine.execute(
+            text(
+                "SELECT c.reltuples::BIGINT AS row_count, "
+                "s.n_tup_ins + s.n_tup_upd + s.n_tup_del AS modifications "
+                "FROM pg_catalog.pg_class c "
+                "JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace "
+                "LEFT JOIN pg_catalog.pg_stat_user_tables s ON s.relid = c.oid "
+                "WHERE n.nspname = COALESCE(:schema, current_schema()) "
+                "AND c.relname = :table"
+            ),
+            schema=schema,
+            table=table,
+        ).first()
+        if not row:
+            return None
+        return {"row_count": row[0], "modifications": row[1]}
+
     @override
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str  # noqa: ARG002
@@ -1,9 +1,15 @@
 from overrides import override
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import func
 from sqlalchemy.sql.schema import Column
 
-from dataherald.db_scanner.models.types import QueryHistory
+from dataherald.db_scanner.models.types import ColumnProfile, QueryHistory
 from dataherald.db_scanner.services.abstract_scanner import AbstractScanner
+from dataherald.db_scanner.services.column_profiler import (
+    build_column_profiles,
+    count_distinct_values,
+)
 from dataherald.sql_database.base import SQLDatabase
 
 MIN_CATEGORY_VALUE = 1
@@ -31,6 +37,34 @@ class SqlServerScanner(AbstractScanner):
 
         return None
 
+    @override
+    def profile_columns(
+        self, columns: list[Column], db_engine: SQLDatabase
+    ) -> dict[str, ColumnProfile]:
+        distinct_counts = count_distinct_values(
+            columns, db_engine, func.APPROX_COUNT_DISTINCT
+        )
+        return build_column_profiles(columns, db_engine, distinct_counts)
+
+    @override
+    def get_table_stats(
+        self, table: str, db_engine: SQLDatabase, schema: str | None = None
+    ) -> dict | None:
+        row = db_engine.engine.execute(
+            text(
+                "SELECT SUM(p.rows), MAX(t.modify_date) FROM sys.tables t "
+                "JOIN sys.schemas s ON s.schema_id = t.schema_id "
+                "JOIN sys.partitions p ON p.object_id = t.object_id "
+                "AND p.index_id IN (0, 1) "
+                "WHERE s.name = COALESCE(:schema, SCHEMA_NAME()) AND t.name = :table"
+            ),
+            schema=schema,
+            table=table,
+        ).first()
+        if not row or row[0] is None:
+            return None
+        return {"row_count": row[0], "last_modified": str(row[1])}
+
     @override
     def get_logs(
         self, table: str, db_engine: SQLDatabase, db_connection_id: str  # noqa: ARG002
@@ -1,4 +1,9 @@
+import hashlib
+import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Any, List
 
@@ -6,6 +11,8 @@ import sqlalchemy
 from clickhouse_sqlalchemy import engines
 from overrides import override
 from sqlalchemy import Column, MetaData, Table, inspect
+from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.schema import CreateTable
 from sqlalchemy.sql.sqltypes import NullType
 
@@ -25,15 +32,31 @@ from dataherald.db_scanner.services.postgre_sql_scanner import PostgreSqlScanner
 from dataherald.db_scanner.services.redshift_scanner import RedshiftScanner
 from dataherald.db_scanner.services.snowflake_scanner import SnowflakeScanner
 from dataherald.db_scanner.services.sql_server_scanner import SqlServerScanner
+from dataherald.services.entity_index import EntityIndexService
 from dataherald.sql_database.base import SQLDatabase
 from dataherald.types import ScannerRequest
 
 MIN_CATEGORY_VALUE = 1
 MAX_CATEGORY_VALUE = 60
 MAX_SIZE_LETTERS = 50
+SCANNER_MAX_CONCURRENCY = int(os.getenv("SCANNER_MAX_CONCURRENCY", "4"))
 
 logger = logging.getLogger(__name__)
 
+_connection_semaphores: dict[str, threading.BoundedSemaphore] = {}
+_connection_semaphores_lock = threading.Lock()
+
+
+def get_connection_semaphore(db_connection_id: str) -> threading.BoundedSemaphore:
+    """Caps the number of tables scanned at the same time for a db connection,
+    even when several scans for the same connection are running"""
+    with _connection_semaphores_lock:
+        if db_connection_id not in _connection_semaphores:
+            _connection_semaphores[db_connection_id] = threading.BoundedSemaphore(
+                SCANNER_MAX_CONCURRENCY
+            )
+        return _connection_semaphores[db_connection_id]
+
 
 class SqlAlchemyScanner(Scanner):
     def __init__(self, *args, **kwargs):
@@ -198,12 +221,67 @@ class SqlAlchemyScanner(Scanner):
             low_cardinality=False,
         )
 
+    def get_processed_columns(
+        self,
+        *,
+        meta: MetaData,
+        table: str,
+        columns: list[dict],
+        examples: list[dict],
+        db_engine: SQLDatabase,
+        scanner_service: AbstractScanner,
+    ) -> list[ColumnDetail]:
+        """Profiles all the columns of a table at once, the first example row is used as
+        the sample value of every column"""
+        dynamic_meta_table = meta.tables[table]
+        sample = examples[0] if examples else {}
+        profiled_columns = [
+            dynamic_meta_table.c[column["name"]]
+            for column in columns
+            if len(sample.get(column["name"], "")) <= MAX_SIZE_LETTERS
+        ]
+
+        try:
+            profiles = (
+                scanner_service.profile_columns(profiled_columns, db_engine)
+                if profiled_columns
+                else {}
+            )
+        except Exception as e:
+            logger.warning(
+                f"Profiling query failed for {table}, profiling columns one by one: {str(e)}"
+            )
+            return [
+                self.get_processed_column(
+                    meta=meta,
+                    table=table,
+                    column=column,
+                    db_engine=db_engine,
+                    scanner_service=scanner_service,
+                )
+                for column in columns
+            ]
+
+        table_columns = []
+        for column in columns:
+            profile = profiles.get(column["name"])
+            categories = profile.categories if profile else None
+            table_columns.append(
+                ColumnDetail(
+                    name=column["name"],
+                    data_type=str(column["type"]),
+                    low_cardinality=bool(categories),
+                    categories=categories or None,
+                )
+            )
+        return table_columns
+
     def get_table_schema(
         self, meta: MetaData, db_engine: SQLDatabase, table: str
     ) -> str:
         print(f"Create table schema for: {table}")
 
-        original_table = next((x for x in meta.sorted_tables if x.name == table), None)
+        original_table = meta.tables.get(table)
         if original_table is None:
             raise ValueError(f"Table '{table}' not found in metadata.")
 
@@ -251,6 +329,7 @@ class SqlAlchemyScanner(Scanner):
 
     def scan_single_table(
         self,
+        *,
         meta: MetaData,
         table: str,
         db_engine: SQLDatabase,
@@ -258,9 +337,12 @@ class SqlAlchemyScanner(Scanner):
         repository: TableDescriptionRepository,
         scanner_service: AbstractScanner,
         schema: str | None = None,
+        schema_fingerprint: str | None = None,
+        inspector: Inspector | None = None,
     ) -> TableDescription:
         print(f"Scanning table: {table}")
-        inspector = inspect(db_engine.engine)
+        if inspector is None:
+            inspector = inspect(db_engine.engine)
 
         # # Sanitize table name (ensure it's a str and strip whitespace / control chars)
         # raw_table = table
@@ -284,41 +366,112 @@ class SqlAlchemyScanner(Scanner):
         #     )
         #     return
 
-        table_columns = []
         columns = inspector.get_columns(table_name=table)
         columns = [column for column in columns if column["name"].find(".") < 0]
-
-        for column in columns:
-            print(f"Scanning column: {column['name']}")
-            table_columns.append(
-                self.get_processed_column(
-                    meta=meta,
-                    table=table,
-                    column=column,
-                    db_engine=db_engine,
-                    scanner_service=scanner_service,
-                )
-            )
+        examples = self.get_table_examples(
+            meta=meta, db_engine=db_engine, table=table, rows_number=3
+        )
 
         object = TableDescription(
             db_connection_id=db_connection_id,
             table_name=table,
-            columns=table_columns,
+            columns=self.get_processed_columns(
+                meta=meta,
+                table=table,
+                columns=columns,
+                examples=examples,
+                db_engine=db_engine,
+                scanner_service=scanner_service,
+            ),
             table_schema=self.get_table_schema(
                 meta=meta, db_engine=db_engine, table=table
             ),
-            examples=self.get_table_examples(
-                meta=meta, db_engine=db_engine, table=table, rows_number=3
-            ),
+            examples=examples,
             last_schema_sync=datetime.now(),
+            schema_fingerprint=schema_fingerprint,
             error_message="",
             status=TableDescriptionStatus.SCANNED.value,
             schema_name=schema,
         )
 
         repository.save_table_info(object)
+        try:
+            EntityIndexService(repository.storage).build(
+                object, meta.tables[table], db_engine
+            )
+        except Exception as e:
+            logger.warning(f"Could not build the entity index of {table}: {str(e)}")
         return object
 
+    def get_schema_fingerprint(
+        self,
+        inspector: Inspector,
+        table: str,
+        db_engine: SQLDatabase,
+        scanner_service: AbstractScanner,
+        *,
+        schema: str | None = None,
+    ) -> str:
+        """Hashes the column names and types of a table together with its row count and last
+        modification when the dialect exposes them"""
+        columns = [
+            [column["name"], str(column["type"])]
+            for column in inspector.get_columns(table_name=table)
+        ]
+        try:
+            stats = scanner_service.get_table_stats(table, db_engine, schema)
+        except Exception as e:
+            logger.warning(f"Could not get the stats of table {table}: {str(e)}")
+            stats = None
+        return hashlib.sha256(
+            json.dumps({"columns": columns, "stats": stats}, default=str).encode()
+        ).hexdigest()
+
+    def get_tables_to_scan(
+        self,
+        inspector: Inspector,
+        table_descriptions: list[TableDescription],
+        db_engine: SQLDatabase,
+        repository: TableDescriptionRepository,
+        scanner_service: AbstractScanner,
+    ) -> dict[str, str | None]:
+        """Returns the fingerprint of the tables whose schema or data changed since their last
+        scan, the unchanged tables are set back to SCANNED without being profiled"""
+        tables_to_scan = {}
+        for table in table_descriptions:
+            try:
+                fingerprint = self.get_schema_fingerprint(
+                    inspector,
+                    table.table_name,
+                    db_engine,
+                    scanner_service,
+                    schema=table.schema_name,
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Could not fingerprint table {table.table_name}: {str(e)}"
+                )
+                tables_to_scan[table.table_name] = None
+                continue
+
+            if (
+                table.status == TableDescriptionStatus.SCANNED.value
+                and table.schema_fingerprint == fingerprint
+            ):
+                logger.info(f"Table {table.table_name} is unchanged, skipping it")
+                repository.save_table_info(
+                    TableDescription(
+                        db_connection_id=table.db_connection_id,
+                        table_name=table.table_name,
+                        last_schema_sync=datetime.now(),
+                        status=TableDescriptionStatus.SCANNED.value,
+                        schema_name=table.schema_name,
+                    )
+                )
+            else:
+                tables_to_scan[table.table_name] = fingerprint
+        return tables_to_scan
+
     @override
     def scan(
         self,
@@ -339,11 +492,63 @@ class SqlAlchemyScanner(Scanner):
         if db_engine.engine.dialect.name in services.keys():
             scanner_service = services[db_engine.engine.dialect.name]()
 
-        inspect(db_engine.engine)
+        # The inspector caches the reflected columns, it is shared by all the tables of the scan
+        inspector = inspect(db_engine.engine)
+        tables_to_scan = self.get_tables_to_scan(
+            inspector, table_descriptions, db_engine, repository, scanner_service
+        )
+        table_descriptions = [
+            table for table in table_descriptions if table.table_name in tables_to_scan
+        ]
+        if not table_descriptions:
+            return
+
         meta = MetaData(bind=db_engine.engine)
-        MetaData.reflect(meta, views=True)
+        MetaData.reflect(
+            meta, views=True, only=lambda table, _: table in tables_to_scan
+        )
 
-        for table in table_descriptions:
+        max_workers = self.get_max_workers(db_engine, len(table_descriptions))
+        logger.info(
+            f"Scanning {len(table_descriptions)} tables with {max_workers} workers"
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.scan_table_description,
+                    meta=meta,
+                    table=table,
+                    db_engine=db_engine,
+                    repository=repository,
+                    query_history_repository=query_history_repository,
+                    scanner_service=scanner_service,
+                    schema_fingerprint=tables_to_scan[table.table_name],
+                    inspector=inspector,
+                )
+                for table in table_descriptions
+            ]
+            for scanned, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                logger.info(f"Scan progress: {scanned}/{len(futures)} tables")
+
+    def get_max_workers(self, db_engine: SQLDatabase, tables_number: int) -> int:
+        pool = db_engine.engine.pool
+        pool_size = pool.size() if isinstance(pool, QueuePool) else 1
+        return max(1, min(pool_size, SCANNER_MAX_CONCURRENCY, tables_number))
+
+    def scan_table_description(
+        self,
+        *,
+        meta: MetaData,
+        table: TableDescription,
+        db_engine: SQLDatabase,
+        repository: TableDescriptionRepository,
+        query_history_repository: QueryHistoryRepository,
+        scanner_service: AbstractScanner,
+        schema_fingerprint: str | None = None,
+        inspector: Inspector | None = None,
+    ) -> None:
+        with get_connection_semaphore(str(table.db_connection_id)):
             try:
                 self.scan_single_table(
                     meta=meta,
@@ -353,6 +558,8 @@ class SqlAlchemyScanner(Scanner):
                     repository=repository,
                     scanner_service=scanner_service,
                     schema=table.schema_name,
+                    schema_fingerprint=schema_fingerprint,
+                    inspector=inspector,
                 )
             except Exception as e:
                 logger.error(f"Failed to scan table {table.table_name}: {str(e)}")
@@ -374,5 +581,5 @@ class SqlAlchemyScanner(Scanner):
                     for query in query_history:
                         query_history_repository.insert(query)
 
-            except Exception:  # noqa: S112
-                continue
+            except Exception:  # noqa: S110
+                pass
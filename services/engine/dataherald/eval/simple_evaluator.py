@@ -16,11 +16,10 @@ from sqlalchemy import text
 
 from dataherald.config import System
 from dataherald.db import DB
-from dataherald.db_scanner.models.types import TableDescriptionStatus
-from dataherald.db_scanner.repository.base import TableDescriptionRepository
 from dataherald.eval import Evaluation, Evaluator
 from dataherald.sql_database.base import SQLDatabase, SQLInjectionError
 from dataherald.sql_database.models.types import DatabaseConnection
+from dataherald.sql_generator.connection_context import connection_contexts
 from dataherald.types import Prompt, SQLGeneration
 
 logger = logging.getLogger(__name__)
@@ -118,12 +117,8 @@ class SimpleEvaluator(Evaluator):
             f"(Simple evaluator) Generating score for the question/sql pair: {str(user_prompt.text)}/ {str(sql_generation.sql)}"
         )
         storage = self.system.instance(DB)
-        repository = TableDescriptionRepository(storage)
-        db_scan = repository.get_all_tables_by_db(
-            {
-                "db_connection_id": str(database_connection.id),
-                "status": TableDescriptionStatus.SCANNED.value,
-            }
+        catalog = connection_contexts.get(database_connection.id).get_schema_catalog(
+            storage
         )
         self.llm = self.model.get_model(
             database_connection=database_connection,
@@ -146,10 +141,10 @@ class SimpleEvaluator(Evaluator):
             return Evaluation(
                 question_id=user_prompt.id, answer_id=sql_generation.id, score=0
             )
-        schema = ""
-        for scanned_table in db_scan:
-            if scanned_table.table_name in tables:
-                schema += f"Table: {scanned_table.table_schema}\n"
+        schema = "".join(
+            f"Table: {scanned_table.table_schema}\n"
+            for scanned_table in catalog.get_tables(tables)
+        )
         if sql_generation.status == "INVALID":
             logger.info(
                 f"(Simple evaluator) SQL query: {sql} is not valid. Returning score 0"
@@ -5,12 +5,10 @@ import time
 import uuid
 from typing import Any, List
 
-import numpy as np
 import tiktoken
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from openai import OpenAI
 from overrides import override
-from sql_metadata import Parser
 from tiktoken import Encoding
 
 from dataherald.config import System
@@ -20,9 +18,16 @@ from dataherald.finetuning import FinetuningModel
 from dataherald.repositories.database_connections import DatabaseConnectionRepository
 from dataherald.repositories.finetunings import FinetuningsRepository
 from dataherald.repositories.golden_sqls import GoldenSQLRepository
+from dataherald.services.table_embeddings import (
+    TableEmbeddingService,
+    create_table_representation,
+)
 from dataherald.types import Finetuning, FineTuningStatus
 from dataherald.utils.agent_prompts import FINETUNING_SYSTEM_INFORMATION
+from dataherald.utils.embedding_cache import CachedEmbeddings
 from dataherald.utils.models_context_window import OPENAI_FINETUNING_MODELS_WINDOW_SIZES
+from dataherald.utils.similarity import cosine_similarities, normalize_rows, top_k
+from dataherald.utils.sql_utils import get_golden_sql_tables
 
 FILE_PROCESSING_ATTEMPTS = 20
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL","text-embedding-3-large")
@@ -46,23 +51,21 @@ class OpenAIFineTuning(FinetuningModel):
             fine_tuning_model.db_connection_id
         )
         if self.system.settings["azure_api_key"] is not None:
-            self.embedding = AzureOpenAIEmbeddings(
+            embedding = AzureOpenAIEmbeddings(
                 azure_api_key=db_connection.decrypt_api_key(),
                 model=EMBEDDING_MODEL,
             )
         else:
-            self.embedding = OpenAIEmbeddings(
+            embedding = OpenAIEmbeddings(
                 openai_api_key=db_connection.decrypt_api_key(),
                 model=EMBEDDING_MODEL,
             )
+        self.embedding = CachedEmbeddings(embedding, EMBEDDING_MODEL)
         self.encoding = tiktoken.encoding_for_model(
             fine_tuning_model.base_llm.model_name
         )
         self.client = OpenAI(api_key=db_connection.decrypt_api_key())
 
-    def cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        return round(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)), 4)
-
     @staticmethod
     def map_finetuning_status(status: str) -> str:
         mapped_statuses = {
@@ -136,17 +139,7 @@ class OpenAIFineTuning(FinetuningModel):
         return table_representation
 
     def create_table_representation(self, table: TableDescription) -> str:
-        col_rep = ""
-        for column in table.columns:
-            if column.description is not None:
-                col_rep += f"{column.name}: {column.description}, "
-            else:
-                col_rep += f"{column.name}, "
-        if table.description is not None:
-            table_rep = f"Table {table.table_name} contain columns: [{col_rep}], this tables has: {table.description}"
-        else:
-            table_rep = f"Table {table.table_name} contain columns: [{col_rep}]"
-        return table_rep
+        return create_table_representation(table)
 
     def sort_tables(
         self,
@@ -154,15 +147,10 @@ class OpenAIFineTuning(FinetuningModel):
         table_embeddings: List[List[float]],
         prompt: str,
     ) -> List[TableDescription]:
-        tables_with_similarity = []
-        prompt_embedding = self.embedding.embed_query(prompt)
-        similarities = np.dot(table_embeddings, prompt_embedding) / (
-            np.linalg.norm(table_embeddings) * np.linalg.norm(prompt_embedding)
+        similarities = cosine_similarities(
+            normalize_rows(table_embeddings), self.embedding.embed_query(prompt)
         )
-        for i in range(len(tables)):
-            tables_with_similarity.append((tables[i], similarities[i]))
-        tables_with_similarity.sort(key=lambda x: x[1], reverse=True)
-        return [table[0] for table in tables_with_similarity]
+        return [tables[index] for index in top_k(similarities, len(tables))]
 
     def format_dataset(
         self,
@@ -217,10 +205,9 @@ class OpenAIFineTuning(FinetuningModel):
         model_repository = FinetuningsRepository(self.storage)
         model = model_repository.find_by_id(self.fine_tuning_model.id)
         results = []
-        table_representations = []
-        for table in db_scan:
-            table_representations.append(self.create_table_representation(table))
-        table_embeddings = self.embedding.embed_documents(table_representations)
+        table_embeddings = TableEmbeddingService(self.storage).get_embeddings(
+            db_scan, self.embedding, EMBEDDING_MODEL
+        )
         for index, golden_sql_id in enumerate(self.fine_tuning_model.golden_sqls):
             logger.info(
                 f"Processing golden sql {index + 1} of {len(self.fine_tuning_model.golden_sqls)}"
@@ -229,7 +216,7 @@ class OpenAIFineTuning(FinetuningModel):
             question = golden_sql.prompt_text
             query = golden_sql.sql
             margin_tokens = len(self.encoding.encode(question + query)) + 100
-            correct_tables_unformatted = Parser(query).tables
+            correct_tables_unformatted = get_golden_sql_tables(golden_sql)
             correct_tables = []
             for table in correct_tables_unformatted:
                 correct_tables.append(table.split(".")[-1])
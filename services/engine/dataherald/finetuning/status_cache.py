@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+import time
+
+from dataherald.config import System
+from dataherald.finetuning.openai_finetuning import OpenAIFineTuning
+from dataherald.repositories.finetunings import FinetuningsRepository
+from dataherald.types import Finetuning, FineTuningStatus
+
+logger = logging.getLogger(__name__)
+
+FINETUNING_STATUS_REFRESH_INTERVAL = int(
+    os.getenv("FINETUNING_STATUS_REFRESH_INTERVAL", "60")
+)
+TERMINAL_STATUSES = [
+    FineTuningStatus.SUCCEEDED.value,
+    FineTuningStatus.FAILED.value,
+    FineTuningStatus.CANCELLED.value,
+]
+
+
+class FinetuningStatusCache:
+    """Keeps the finetuning jobs in memory so the agents don't call the provider on every question.
+
+    A job in a terminal status never changes again so it is served from memory, the jobs still in
+    progress are refreshed from the provider by a background thread every
+    FINETUNING_STATUS_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, refresh_interval: int = FINETUNING_STATUS_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.finetunings = {}
+        self.lock = threading.Lock()
+        self.refresh_thread = None
+        self.system = None
+        self.storage = None
+
+    def get(self, system: System, storage, finetuning_id: str) -> Finetuning | None:
+        with self.lock:
+            finetuning = self.finetunings.get(finetuning_id)
+        if finetuning is not None:
+            return finetuning
+        finetuning = FinetuningsRepository(storage).find_by_id(finetuning_id)
+        if finetuning is None:
+            return None
+        if finetuning.status not in TERMINAL_STATUSES:
+            finetuning = self.retrieve(system, storage, finetuning)
+        self.put(finetuning)
+        if finetuning.status not in TERMINAL_STATUSES:
+            self.start_refresh(system, storage)
+        return finetuning
+
+    def put(self, finetuning: Finetuning):
+        with self.lock:
+            self.finetunings[finetuning.id] = finetuning
+
+    def invalidate(self, finetuning_id: str):
+        with self.lock:
+            self.finetunings.pop(finetuning_id, None)
+
+    def retrieve(self, system: System, storage, finetuning: Finetuning) -> Finetuning:
+        return OpenAIFineTuning(system, storage, finetuning).retrieve_finetuning_job()
+
+    def start_refresh(self, system: System, storage):
+        with self.lock:
+            self.system = system
+            self.storage = storage
+            if self.refresh_thread is None:
+                self.refresh_thread = threading.Thread(target=self.refresh, daemon=True)
+                self.refresh_thread.start()
+
+    def refresh(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self.lock:
+                in_progress = [
+                    finetuning
+                    for finetuning in self.finetunings.values()
+                    if finetuning.status not in TERMINAL_STATUSES
+                ]
+                if not in_progress:
+                    self.refresh_thread = None
+                    return
+            for finetuning in in_progress:
+                try:
+                    refreshed = self.retrieve(self.system, self.storage, finetuning)
+                    with self.lock:
+                        # Skip the jobs deleted while they were being refreshed
+                        if refreshed.id in self.finetunings:
+                            self.finetunings[refreshed.id] = refreshed
+                except Exception as e:
+                    logger.warning(
+                        f"Unable to refresh the finetuning {finetuning.id}: {str(e)}"
+                    )
+
+
+finetuning_status_cache = FinetuningStatusCache()
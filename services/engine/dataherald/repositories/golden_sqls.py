@@ -19,6 +19,29 @@ class GoldenSQLRepository:
         golden_sql.id = str(self.storage.insert_one(DB_COLLECTION, golden_sql_dict))
         return golden_sql
 
+    def insert_many(self, golden_sqls: list[GoldenSQL]) -> list[GoldenSQL]:
+        """Inserts the golden sqls, the ones with an id are stored with it"""
+        ids = self.storage.insert_many(
+            DB_COLLECTION, [self.to_document(golden_sql) for golden_sql in golden_sqls]
+        )
+        for golden_sql, id in zip(golden_sqls, ids, strict=True):
+            golden_sql.id = str(id)
+        return golden_sqls
+
+    def upsert_many(self, golden_sqls: list[GoldenSQL]) -> list[GoldenSQL]:
+        """Inserts the golden sqls or replaces the ones already stored with the same id"""
+        self.storage.upsert_many(
+            DB_COLLECTION, [self.to_document(golden_sql) for golden_sql in golden_sqls]
+        )
+        return golden_sqls
+
+    def to_document(self, golden_sql: GoldenSQL) -> dict:
+        golden_sql_dict = golden_sql.dict(exclude={"id"})
+        golden_sql_dict["db_connection_id"] = str(golden_sql.db_connection_id)
+        if golden_sql.id is not None:
+            golden_sql_dict["_id"] = ObjectId(golden_sql.id)
+        return golden_sql_dict
+
     def find_one(self, query: dict) -> GoldenSQL | None:
         row = self.storage.find_one(DB_COLLECTION, query)
         if not row:
@@ -46,6 +69,19 @@ class GoldenSQLRepository:
         row["db_connection_id"] = str(row["db_connection_id"])
         return GoldenSQL(**row)
 
+    def find_by_ids(self, ids: list[str]) -> list[GoldenSQL]:
+        """Reads the golden sqls with a single query and returns them in the order of the ids"""
+        object_ids = [ObjectId(id) for id in ids if ObjectId.is_valid(id)]
+        if not object_ids:
+            return []
+        rows = self.storage.find(DB_COLLECTION, {"_id": {"$in": object_ids}})
+        golden_sqls = {}
+        for row in rows:
+            row["id"] = str(row["_id"])
+            row["db_connection_id"] = str(row["db_connection_id"])
+            golden_sqls[row["id"]] = GoldenSQL(**row)
+        return [golden_sqls[id] for id in ids if id in golden_sqls]
+
     def find_by(self, query: dict, page: int = 1, limit: int = 10) -> list[GoldenSQL]:
         rows = self.storage.find(DB_COLLECTION, query, page=page, limit=limit)
         golden_sqls = []
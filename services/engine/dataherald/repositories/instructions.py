@@ -52,6 +52,11 @@ class InstructionRepository:
             result.append(Instruction(**row))
         return result
 
+    def find_by_db_connection_id(self, db_connection_id: str) -> list[Instruction]:
+        return self.find_by(
+            {"db_connection_id": str(db_connection_id)}, page=0, limit=0
+        )
+
     def find_all(self, page: int = 0, limit: int = 0) -> list[Instruction]:
         rows = self.storage.find_all(DB_COLLECTION, page=page, limit=limit)
         result = []
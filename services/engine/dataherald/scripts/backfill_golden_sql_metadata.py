@@ -0,0 +1,33 @@
+"""Stores the tables, schemas and columns on the golden sqls saved before they were parsed at
+insert time.
+
+    python3 -m dataherald.scripts.backfill_golden_sql_metadata
+"""
+
+import dataherald.config
+from dataherald.config import System
+from dataherald.db import DB
+from dataherald.repositories.golden_sqls import DB_COLLECTION
+from dataherald.utils.sql_utils import extract_sql_metadata
+
+if __name__ == "__main__":
+    settings = dataherald.config.Settings()
+    system = System(settings)
+    system.start()
+    storage = system.instance(DB)
+
+    updated = 0
+    skipped = 0
+    # Matches the golden sqls without the field and the ones where it is null
+    for golden_sql in storage.find(DB_COLLECTION, {"tables": None}):
+        try:
+            sql_metadata = extract_sql_metadata(golden_sql["sql"])
+        except Exception as e:
+            print(f"Skipping golden sql {golden_sql['_id']}: {str(e)}")
+            skipped += 1
+            continue
+        storage.update_or_create(
+            DB_COLLECTION, {"_id": golden_sql["_id"]}, sql_metadata
+        )
+        updated += 1
+    print(f"Golden sqls updated: {updated}, skipped: {skipped}")
@@ -0,0 +1,254 @@
+"""Imports a large JSONL file of golden sqls, one GoldenSQLRequest per line.
+
+    python3 -m dataherald.scripts.ingest_golden_sqls golden_sqls.jsonl
+
+The sqls are validated in a process pool, each batch is written to Mongo with a single
+insert_many and embedded and upserted into the vector store at once. The progress is saved
+in a checkpoint file after every batch, running the same command again resumes the import.
+The ids of a batch are saved as pending before it is written, so resuming an interrupted
+batch upserts the same golden sqls instead of inserting them twice.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from bson.objectid import ObjectId
+
+import dataherald.config
+from dataherald.config import System
+from dataherald.context_store.default import validate_golden_sql
+from dataherald.db import DB
+from dataherald.repositories.database_connections import DatabaseConnectionRepository
+from dataherald.repositories.golden_sqls import GoldenSQLRepository
+from dataherald.types import GoldenSQL, GoldenSQLRequest
+from dataherald.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+def check_golden_sql(sql: str, schemas: List[str] | None) -> tuple:
+    """Returns the tables, schemas and columns of the sql or the validation error"""
+    try:
+        return validate_golden_sql(sql, schemas), None
+    except Exception as e:
+        return None, str(e)
+
+
+def load_checkpoint(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as file:
+            return json.load(file)
+    return {"line": 0, "stored": 0, "skipped": 0, "pending": {}, "pending_line": 0}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    # Written to a temporary file first so an interrupted write never loses the progress
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def add_pending_records(  # noqa: PLR0917
+    path: str,
+    storage: DB,
+    vector_store: VectorStore,
+    collection: str,
+    pool: ProcessPoolExecutor,
+    workers: int,
+    checkpoint: dict,
+):
+    """Finishes the interrupted batch, its golden sqls are upserted with the ids saved as
+    pending and their vectors are written again"""
+    pending = checkpoint["pending"]
+    with open(path) as file:
+        lines = [
+            (line_number, line)
+            for line_number, line in enumerate(file, start=1)
+            if str(line_number) in pending
+        ]
+    golden_sqls = []
+    for line_number, golden_sql in validate_batch(lines, storage, pool, workers, {}):
+        golden_sql.id = pending[str(line_number)]
+        golden_sqls.append(golden_sql)
+    GoldenSQLRepository(storage).upsert_many(golden_sqls)
+    for golden_sql in golden_sqls:
+        try:
+            vector_store.delete_record(collection, golden_sql.id)
+        except Exception:  # noqa: S110
+            pass
+    if golden_sqls:
+        vector_store.add_records(golden_sqls, collection)
+    checkpoint["stored"] += len(golden_sqls)
+    checkpoint["line"] = checkpoint["pending_line"]
+    checkpoint["pending"] = {}
+
+
+def parse_batch(lines: List[tuple], storage: DB, db_connections: dict) -> List[tuple]:
+    records = []
+    db_connection_repository = DatabaseConnectionRepository(storage)
+    for line_number, line in lines:
+        try:
+            record = GoldenSQLRequest(**json.loads(line))
+        except Exception as e:
+            logger.warning(f"Skipping line {line_number}: {str(e)}")
+            continue
+        db_connection_id = str(record.db_connection_id)
+        if db_connection_id not in db_connections:
+            db_connections[db_connection_id] = db_connection_repository.find_by_id(
+                db_connection_id
+            )
+        if db_connections[db_connection_id] is None:
+            logger.warning(
+                f"Skipping line {line_number}: database connection {db_connection_id} not found"
+            )
+            continue
+        records.append((line_number, record, db_connections[db_connection_id].schemas))
+    return records
+
+
+def validate_batch(
+    lines: List[tuple],
+    storage: DB,
+    pool: ProcessPoolExecutor,
+    workers: int,
+    db_connections: dict,
+) -> List[tuple]:
+    """Returns the line number and the golden sql of the valid lines"""
+    records = parse_batch(lines, storage, db_connections)
+    results = pool.map(
+        check_golden_sql,
+        [record.sql for _, record, _ in records],
+        [schemas for _, _, schemas in records],
+        chunksize=max(1, len(records) // (workers * 4)),
+    )
+    golden_sqls = []
+    for (line_number, record, _), (sql_metadata, error) in zip(
+        records, results, strict=True
+    ):
+        if error is not None:
+            logger.warning(f"Skipping line {line_number}: {error}")
+            continue
+        golden_sqls.append(
+            (
+                line_number,
+                GoldenSQL(
+                    prompt_text=record.prompt_text,
+                    sql=record.sql,
+                    db_connection_id=record.db_connection_id,
+                    metadata=record.metadata,
+                    **sql_metadata,
+                ),
+            )
+        )
+    return golden_sqls
+
+
+def read_batches(path: str, start_line: int, batch_size: int):
+    """Yields the number of the last line read and the (line number, line) of the batch"""
+    with open(path) as file:
+        batch = []
+        for line_number, line in enumerate(file, start=1):
+            if line_number <= start_line or not line.strip():
+                continue
+            batch.append((line_number, line))
+            if len(batch) == batch_size:
+                yield line_number, batch
+                batch = []
+        if batch:
+            yield line_number, batch
+
+
+def ingest(
+    path: str,
+    *,
+    storage: DB,
+    vector_store: VectorStore,
+    collection: str,
+    pool: ProcessPoolExecutor,
+    workers: int,
+    batch_size: int,
+    checkpoint_path: str,
+) -> dict:
+    """Imports the lines after the checkpoint and returns the final checkpoint, an
+    interrupted batch is finished first"""
+    checkpoint = load_checkpoint(checkpoint_path)
+    with open(path) as file:
+        total_lines = sum(1 for _ in file)
+
+    if checkpoint["pending"]:
+        logger.info(f"Resuming the batch ending at line {checkpoint['pending_line']}")
+        add_pending_records(
+            path, storage, vector_store, collection, pool, workers, checkpoint
+        )
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    db_connections = {}
+    start = time.monotonic()
+    start_line = checkpoint["line"]
+    for end_line, lines in read_batches(path, start_line, batch_size):
+        records = validate_batch(lines, storage, pool, workers, db_connections)
+        for _, golden_sql in records:
+            golden_sql.id = str(ObjectId())
+        golden_sqls = [golden_sql for _, golden_sql in records]
+        checkpoint["skipped"] += len(lines) - len(golden_sqls)
+        checkpoint["pending"] = {
+            str(line_number): golden_sql.id for line_number, golden_sql in records
+        }
+        checkpoint["pending_line"] = end_line
+        save_checkpoint(checkpoint_path, checkpoint)
+        if golden_sqls:
+            GoldenSQLRepository(storage).insert_many(golden_sqls)
+            vector_store.add_records(golden_sqls, collection)
+        checkpoint["stored"] += len(golden_sqls)
+        checkpoint["line"] = end_line
+        checkpoint["pending"] = {}
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        elapsed = time.monotonic() - start
+        rate = (end_line - start_line) / elapsed if elapsed > 0 else 0
+        remaining = (total_lines - end_line) / rate if rate > 0 else 0
+        logger.info(
+            f"{end_line}/{total_lines} lines, {checkpoint['stored']} stored, "
+            f"{checkpoint['skipped']} skipped, {rate:.0f} lines/s, "
+            f"{remaining:.0f}s remaining"
+        )
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import of golden sqls")
+    parser.add_argument("path", help="JSONL file with a golden sql per line")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--checkpoint", help="Progress file, defaults to <path>.checkpoint"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    settings = dataherald.config.Settings()
+    system = System(settings)
+    system.start()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        checkpoint = ingest(
+            args.path,
+            storage=system.instance(DB),
+            vector_store=system.instance(VectorStore),
+            collection=os.environ.get("GOLDEN_SQL_COLLECTION", "ai-stage"),
+            pool=pool,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            checkpoint_path=args.checkpoint or f"{args.path}.checkpoint",
+        )
+    logger.info(
+        f"Imported {checkpoint['stored']} golden sqls, {checkpoint['skipped']} skipped"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,7 @@ from dataherald.api.types.responses import (
     SaveChatMessageResponse,
 )
 from dataherald.config import Settings
+from dataherald.server.fastapi.executor import BlockingExecutor
 from dataherald.db_scanner.models.types import QueryHistory
 from dataherald.sql_database.models.types import DatabaseConnection
 from dataherald.services.chat_history import ChatHistoryService
@@ -65,6 +66,7 @@ def use_route_names_as_operation_ids(app: _FastAPI) -> None:
 
 
 API_KEY = os.getenv("API_KEY", "")
+SQL_GENERATION_TIMEOUT = int(os.getenv("DH_ENGINE_TIMEOUT", "150"))
 API_KEY_NAME = "X-OpenAI-Key"
 apikey_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
@@ -103,6 +105,7 @@ class FastAPI(dataherald.server.Server):
         )
 
         self._api: dataherald.api.API = dataherald.client(settings)
+        self.executor = BlockingExecutor()
 
         self.router = fastapi.APIRouter(dependencies=[Depends(verify_api_key)])
 
@@ -416,6 +419,10 @@ class FastAPI(dataherald.server.Server):
             "/api/v1/heartbeat", self.heartbeat, methods=["GET"], tags=["System"]
         )
 
+        self.router.add_api_route(
+            "/api/v1/metrics", self.get_metrics, methods=["GET"], tags=["System"]
+        )
+
         self.router.add_api_route(
             "/api/v1/chat/store",
             self.store_chat_message,
@@ -478,15 +485,24 @@ class FastAPI(dataherald.server.Server):
     def get_prompts(self, db_connection_id: str | None = None) -> list[PromptResponse]:
         return self._api.get_prompts(db_connection_id)
 
-    def create_sql_generation(
+    async def create_sql_generation(
         self, prompt_id: str, sql_generation_request: SQLGenerationRequest
     ) -> SQLGenerationResponse:
-        return self._api.create_sql_generation(prompt_id, sql_generation_request)
+        return await self.executor.run(
+            self._api.create_sql_generation,
+            prompt_id,
+            sql_generation_request,
+            timeout=SQL_GENERATION_TIMEOUT,
+        )
 
-    def create_prompt_and_sql_generation(
+    async def create_prompt_and_sql_generation(
         self, prompt_sql_generation_request: PromptSQLGenerationRequest
     ) -> SQLGenerationResponse:
-        return self._api.create_prompt_and_sql_generation(prompt_sql_generation_request)
+        return await self.executor.run(
+            self._api.create_prompt_and_sql_generation,
+            prompt_sql_generation_request,
+            timeout=SQL_GENERATION_TIMEOUT,
+        )
 
     def get_sql_generations(
         self, prompt_id: str | None = None
@@ -503,24 +519,33 @@ class FastAPI(dataherald.server.Server):
             sql_generation_id, update_metadata_request
         )
 
-    def create_nl_generation(
+    async def create_nl_generation(
         self, sql_generation_id: str, nl_generation_request: NLGenerationRequest
     ) -> NLGenerationResponse:
-        return self._api.create_nl_generation(sql_generation_id, nl_generation_request)
+        return await self.executor.run(
+            self._api.create_nl_generation,
+            sql_generation_id,
+            nl_generation_request,
+        )
 
-    def create_sql_and_nl_generation(
+    async def create_sql_and_nl_generation(
         self,
         prompt_id: str,
         nl_generation_sql_generation_request: NLGenerationsSQLGenerationRequest,
     ) -> NLGenerationResponse:
-        return self._api.create_sql_and_nl_generation(
-            prompt_id, nl_generation_sql_generation_request
+        return await self.executor.run(
+            self._api.create_sql_and_nl_generation,
+            prompt_id,
+            nl_generation_sql_generation_request,
         )
 
-    def create_prompt_sql_and_nl_generation(
+    async def create_prompt_sql_and_nl_generation(
         self, request: PromptSQLGenerationNLGenerationRequest
     ) -> NLGenerationResponse:
-        return self._api.create_prompt_sql_and_nl_generation(request)
+        return await self.executor.run(
+            self._api.create_prompt_sql_and_nl_generation,
+            request,
+        )
 
     def get_nl_generations(
         self, sql_generation_id: str | None = None
@@ -541,6 +566,10 @@ class FastAPI(dataherald.server.Server):
     def heartbeat(self) -> dict[str, int]:
         return self.root()
 
+    def get_metrics(self) -> dict:
+        """Returns the hit, miss and eviction counters of the caches"""
+        return self._api.get_metrics()
+
     def create_database_connection(
         self, database_connection_request: DatabaseConnectionRequest
     ) -> DatabaseConnectionResponse:
@@ -587,22 +616,33 @@ class FastAPI(dataherald.server.Server):
         """Get description"""
         return self._api.get_query_history(db_connection_id)
 
-    def execute_sql_query(self, sql_generation_id: str, max_rows: int = 100) -> list:
+    async def execute_sql_query(
+        self, sql_generation_id: str, max_rows: int = 100
+    ) -> list:
         """Executes a query on the given db_connection_id"""
-        return self._api.execute_sql_query(sql_generation_id, max_rows)
+        return await self.executor.run(
+            self._api.execute_sql_query,
+            sql_generation_id,
+            max_rows,
+        )
 
-    def execute_invoice_query(self, supplier_name: str, start_date:str, end_date:str, max_rows: int = 100) -> list:
+    async def execute_invoice_query(self, supplier_name: str, start_date:str, end_date:str, max_rows: int = 100) -> list:
         """
         Executes a default invoice query for a given supplier_name.
         """
-        return self._api.execute_invoice_query(supplier_name, start_date, end_date, max_rows)
+        return await self.executor.run(
+            self._api.execute_invoice_query,
+            supplier_name,
+            start_date,
+            end_date,
+            max_rows,
+        )
 
     def export_csv_file(self, sql_generation_id: str) -> StreamingResponse:
         """Exports a CSV file for the given sql_generation_id"""
         stream = self._api.export_csv_file(sql_generation_id)
 
-        response = StreamingResponse(
-            iter([stream.getvalue()]), media_type="text/csv")
+        response = StreamingResponse(stream, media_type="text/csv")
         response.headers["Content-Disposition"] = (
             f"attachment; filename=sql_generation_{sql_generation_id}.csv"
         )
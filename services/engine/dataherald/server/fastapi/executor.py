@@ -0,0 +1,74 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from dataherald.sql_database.base import DBConnections
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "32"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "128"))
+
+
+class BlockingExecutor:
+    """Runs the blocking Mongo, SQLAlchemy and LLM calls of the async routes in a shared thread pool.
+
+    Requests above MAX_CONCURRENT_REQUESTS, counting the running and the waiting ones, are
+    rejected with a 429 instead of queueing without bound. Each request runs in a
+    DBConnections.request_scope, so a db connection can't run more than
+    MAX_CONCURRENT_REQUESTS_PER_DB_CONNECTION requests at once and starve the others.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = BLOCKING_EXECUTOR_WORKERS,
+        max_requests: int = MAX_CONCURRENT_REQUESTS,
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="blocking"
+        )
+        self.max_requests = max_requests
+        self.requests = 0
+
+    async def run(
+        self, func: Callable, *args, timeout: float | None = None, **kwargs
+    ) -> Any:
+        """Runs the function in the thread pool, raises a 504 when it doesn't finish within
+        timeout seconds. The thread can't be interrupted, it keeps its slot until it returns
+        """
+        if self.requests >= self.max_requests:
+            logger.warning(f"Rejecting request, {self.requests} requests in progress")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests in progress, retry later",
+            )
+        self.requests += 1
+        try:
+            return await asyncio.wait_for(
+                self.run_blocking(self.run_in_request_scope, func, *args, **kwargs),
+                timeout,
+            )
+        except asyncio.TimeoutError as e:
+            logger.warning(f"Request {func.__name__} timed out after {timeout} seconds")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Request timed out after {timeout} seconds",
+            ) from e
+        finally:
+            self.requests -= 1
+
+    async def run_blocking(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    @staticmethod
+    def run_in_request_scope(func: Callable, *args, **kwargs) -> Any:
+        with DBConnections.request_scope():
+            return func(*args, **kwargs)
@@ -0,0 +1,122 @@
+import difflib
+import logging
+import os
+from collections import Counter
+
+import sqlalchemy
+from sqlalchemy import Table
+
+from dataherald.db_scanner.models.types import ColumnEntityIndex, TableDescription
+from dataherald.db_scanner.repository.column_entity_indexes import (
+    ColumnEntityIndexRepository,
+)
+from dataherald.db_scanner.services.column_profiler import select_distinct_values
+from dataherald.sql_database.base import SQLDatabase
+
+logger = logging.getLogger(__name__)
+
+ENTITY_INDEX_MAX_VALUES = int(os.getenv("ENTITY_INDEX_MAX_VALUES", "10000"))
+MAX_ENTITY_LENGTH = 200
+# Values sharing the most trigrams with the entity which are scored with difflib
+MAX_CANDIDATES = 200
+
+
+def trigrams(value: str) -> set[str]:
+    padded = f"  {value.strip().lower()} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+class EntityIndex:
+    """Trigram inverted index of the distinct values of a column, or of a sample of them"""
+
+    def __init__(self, values: list[str], sampled: bool = False):
+        self.values = values
+        self.sampled = sampled
+        self.postings = {}
+        self.sizes = []
+        for position, value in enumerate(values):
+            value_trigrams = trigrams(value)
+            self.sizes.append(len(value_trigrams))
+            for trigram in value_trigrams:
+                self.postings.setdefault(trigram, []).append(position)
+
+    def candidates(self, entity: str, limit: int = MAX_CANDIDATES) -> list[int]:
+        """Returns the positions of the values with the highest trigram similarity"""
+        entity_trigrams = trigrams(entity)
+        shared = Counter()
+        for trigram in entity_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        scores = {
+            position: 2 * count / (len(entity_trigrams) + self.sizes[position])
+            for position, count in shared.items()
+        }
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+    def search(self, entity: str, threshold: float = 0.4, limit: int = 25) -> list[str]:
+        """Returns the values similar to the entity followed by the values containing it"""
+        target = entity.strip().lower()
+        similar = []
+        containing = []
+        for position in self.candidates(entity):
+            value = self.values[position].strip()
+            similarity = difflib.SequenceMatcher(None, value.lower(), target).ratio()
+            if similarity >= threshold:
+                similar.append((value, similarity))
+            elif target in value.lower():
+                containing.append(value)
+        similar.sort(key=lambda item: item[1], reverse=True)
+        return [value for value, _ in similar[:limit]] + containing[:limit]
+
+
+class EntityIndexService:
+    def __init__(self, storage):
+        self.storage = storage
+        self.repository = ColumnEntityIndexRepository(storage)
+
+    def build(
+        self, table_description: TableDescription, table: Table, db_engine: SQLDatabase
+    ):
+        """Stores the distinct values of the text columns, the columns with more than
+        ENTITY_INDEX_MAX_VALUES of them keep a sample of ENTITY_INDEX_MAX_VALUES values
+        """
+        self.repository.delete_by_table_description_id(table_description.id)
+        categories = {
+            column.name: column.categories
+            for column in table_description.columns
+            if column.categories
+        }
+        columns = [
+            column
+            for column in table.columns
+            if isinstance(column.type, sqlalchemy.String)
+            and column.name not in categories
+        ]
+        values = dict(categories)
+        if columns:
+            values.update(
+                select_distinct_values(columns, db_engine, ENTITY_INDEX_MAX_VALUES + 1)
+            )
+        for column_name, column_values in values.items():
+            self.repository.save(
+                ColumnEntityIndex(
+                    table_description_id=table_description.id,
+                    db_connection_id=str(table_description.db_connection_id),
+                    column_name=column_name,
+                    values=[
+                        str(value)
+                        for value in column_values[:ENTITY_INDEX_MAX_VALUES]
+                        if value is not None and len(str(value)) <= MAX_ENTITY_LENGTH
+                    ],
+                    sampled=len(column_values) > ENTITY_INDEX_MAX_VALUES,
+                )
+            )
+
+    def get_index(
+        self, table_description_id: str, column_name: str
+    ) -> EntityIndex | None:
+        column_entity_index = self.repository.find_by_column(
+            table_description_id, column_name
+        )
+        if column_entity_index is None:
+            return None
+        return EntityIndex(column_entity_index.values, column_entity_index.sampled)
@@ -0,0 +1,216 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List
+
+from dataherald.repositories.golden_sqls import GoldenSQLRepository
+from dataherald.sql_generator.connection_context import CONNECTION_CONTEXT_TTL
+from dataherald.types import GoldenSQL
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms found in more than this share of the golden sqls don't tell them apart and are skipped
+MAX_DOCUMENT_FREQUENCY = 0.5
+# Indexes kept in memory, the least recently used db connections are dropped first
+MAX_INDEXES = 100
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words, identifiers and literals, snake case identifiers also add their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+def golden_sql_terms(golden_sql: GoldenSQL) -> Counter:
+    return Counter(tokenize(f"{golden_sql.prompt_text} {golden_sql.sql}"))
+
+
+class BM25Index:
+    """BM25 inverted index of the golden sqls of a db connection over their question and the
+    table names, column names and literals of their sql"""
+
+    def __init__(self):
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+        self.golden_sqls = {}
+
+    def add(self, golden_sql: GoldenSQL):
+        self.remove(golden_sql.id)
+        terms = golden_sql_terms(golden_sql)
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[golden_sql.id] = count
+        self.lengths[golden_sql.id] = sum(terms.values())
+        self.total_length += self.lengths[golden_sql.id]
+        self.golden_sqls[golden_sql.id] = golden_sql
+
+    def remove(self, id: str) -> bool:
+        golden_sql = self.golden_sqls.pop(id, None)
+        if golden_sql is None:
+            return False
+        for term in golden_sql_terms(golden_sql):
+            postings = self.postings[term]
+            del postings[id]
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(id)
+        return True
+
+    def search(self, text: str, limit: int) -> List[GoldenSQL]:
+        """Returns the golden sqls with the highest BM25 score for the text"""
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average_length = self.total_length / count
+        scores = Counter()
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if not postings or len(postings) > max(1, MAX_DOCUMENT_FREQUENCY * count):
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for id, frequency in postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[id] / average_length
+                scores[id] += (
+                    idf
+                    * frequency
+                    * (BM25_K1 + 1)
+                    / (frequency + BM25_K1 * length_norm)
+                )
+        return [self.golden_sqls[id] for id, _ in scores.most_common(limit)]
+
+
+class GoldenSQLLexicalIndexes:
+    """Keeps a BM25Index per db connection for up to max_indexes db connections. It is built
+    from the stored golden sqls the first time the db connection is queried and updated as
+    golden sqls are added and removed. To pick up the changes of other processes it is rebuilt
+    by a background thread once it is older than CONNECTION_CONTEXT_TTL seconds, the questions
+    keep using the current index until the new one is swapped in. The changes made while an
+    index is built are applied to it before it is swapped in.
+    """
+
+    def __init__(
+        self, ttl: int = CONNECTION_CONTEXT_TTL, max_indexes: int = MAX_INDEXES
+    ):
+        self.ttl = ttl
+        self.max_indexes = max_indexes
+        self.indexes = OrderedDict()
+        self.build_locks = {}
+        # Changes made to the golden sqls of the db connections whose index is being built
+        self.builds = {}
+        self.lock = threading.Lock()
+
+    def search(
+        self, storage, db_connection_id: str, text: str, limit: int
+    ) -> List[GoldenSQL]:
+        entry = self.get_entry(storage, str(db_connection_id))
+        with entry["lock"]:
+            return entry["index"].search(text, limit)
+
+    def get_entry(self, storage, db_connection_id: str) -> dict:
+        with self.lock:
+            entry = self.indexes.get(db_connection_id)
+            if entry is not None:
+                self.indexes.move_to_end(db_connection_id)
+                if (
+                    time.monotonic() - entry["created_at"] > self.ttl
+                    and db_connection_id not in self.builds
+                ):
+                    self.builds[db_connection_id] = []
+                    entry["rebuild_thread"] = threading.Thread(
+                        target=self.rebuild,
+                        args=(storage, db_connection_id),
+                        daemon=True,
+                    )
+                    entry["rebuild_thread"].start()
+                return entry
+            build_lock = self.build_locks.setdefault(db_connection_id, threading.Lock())
+        # Only one thread builds the first index of a db connection
+        with build_lock:
+            with self.lock:
+                entry = self.indexes.get(db_connection_id)
+                if entry is not None:
+                    return entry
+                self.builds.setdefault(db_connection_id, [])
+            return self.build(storage, db_connection_id)
+
+    def build(self, storage, db_connection_id: str) -> dict:
+        """Builds the index from the stored golden sqls and swaps it in"""
+        try:
+            index = BM25Index()
+            for golden_sql in GoldenSQLRepository(storage).find_by(
+                {"db_connection_id": db_connection_id}, page=0, limit=0
+            ):
+                index.add(golden_sql)
+        except Exception:
+            with self.lock:
+                self.builds.pop(db_connection_id, None)
+            raise
+        entry = {
+            "created_at": time.monotonic(),
+            "index": index,
+            "lock": threading.Lock(),
+            "rebuild_thread": None,
+        }
+        with self.lock:
+            for change, value in self.builds.pop(db_connection_id, []):
+                if change == "add":
+                    index.add(value)
+                else:
+                    index.remove(value)
+            self.indexes[db_connection_id] = entry
+            self.indexes.move_to_end(db_connection_id)
+            while len(self.indexes) > self.max_indexes:
+                self.indexes.popitem(last=False)
+            self.build_locks.pop(db_connection_id, None)
+        return entry
+
+    def rebuild(self, storage, db_connection_id: str):
+        try:
+            self.build(storage, db_connection_id)
+        except Exception as e:
+            logger.warning(
+                f"Unable to rebuild the lexical index of {db_connection_id}: {str(e)}"
+            )
+            # The current index is kept and rebuilt again after the TTL
+            with self.lock:
+                entry = self.indexes.get(db_connection_id)
+                if entry is not None:
+                    entry["created_at"] = time.monotonic()
+
+    def add(self, golden_sqls: List[GoldenSQL]):
+        """Adds the golden sqls to the indexes already built and to the ones being built"""
+        with self.lock:
+            entries = {}
+            for golden_sql in golden_sqls:
+                db_connection_id = str(golden_sql.db_connection_id)
+                if db_connection_id in self.builds:
+                    self.builds[db_connection_id].append(("add", golden_sql))
+                entries[db_connection_id] = self.indexes.get(db_connection_id)
+        for golden_sql in golden_sqls:
+            entry = entries[str(golden_sql.db_connection_id)]
+            if entry is not None:
+                with entry["lock"]:
+                    entry["index"].add(golden_sql)
+
+    def remove(self, ids: List[str]):
+        with self.lock:
+            for changes in self.builds.values():
+                changes.extend(("remove", str(id)) for id in ids)
+            entries = list(self.indexes.values())
+        for entry in entries:
+            with entry["lock"]:
+                for id in ids:
+                    entry["index"].remove(str(id))
+
+
+golden_sql_lexical_indexes = GoldenSQLLexicalIndexes()
@@ -1,9 +1,8 @@
-import os
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import csv
+import io
 from datetime import datetime, timezone
 from queue import Queue
-
-import pandas as pd
+from typing import Iterator
 
 from dataherald.api.types.requests import SQLGenerationRequest
 from dataherald.config import System
@@ -16,13 +15,16 @@ from dataherald.repositories.sql_generations import (
     SQLGenerationNotFoundError,
     SQLGenerationRepository,
 )
+from dataherald.smart_cache import SmartCache
 from dataherald.sql_database.base import SQLDatabase
 from dataherald.sql_generator.create_sql_query_status import create_sql_query_status
 from dataherald.sql_generator.dataherald_finetuning_agent import (
     DataheraldFinetuningAgent,
 )
 from dataherald.sql_generator.dataherald_sqlagent import DataheraldSQLAgent
-from dataherald.types import LLMConfig, SQLGeneration
+from dataherald.types import LLMConfig, SQLGeneration, SQLGenerationPath
+
+CSV_BATCH_SIZE = 1000
 
 
 class SQLGenerationError(Exception):
@@ -33,6 +35,20 @@ class EmptySQLGenerationError(Exception):
     pass
 
 
+def csv_chunks(columns: list[str], batches: Iterator[list]) -> Iterator[str]:
+    """Writes the header and each batch of rows as a CSV chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
 class SQLGenerationService:
     def __init__(self, system: System, storage):
         self.system = system
@@ -43,7 +59,7 @@ class SQLGenerationService:
         sql_generation.error = error
         return self.sql_generation_repository.update(sql_generation)
 
-    def generate_response_with_timeout(
+    def generate_response(
         self, sql_generator, user_prompt, db_connection, metadata=None
     ):
         return sql_generator.generate_response(
@@ -61,8 +77,75 @@ class SQLGenerationService:
         initial_sql_generation.status = sql_generation.status
         initial_sql_generation.error = sql_generation.error
         initial_sql_generation.intermediate_steps = sql_generation.intermediate_steps
+        initial_sql_generation.generation_path = sql_generation.generation_path
         return self.sql_generation_repository.update(initial_sql_generation)
 
+    def get_cached_sql_generation(
+        self,
+        smart_cache: SmartCache,
+        cache_key: str,
+        initial_sql_generation: SQLGeneration,
+        sql_generation_request: SQLGenerationRequest,
+    ) -> SQLGeneration | None:
+        """Returns the SQL generation cached for the same prompt, None when the request has its
+        own SQL or there is no valid cached entry"""
+        if sql_generation_request.sql is not None:
+            return None
+        sql_generation = smart_cache.lookup(cache_key)
+        if sql_generation is None:
+            return None
+        sql_generation.tokens_used = 0
+        sql_generation.generation_path = SQLGenerationPath.SMART_CACHE.value
+        if sql_generation_request.finetuning_id:
+            initial_sql_generation.finetuning_id = sql_generation_request.finetuning_id
+            initial_sql_generation.low_latency_mode = (
+                sql_generation_request.low_latency_mode
+            )
+        return sql_generation
+
+    def create_sql_generator(
+        self,
+        initial_sql_generation: SQLGeneration,
+        sql_generation_request: SQLGenerationRequest,
+    ) -> DataheraldSQLAgent | DataheraldFinetuningAgent:
+        if (
+            sql_generation_request.finetuning_id is None
+            or sql_generation_request.finetuning_id == ""
+        ):
+            if sql_generation_request.low_latency_mode:
+                raise SQLGenerationError(
+                    "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
+                    initial_sql_generation.id,
+                )
+            sql_generator = DataheraldSQLAgent(
+                self.system,
+                (
+                    sql_generation_request.llm_config
+                    if sql_generation_request.llm_config
+                    else LLMConfig()
+                ),
+            )
+        else:
+            sql_generator = DataheraldFinetuningAgent(
+                self.system,
+                (
+                    sql_generation_request.llm_config
+                    if sql_generation_request.llm_config
+                    else LLMConfig()
+                ),
+            )
+            sql_generator.finetuning_id = sql_generation_request.finetuning_id
+            sql_generator.use_fintuned_model_only = (
+                sql_generation_request.low_latency_mode
+            )
+            initial_sql_generation.finetuning_id = (
+                sql_generation_request.finetuning_id
+            )
+            initial_sql_generation.low_latency_mode = (
+                sql_generation_request.low_latency_mode
+            )
+        return sql_generator
+
     def create(  # noqa: PLR0912
         self, prompt_id: str, sql_generation_request: SQLGenerationRequest
     ) -> SQLGeneration:  # noqa: PLR0912
@@ -91,7 +174,21 @@ class SQLGenerationService:
             )
         db_connection_repository = DatabaseConnectionRepository(self.storage)
         db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        database = SQLDatabase.get_sql_engine(db_connection, True)
+        database = SQLDatabase.get_sql_engine(db_connection)
+        smart_cache = self.system.instance(SmartCache)
+        cache_key = smart_cache.create_key(
+            str(prompt.db_connection_id),
+            prompt.text,
+            {
+                "schemas": prompt.schemas,
+                "finetuning_id": sql_generation_request.finetuning_id,
+                "low_latency_mode": sql_generation_request.low_latency_mode,
+                "llm_config": initial_sql_generation.llm_config.dict(),
+            },
+        )
+        cached_sql_generation = self.get_cached_sql_generation(
+            smart_cache, cache_key, initial_sql_generation, sql_generation_request
+        )
         if sql_generation_request.sql is not None:
             sql_generation = SQLGeneration(
                 prompt_id=prompt_id,
@@ -105,67 +202,28 @@ class SQLGenerationService:
             except Exception as e:
                 self.update_error(initial_sql_generation, str(e))
                 raise SQLGenerationError(str(e), initial_sql_generation.id) from e
+        elif cached_sql_generation is not None:
+            sql_generation = cached_sql_generation
         else:
-            if (
-                sql_generation_request.finetuning_id is None
-                or sql_generation_request.finetuning_id == ""
-            ):
-                if sql_generation_request.low_latency_mode:
-                    raise SQLGenerationError(
-                        "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
-                        initial_sql_generation.id,
-                    )
-                sql_generator = DataheraldSQLAgent(
-                    self.system,
-                    (
-                        sql_generation_request.llm_config
-                        if sql_generation_request.llm_config
-                        else LLMConfig()
-                    ),
-                )
-            else:
-                sql_generator = DataheraldFinetuningAgent(
-                    self.system,
-                    (
-                        sql_generation_request.llm_config
-                        if sql_generation_request.llm_config
-                        else LLMConfig()
-                    ),
-                )
-                sql_generator.finetuning_id = sql_generation_request.finetuning_id
-                sql_generator.use_fintuned_model_only = (
-                    sql_generation_request.low_latency_mode
-                )
-                initial_sql_generation.finetuning_id = (
-                    sql_generation_request.finetuning_id
-                )
-                initial_sql_generation.low_latency_mode = (
-                    sql_generation_request.low_latency_mode
-                )
+            sql_generator = self.create_sql_generator(
+                initial_sql_generation, sql_generation_request
+            )
+            # The agents stop after DH_ENGINE_TIMEOUT seconds through max_execution_time and
+            # the route responds with a 504 when the whole request takes longer
             try:
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(
-                        self.generate_response_with_timeout,
-                        sql_generator,
-                        prompt,
-                        db_connection,
-                        metadata=langsmith_metadata,
-                    )
-                    try:
-                        sql_generation = future.result(
-                            timeout=int(os.environ.get("DH_ENGINE_TIMEOUT", 150))
-                        )
-                    except TimeoutError as e:
-                        self.update_error(
-                            initial_sql_generation, "SQL generation request timed out"
-                        )
-                        raise SQLGenerationError(
-                            "SQL generation request timed out",
-                            initial_sql_generation.id,
-                        ) from e
+                sql_generation = self.generate_response(
+                    sql_generator,
+                    prompt,
+                    db_connection,
+                    metadata=langsmith_metadata,
+                )
             except Exception as e:
                 self.update_error(initial_sql_generation, str(e))
                 raise SQLGenerationError(str(e), initial_sql_generation.id) from e
+            if sql_generation.generation_path is None:
+                sql_generation.generation_path = SQLGenerationPath.AGENT.value
+            if sql_generation.status == "VALID":
+                smart_cache.add(cache_key, sql_generation)
         if sql_generation_request.evaluate:
             evaluator = self.system.instance(Evaluator)
             evaluator.llm_config = (
@@ -212,40 +270,9 @@ class SQLGenerationService:
             )
         db_connection_repository = DatabaseConnectionRepository(self.storage)
         db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        if (
-            sql_generation_request.finetuning_id is None
-            or sql_generation_request.finetuning_id == ""
-        ):
-            if sql_generation_request.low_latency_mode:
-                raise SQLGenerationError(
-                    "Low latency mode is not supported for our old agent with no finetuning. Please specify a finetuning id.",
-                    initial_sql_generation.id,
-                )
-            sql_generator = DataheraldSQLAgent(
-                self.system,
-                (
-                    sql_generation_request.llm_config
-                    if sql_generation_request.llm_config
-                    else LLMConfig()
-                ),
-            )
-        else:
-            sql_generator = DataheraldFinetuningAgent(
-                self.system,
-                (
-                    sql_generation_request.llm_config
-                    if sql_generation_request.llm_config
-                    else LLMConfig()
-                ),
-            )
-            sql_generator.finetuning_id = sql_generation_request.finetuning_id
-            sql_generator.use_fintuned_model_only = (
-                sql_generation_request.low_latency_mode
-            )
-            initial_sql_generation.finetuning_id = sql_generation_request.finetuning_id
-            initial_sql_generation.low_latency_mode = (
-                sql_generation_request.low_latency_mode
-            )
+        sql_generator = self.create_sql_generator(
+            initial_sql_generation, sql_generation_request
+        )
         try:
             sql_generator.stream_response(
                 user_prompt=prompt,
@@ -271,7 +298,7 @@ class SQLGenerationService:
         prompt = prompt_repository.find_by_id(sql_generation.prompt_id)
         db_connection_repository = DatabaseConnectionRepository(self.storage)
         db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
-        database = SQLDatabase.get_sql_engine(db_connection, True)
+        database = SQLDatabase.get_sql_engine(db_connection)
         return database.run_sql(sql_generation.sql, max_rows)
 
     def execute_invoice_query(self, supplier_name: str, start_date: str, end_date: str, max_rows: int = 100) -> tuple[str, dict]:
@@ -296,7 +323,7 @@ class SQLGenerationService:
 
         db_connection_repository = DatabaseConnectionRepository(self.storage)
         db_connection = db_connection_repository.find_by_id(db_connection_id)
-        database = SQLDatabase.get_sql_engine(db_connection, True)
+        database = SQLDatabase.get_sql_engine(db_connection)
         return database.run_sql(sql_query, max_rows)
 
     def update_metadata(self, sql_generation_id, metadata_request) -> SQLGeneration:
@@ -308,7 +335,7 @@ class SQLGenerationService:
         sql_generation.metadata = metadata_request.metadata
         return self.sql_generation_repository.update(sql_generation)
 
-    def create_dataframe(self, sql_generation_id):
+    def create_csv_stream(self, sql_generation_id) -> Iterator[str]:
         sql_generation = self.sql_generation_repository.find_by_id(sql_generation_id)
         if not sql_generation:
             raise SQLGenerationNotFoundError(
@@ -319,10 +346,10 @@ class SQLGenerationService:
         db_connection_repository = DatabaseConnectionRepository(self.storage)
         db_connection = db_connection_repository.find_by_id(prompt.db_connection_id)
         database = SQLDatabase.get_sql_engine(db_connection)
-        results = database.run_sql(sql_generation.sql)
+        results = database.stream_sql(sql_generation.sql, CSV_BATCH_SIZE)
         if results is None:
             raise EmptySQLGenerationError(
                 f"Sql generation {sql_generation_id} is empty"
             )
-        data = results[1]["result"]
-        return pd.DataFrame(data)
+        columns, batches = results
+        return csv_chunks(columns, batches)
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from dataherald.db_scanner.models.types import (
+    TableDescription,
+    TableDescriptionStatus,
+    TableEmbedding,
+)
+from dataherald.db_scanner.repository.base import TableDescriptionRepository
+from dataherald.db_scanner.repository.table_embeddings import TableEmbeddingRepository
+from dataherald.sql_generator.connection_context import connection_contexts
+from dataherald.utils.similarity import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+def create_table_representation(table: TableDescription) -> str:
+    """Concatenates the table name, the column names and the descriptions of the table"""
+    col_rep = ""
+    for column in table.columns:
+        if column.description is not None:
+            col_rep += f"{column.name}: {column.description}, "
+        else:
+            col_rep += f"{column.name}, "
+    if table.description is not None:
+        return f"Table {table.table_name} contain columns: [{col_rep}], this tables has: {table.description}"
+    return f"Table {table.table_name} contain columns: [{col_rep}]"
+
+
+class TableEmbeddingService:
+    def __init__(self, storage):
+        self.storage = storage
+        self.repository = TableEmbeddingRepository(storage)
+
+    def get_embeddings(
+        self, tables: list[TableDescription], embedding: Embeddings, model: str
+    ) -> np.ndarray:
+        """Returns the normalized embedding matrix of the tables, only the tables which are new or
+        whose representation changed since they were stored are sent to the embedding model"""
+        representations = [create_table_representation(table) for table in tables]
+        hashes = [
+            hashlib.sha256(representation.encode()).hexdigest()
+            for representation in representations
+        ]
+        stored = self.repository.find_by_table_description_ids(
+            [table.id for table in tables], model
+        )
+        stale = [
+            index
+            for index, table in enumerate(tables)
+            if table.id not in stored
+            or stored[table.id].representation_hash != hashes[index]
+        ]
+        if stale:
+            logger.info(f"Embedding {len(stale)} of {len(tables)} tables")
+            embeddings = embedding.embed_documents(
+                [representations[index] for index in stale]
+            )
+            for index, table_embedding in zip(stale, embeddings, strict=True):
+                stored[tables[index].id] = self.repository.save(
+                    TableEmbedding(
+                        table_description_id=tables[index].id,
+                        db_connection_id=tables[index].db_connection_id,
+                        model=model,
+                        representation_hash=hashes[index],
+                        embedding=table_embedding,
+                    )
+                )
+        return normalize_rows([stored[table.id].embedding for table in tables])
+
+    def get_cached_embeddings(
+        self, tables: list[TableDescription], embedding: Embeddings, model: str
+    ) -> np.ndarray:
+        """Returns the embedding matrix of the tables kept in the context of their db connection,
+        it is only read from the storage again after the tables are scanned or described"""
+        if not tables:
+            return normalize_rows([])
+        return connection_contexts.get(tables[0].db_connection_id).get(
+            ("table_embeddings", model, tuple(table.id for table in tables)),
+            lambda: self.get_embeddings(tables, embedding, model),
+        )
+
+    def refresh(self, db_connection_id: str, embedding: Embeddings, model: str) -> None:
+        """Precomputes the embeddings of the scanned tables of a db connection"""
+        tables = TableDescriptionRepository(self.storage).get_all_tables_by_db(
+            {
+                "db_connection_id": str(db_connection_id),
+                "status": TableDescriptionStatus.SCANNED.value,
+            }
+        )
+        if tables:
+            self.get_embeddings(tables, embedding, model)
+
+    def invalidate(self, table_description_id: str, db_connection_id: str) -> None:
+        self.repository.delete_by_table_description_id(table_description_id)
+        connection_contexts.invalidate(db_connection_id)
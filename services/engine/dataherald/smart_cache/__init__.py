@@ -1,17 +1,29 @@
 """Base class that all cache classes inherit from."""
 
 from abc import ABC, abstractmethod
-from typing import Any, Union
+from typing import Any
 
 from dataherald.config import Component
-from dataherald.types import Response
+from dataherald.types import SQLGeneration
 
 
 class SmartCache(Component, ABC):
     @abstractmethod
-    def add(self, key: str, value: Response) -> dict[str, Any]:
+    def create_key(self, db_connection_id: str, prompt_text: str, options: dict) -> str:
+        """Creates the cache key of a prompt for the current version of the db connection."""
+
+    @abstractmethod
+    def add(self, key: str, value: SQLGeneration) -> None:
         """Adds a key-value pair to the cache."""
 
     @abstractmethod
-    def lookup(self, key: str) -> str:
+    def lookup(self, key: str) -> SQLGeneration | None:
         """Looks up a key in the cache."""
+
+    @abstractmethod
+    def invalidate(self, db_connection_id: str) -> None:
+        """Invalidates the cached values of a db connection."""
+
+    @abstractmethod
+    def metrics(self) -> dict[str, Any]:
+        """Returns the hit, miss and eviction counters of the cache."""
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from overrides import override
+
+from dataherald.config import System
+from dataherald.smart_cache import SmartCache
+from dataherald.types import SQLGeneration
+
+
+def normalize_prompt(prompt_text: str) -> str:
+    return re.sub(r"\s+", " ", prompt_text).strip().rstrip("?.!").strip().lower()
+
+
+class InMemorySmartCache(SmartCache):
+    """LRU cache with a TTL. Every db connection has a version which is increased when its
+    schema, instructions or golden SQLs change, so the stale entries are never hit again"""
+
+    def __init__(self, system: System):
+        super().__init__(system)
+        self.max_size = int(os.getenv("SMART_CACHE_MAX_SIZE", "1000"))
+        self.ttl = int(os.getenv("SMART_CACHE_TTL", "3600"))
+        self._entries: OrderedDict[str, tuple[float, SQLGeneration]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @override
+    def create_key(self, db_connection_id: str, prompt_text: str, options: dict) -> str:
+        with self._lock:
+            version = self._versions.get(db_connection_id, 0)
+        digest = hashlib.sha256(
+            json.dumps(
+                {"prompt": normalize_prompt(prompt_text), "options": options},
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()
+        return f"{db_connection_id}:{version}:{digest}"
+
+    @override
+    def add(self, key: str, value: SQLGeneration) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value.copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @override
+    def lookup(self, key: str) -> SQLGeneration | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy(deep=True)
+
+    @override
+    def invalidate(self, db_connection_id: str) -> None:
+        with self._lock:
+            self._versions[db_connection_id] = (
+                self._versions.get(db_connection_id, 0) + 1
+            )
+            for key in [
+                key for key in self._entries if key.startswith(f"{db_connection_id}:")
+            ]:
+                del self._entries[key]
+
+    @override
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            return self._metrics()
+
+    def _metrics(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,24 +1,45 @@
 """SQL wrapper around SQLDatabase in langchain."""
 
+import hashlib
 import logging
+import os
 import re
-from typing import List
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List
 from urllib.parse import unquote, quote_plus
 from dataherald.config import Settings
 
 import sqlparse
-from sqlalchemy import MetaData, create_engine, inspect, text
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import OperationalError
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
 from sshtunnel import SSHTunnelForwarder
 
-from dataherald.sql_database.models.types import DatabaseConnection
+from dataherald.sql_database.models.types import DatabaseConnection, SQLValidationMode
+from dataherald.sql_database.query_timeout import (
+    DEFAULT_STATEMENT_TIMEOUT,
+    run_with_timeout,
+)
 from dataherald.utils.encrypt import FernetEncrypt
 from dataherald.utils.error_codes import CustomError
 from dataherald.utils.s3 import S3
 
 logger = logging.getLogger(__name__)
 
+# Dialects whose EXPLAIN raises an error for an invalid query without running it
+EXPLAIN_DIALECTS = [
+    "postgresql",
+    "mysql",
+    "sqlite",
+    "duckdb",
+    "redshift",
+    "snowflake",
+    "clickhouse",
+    "mssql",
+]
+
 
 # Define a custom exception class
 class SQLInjectionError(CustomError):
@@ -37,18 +58,165 @@ class SSHInvalidDatabaseConnectionError(CustomError):
     pass
 
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_ENGINE_IDLE_TIMEOUT = int(os.getenv("DB_ENGINE_IDLE_TIMEOUT", "3600"))
+MAX_CONCURRENT_REQUESTS_PER_DB_CONNECTION = int(
+    os.getenv("MAX_CONCURRENT_REQUESTS_PER_DB_CONNECTION", "8")
+)
+# Fingerprints memoized by the encrypted connection settings
+MAX_CONNECTION_FINGERPRINTS = 1024
+
+
 class DBConnections:
+    """Registry of the long-lived engines keyed by db connection id and connection settings"""
+
     db_connections = {}
+    # Replaced or invalidated engines which still had connections checked out
+    retired = []
+    lock = threading.Lock()
+    counters = {"hits": 0, "misses": 0, "evictions": 0}
+    # Semaphore of each db connection and the number of requests holding or waiting for it
+    request_slots = {}
+    request_scope_state = threading.local()
+    fingerprints = OrderedDict()
+
+    @staticmethod
+    def get(db_connection_id: str, fingerprint: str) -> "SQLDatabase | None":
+        with DBConnections.lock:
+            DBConnections._evict_idle()
+            entry = DBConnections.db_connections.get((db_connection_id, fingerprint))
+            if entry is None:
+                DBConnections.counters["misses"] += 1
+                return None
+            DBConnections.counters["hits"] += 1
+            entry["last_used"] = time.monotonic()
+            return entry["sql_database"]
+
+    @staticmethod
+    def add(db_connection_id: str, fingerprint: str, sql_database: "SQLDatabase"):
+        with DBConnections.lock:
+            previous = DBConnections.db_connections.pop(
+                (db_connection_id, fingerprint), None
+            )
+            if previous is not None:
+                DBConnections._retire(previous)
+            DBConnections.db_connections[(db_connection_id, fingerprint)] = {
+                "sql_database": sql_database,
+                "last_used": time.monotonic(),
+            }
+
+    @staticmethod
+    def invalidate(db_connection_id: str):
+        """Disposes all the engines of a db connection, e.g. after its settings changed"""
+        with DBConnections.lock:
+            for key in list(DBConnections.db_connections):
+                if key[0] == db_connection_id:
+                    DBConnections._retire(DBConnections.db_connections.pop(key))
+
+    @staticmethod
+    @contextmanager
+    def request_scope():
+        """Runs the work of a request. The first time it gets the engine of a db connection it
+        waits for one of the MAX_CONCURRENT_REQUESTS_PER_DB_CONNECTION slots of the db
+        connection, the slots are released when the request ends"""
+        if getattr(DBConnections.request_scope_state, "slots", None) is not None:
+            yield
+            return
+        DBConnections.request_scope_state.slots = slots = {}
+        try:
+            yield
+        finally:
+            DBConnections.request_scope_state.slots = None
+            for slot in slots.values():
+                slot["semaphore"].release()
+                with DBConnections.lock:
+                    slot["holders"] -= 1
+
+    @staticmethod
+    def acquire_request_slot(db_connection_id: str | None):
+        slots = getattr(DBConnections.request_scope_state, "slots", None)
+        if slots is None or not db_connection_id:
+            return
+        db_connection_id = str(db_connection_id)
+        if db_connection_id in slots:
+            return
+        with DBConnections.lock:
+            slot = DBConnections.request_slots.setdefault(
+                db_connection_id,
+                {
+                    "semaphore": threading.Semaphore(
+                        MAX_CONCURRENT_REQUESTS_PER_DB_CONNECTION
+                    ),
+                    "holders": 0,
+                },
+            )
+            slot["holders"] += 1
+        slot["semaphore"].acquire()
+        slots[db_connection_id] = slot
+
+    @staticmethod
+    def metrics() -> dict:
+        with DBConnections.lock:
+            return {
+                **DBConnections.counters,
+                "engines": len(DBConnections.db_connections),
+                "retired_engines": len(DBConnections.retired),
+                "pools": {
+                    f"{key[0]}/{key[1][:8]}": entry["sql_database"].engine.pool.status()
+                    for key, entry in DBConnections.db_connections.items()
+                },
+            }
+
+    @staticmethod
+    def _evict_idle():
+        now = time.monotonic()
+        for key, entry in list(DBConnections.db_connections.items()):
+            if now - entry["last_used"] > DB_ENGINE_IDLE_TIMEOUT and not (
+                DBConnections._in_use(entry)
+            ):
+                logger.info(f"Disposing idle engine of db connection {key[0]}")
+                DBConnections._dispose(DBConnections.db_connections.pop(key))
+        for entry in list(DBConnections.retired):
+            if not DBConnections._in_use(entry):
+                DBConnections.retired.remove(entry)
+                DBConnections._dispose(entry)
+        engine_ids = {str(key[0]) for key in DBConnections.db_connections}
+        for db_connection_id, slot in list(DBConnections.request_slots.items()):
+            if slot["holders"] == 0 and db_connection_id not in engine_ids:
+                del DBConnections.request_slots[db_connection_id]
+
+    @staticmethod
+    def _in_use(entry: dict) -> bool:
+        """Whether a query still holds a connection of the engine, pools without the counter
+        (e.g. NullPool) open one connection per query and are never reported in use"""
+        checkedout = getattr(entry["sql_database"].engine.pool, "checkedout", None)
+        return checkedout is not None and checkedout() > 0
+
+    @staticmethod
+    def _retire(entry: dict):
+        """Disposes the engine, or waits until its checked out connections are returned"""
+        if DBConnections._in_use(entry):
+            DBConnections.retired.append(entry)
+        else:
+            DBConnections._dispose(entry)
 
     @staticmethod
-    def add(uri, engine):
-        DBConnections.db_connections[uri] = engine
+    def _dispose(entry: dict):
+        DBConnections.counters["evictions"] += 1
+        sql_database = entry["sql_database"]
+        sql_database.engine.dispose()
+        if sql_database.ssh_tunnel is not None:
+            sql_database.ssh_tunnel.stop(force=True)
 
 
 class SQLDatabase:
     def __init__(self, engine: Engine):
         """Create engine from database URI."""
         self._engine = engine
+        self.sql_validation = SQLValidationMode.AUTO.value
+        self.ssh_tunnel = None
 
     @property
     def engine(self) -> Engine:
@@ -65,45 +233,94 @@ class SQLDatabase:
         # Set timeout settings based on dialect
         if database_uri.lower().startswith("mysql"):
             _engine_args.setdefault("connect_args", {})
-            _engine_args["connect_args"]["init_command"] = "SET SESSION max_execution_time=90000"
+            _engine_args["connect_args"]["init_command"] = f"SET SESSION max_execution_time={DEFAULT_STATEMENT_TIMEOUT * 1000}"
         
         elif database_uri.lower().startswith("postgresql"):
             _engine_args.setdefault("connect_args", {})
-            _engine_args["connect_args"]["options"] = "-c statement_timeout=90000"
+            _engine_args["connect_args"]["options"] = f"-c statement_timeout={DEFAULT_STATEMENT_TIMEOUT * 1000}"
         
         elif database_uri.lower().startswith("sqlite"):
             _engine_args.setdefault("connect_args", {})
-            _engine_args["connect_args"]["timeout"] = 90
+            _engine_args["connect_args"]["timeout"] = DEFAULT_STATEMENT_TIMEOUT
             
         elif database_uri.lower().startswith("duckdb"):
             config = {"autoload_known_extensions": False}
             _engine_args["connect_args"] = {"config": config}
 
+        # sqlite and duckdb use single connection pools which can't be sized
+        if not database_uri.lower().startswith(("sqlite", "duckdb")):
+            _engine_args.setdefault("pool_size", DB_POOL_SIZE)
+            _engine_args.setdefault("max_overflow", DB_MAX_OVERFLOW)
+            _engine_args.setdefault("pool_recycle", DB_POOL_RECYCLE)
+        _engine_args.setdefault("pool_pre_ping", True)
+
         engine = create_engine(database_uri, **_engine_args)
         return cls(engine)
 
+    @classmethod
+    def get_connection_fingerprint(cls, database_info: DatabaseConnection) -> str:
+        """Returns the fingerprint of the connection settings, memoized by their encrypted values
+        so getting a registered engine doesn't decrypt them"""
+        ssh = database_info.ssh_settings if database_info.use_ssh else None
+        key = (
+            database_info.id,
+            database_info.connection_uri,
+            database_info.path_to_credentials_file,
+            database_info.use_ssh,
+            tuple(ssh.dict().values()) if ssh else None,
+        )
+        with DBConnections.lock:
+            fingerprint = DBConnections.fingerprints.get(key)
+            if fingerprint is not None:
+                DBConnections.fingerprints.move_to_end(key)
+                return fingerprint
+        fingerprint = cls.compute_connection_fingerprint(database_info)
+        with DBConnections.lock:
+            DBConnections.fingerprints[key] = fingerprint
+            while len(DBConnections.fingerprints) > MAX_CONNECTION_FINGERPRINTS:
+                DBConnections.fingerprints.popitem(last=False)
+        return fingerprint
+
+    @classmethod
+    def compute_connection_fingerprint(cls, database_info: DatabaseConnection) -> str:
+        """Hashes the decrypted connection settings, the encrypted values differ on every encryption"""
+        fernet_encrypt = FernetEncrypt()
+        settings = [
+            fernet_encrypt.decrypt(database_info.connection_uri),
+            str(database_info.path_to_credentials_file),
+            str(database_info.use_ssh),
+        ]
+        if database_info.use_ssh and database_info.ssh_settings:
+            ssh = database_info.ssh_settings
+            settings += [
+                str(ssh.host),
+                str(ssh.port),
+                str(ssh.username),
+                fernet_encrypt.decrypt(ssh.password or ""),
+                fernet_encrypt.decrypt(ssh.private_key_password or ""),
+            ]
+        return hashlib.sha256("\n".join(settings).encode()).hexdigest()
+
     @classmethod
     def get_sql_engine(
         cls, database_info: DatabaseConnection, refresh_connection=False
     ) -> "SQLDatabase":
-        logger.info(f"Connecting db: {database_info.id}")
-        try:
-            if (
-                database_info.id
-                and database_info.id in DBConnections.db_connections
-                and not refresh_connection
-            ):
-                sql_database = DBConnections.db_connections[database_info.id]
-                sql_database.engine.connect()
+        DBConnections.acquire_request_slot(database_info.id)
+        fingerprint = cls.get_connection_fingerprint(database_info)
+        if database_info.id and not refresh_connection:
+            sql_database = DBConnections.get(database_info.id, fingerprint)
+            if sql_database is not None:
+                sql_database.sql_validation = database_info.sql_validation
                 return sql_database
-        except OperationalError:
-            pass
 
+        logger.info(f"Connecting db: {database_info.id}")
         fernet_encrypt = FernetEncrypt()
         try:
             if database_info.use_ssh:
                 engine = cls.from_uri_ssh(database_info)
-                DBConnections.add(database_info.id, engine)
+                engine.sql_validation = database_info.sql_validation
+                if database_info.id:
+                    DBConnections.add(database_info.id, fingerprint, engine)
                 return engine
         except Exception as e:
             raise SSHInvalidDatabaseConnectionError(
@@ -119,10 +336,13 @@ class SQLDatabase:
 
             if db_uri.lower().startswith("bigquery"):
                 db_uri = db_uri + f"?credentials_path={file_path}"
- 
+
             engine = cls.from_uri(db_uri)
-            engine.engine.connect()
-            DBConnections.add(database_info.id, engine)
+            with engine.engine.connect():
+                pass
+            engine.sql_validation = database_info.sql_validation
+            if database_info.id:
+                DBConnections.add(database_info.id, fingerprint, engine)
         except Exception as e:
             raise InvalidDBConnectionError(  # noqa: B904
                 f"Unable to connect to db: {database_info.alias}", description=str(e)
@@ -185,9 +405,11 @@ class SQLDatabase:
         local_port = str(server.local_bind_port)
         local_host = str(server.local_bind_host)
 
-        return cls.from_uri(
+        sql_database = cls.from_uri(
             f"{db_uri_obj['driver']}://{db_uri_obj['user']}:{db_uri_obj['password']}@{local_host}:{local_port}/{db_uri_obj['db']}"
         )
+        sql_database.ssh_tunnel = server
+        return sql_database
 
     @classmethod
     def parser_to_filter_commands(cls, command: str) -> str:
@@ -218,14 +440,20 @@ class SQLDatabase:
 
         return command
 
-    def run_sql(self, command: str, top_k: int = None) -> tuple[str, dict]:
+    def run_sql(
+        self, command: str, top_k: int = None, timeout: int | None = None
+    ) -> tuple[str, dict]:
         """Execute a SQL statement and return a string representing the results.
 
         If the statement returns rows, a string of the results is returned.
         If the statement returns no rows, an empty string is returned.
+        With a timeout the query is cancelled in the database and TimeoutError is raised.
         """
-        with self._engine.connect() as connection:
-            command = self.parser_to_filter_commands(command)
+        command = self.parser_to_filter_commands(command)
+
+        def execute(connection: Connection) -> tuple[str, dict]:
+            if top_k:
+                connection = connection.execution_options(stream_results=True)
             cursor = connection.execute(text(command))
             if cursor.returns_rows and top_k:
                 result = cursor.fetchmany(top_k)
@@ -233,12 +461,84 @@ class SQLDatabase:
             if cursor.returns_rows:
                 result = cursor.fetchall()
                 return str(result), {"result": result}
-        return "", {}
+            return "", {}
+
+        if timeout:
+            return run_with_timeout(self._engine, execute, timeout)
+        with self._engine.connect() as connection:
+            return execute(connection)
+
+    def stream_sql(
+        self, command: str, batch_size: int = 1000
+    ) -> tuple[List[str], Iterator[list]] | None:
+        """Executes a SQL statement with a server-side cursor where the driver supports it.
+
+        Returns the column names and an iterator over batches of rows, or None if the
+        statement returns no rows. The connection is released once the iterator is exhausted.
+        """
+        command = self.parser_to_filter_commands(command)
+        connection = self._engine.connect().execution_options(stream_results=True)
+        try:
+            cursor = connection.execute(text(command))
+        except Exception:
+            connection.close()
+            raise
+        if not cursor.returns_rows:
+            connection.close()
+            return None
+
+        def batches() -> Iterator[list]:
+            try:
+                while rows := cursor.fetchmany(batch_size):
+                    yield rows
+            finally:
+                cursor.close()
+                connection.close()
+
+        return list(cursor.keys()), batches()
+
+    def get_validation_mode(self) -> str:
+        if self.sql_validation != SQLValidationMode.AUTO.value:
+            return self.sql_validation
+        if self.dialect in EXPLAIN_DIALECTS:
+            return SQLValidationMode.EXPLAIN.value
+        return SQLValidationMode.LIMIT.value
+
+    def get_validation_query(self, command: str) -> str:
+        """Returns a statement which fails like the command does without reading its whole result"""
+        command = command.strip().rstrip(";").rstrip()
+        mode = self.get_validation_mode()
+        if mode == SQLValidationMode.EXPLAIN.value:
+            if self.dialect == "mssql":
+                escaped_command = command.replace("'", "''")
+                return f"EXEC sp_describe_first_result_set @tsql = N'{escaped_command}'"
+            return f"EXPLAIN {command}"
+        if mode == SQLValidationMode.LIMIT.value:
+            # The command goes on its own lines so a trailing -- comment doesn't swallow the
+            # closing parenthesis
+            if self.dialect == "mssql":
+                return f"SELECT TOP 1 * FROM (\n{command}\n) AS validation_query"  # noqa: S608
+            return f"SELECT * FROM (\n{command}\n) AS validation_query LIMIT 1"  # noqa: S608
+        return command
+
+    def validate_sql(self, command: str, timeout: int | None = None) -> None:
+        """Raises the database error if the command is not valid, reading one row at most"""
+        command = self.parser_to_filter_commands(command)
+
+        def validate(connection: Connection):
+            cursor = connection.execute(text(self.get_validation_query(command)))
+            if cursor.returns_rows:
+                cursor.fetchmany(1)
+            cursor.close()
+
+        if timeout:
+            run_with_timeout(self._engine, validate, timeout)
+        else:
+            with self._engine.connect() as connection:
+                validate(connection)
 
     def get_tables_and_views(self) -> List[str]:
         inspector = inspect(self._engine)
-        meta = MetaData(bind=self._engine)
-        MetaData.reflect(meta, views=True)
         rows = inspector.get_table_names() + inspector.get_view_names()
         if len(rows) == 0:
             raise EmptyDBError("The db is empty it could be a permission issue")
@@ -91,6 +91,13 @@ class SupportedDialects(Enum):
     AURORA = "aurora"
 
 
+class SQLValidationMode(Enum):
+    AUTO = "auto"
+    EXPLAIN = "explain"
+    LIMIT = "limit"
+    EXECUTE = "execute"
+
+
 class DatabaseConnection(BaseModel):
     id: str | None
     alias: str
@@ -103,6 +110,7 @@ class DatabaseConnection(BaseModel):
     ssh_settings: SSHSettings | None = None
     file_storage: FileStorage | None = None
     metadata: dict | None
+    sql_validation: str = SQLValidationMode.AUTO.value
     created_at: datetime = Field(default_factory=datetime.now)
 
     @classmethod
@@ -131,6 +139,12 @@ class DatabaseConnection(BaseModel):
             value = fernet_encrypt.encrypt(value)
         return value
 
+    @validator("sql_validation", pre=True, always=True)
+    def sql_validation_mode(cls, value: str | None):
+        if value is None:
+            return SQLValidationMode.AUTO.value
+        return SQLValidationMode(value).value
+
     @validator("llm_api_key", pre=True, always=True)
     def llm_api_key_encrypt(cls, value: str):
         fernet_encrypt = FernetEncrypt()
@@ -0,0 +1,229 @@
+"""Timeouts that stop the query in the database instead of abandoning the thread running it."""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+SQL_EXECUTION_TIMEOUT = int(os.getenv("SQL_EXECUTION_TIMEOUT", "60"))
+# Session statement timeout of the engines, restored after a query with its own timeout
+DEFAULT_STATEMENT_TIMEOUT = 90
+QUERY_CANCEL_WORKERS = int(os.getenv("QUERY_CANCEL_WORKERS", "4"))
+
+
+class Watchdog:
+    """Single thread firing the callbacks of the queries which reached their deadline"""
+
+    def __init__(self, max_workers: int):
+        self.deadlines = []
+        # Handles of the deadlines in the heap which weren't unscheduled
+        self.scheduled = set()
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="query-cancel"
+        )
+        self.thread = None
+
+    def schedule(self, timeout: float, callback: Callable) -> int:
+        handle = next(self.counter)
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.deadlines, (time.monotonic() + timeout, handle, callback))
+            self.scheduled.add(handle)
+            self.condition.notify()
+        return handle
+
+    def unschedule(self, handle: int):
+        """The deadline stays in the heap until it is reached but its callback isn't fired"""
+        with self.condition:
+            self.scheduled.discard(handle)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.deadlines:
+                    self.condition.wait()
+                deadline, handle, callback = self.deadlines[0]
+                if handle not in self.scheduled:
+                    heapq.heappop(self.deadlines)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                heapq.heappop(self.deadlines)
+                self.scheduled.discard(handle)
+            # Cancelling can open a connection, it must not delay the other deadlines
+            self.executor.submit(callback)
+
+
+watchdog = Watchdog(QUERY_CANCEL_WORKERS)
+fallback_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUERY_FALLBACK_WORKERS", "16")),
+    thread_name_prefix="query-timeout",
+)
+
+
+class QueryCanceller(ABC):
+    """Sets the server-side statement timeout of a connection and cancels its running query"""
+
+    def set_timeout(self, connection: Connection, timeout: int):  # noqa: B027
+        """Sets the statement timeout of the connection, by default the dialect has none"""
+
+    def reset_timeout(self, connection: Connection):  # noqa: B027
+        """Restores the statement timeout of the connection, by default there is none to restore"""
+
+    @abstractmethod
+    def cancel(self, engine: Engine, dbapi_connection: Any, cursor: Any):
+        """Stops the query running on the connection, called from a watchdog thread"""
+
+
+class PostgresQueryCanceller(QueryCanceller):
+    def set_timeout(self, connection: Connection, timeout: int):
+        # LOCAL ends with the transaction, which is rolled back when the connection returns to the pool
+        connection.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+
+    def cancel(self, engine: Engine, dbapi_connection: Any, cursor: Any):  # noqa: ARG002
+        dbapi_connection.cancel()
+
+
+class MySQLQueryCanceller(QueryCanceller):
+    def set_timeout(self, connection: Connection, timeout: int):
+        connection.execute(
+            text(f"SET SESSION max_execution_time = {int(timeout * 1000)}")
+        )
+
+    def reset_timeout(self, connection: Connection):
+        connection.execute(
+            text(
+                f"SET SESSION max_execution_time = {DEFAULT_STATEMENT_TIMEOUT * 1000}"
+            )
+        )
+
+    def cancel(self, engine: Engine, dbapi_connection: Any, cursor: Any):  # noqa: ARG002
+        thread_id = dbapi_connection.thread_id()
+        with engine.connect() as connection:
+            connection.execute(text(f"KILL QUERY {int(thread_id)}"))
+
+
+class SnowflakeQueryCanceller(QueryCanceller):
+    def set_timeout(self, connection: Connection, timeout: int):
+        connection.execute(
+            text(f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {int(timeout)}")
+        )
+
+    def reset_timeout(self, connection: Connection):
+        connection.execute(text("ALTER SESSION UNSET STATEMENT_TIMEOUT_IN_SECONDS"))
+
+    def cancel(self, engine: Engine, dbapi_connection: Any, cursor: Any):  # noqa: ARG002
+        session_id = dbapi_connection.session_id
+        with engine.connect() as connection:
+            connection.execute(
+                text(f"SELECT SYSTEM$CANCEL_ALL_QUERIES({int(session_id)})")
+            )
+
+
+class InterruptQueryCanceller(QueryCanceller):
+    def cancel(self, engine: Engine, dbapi_connection: Any, cursor: Any):  # noqa: ARG002
+        dbapi_connection.interrupt()
+
+
+QUERY_CANCELLERS = {
+    "postgresql": PostgresQueryCanceller(),
+    "redshift": PostgresQueryCanceller(),
+    "mysql": MySQLQueryCanceller(),
+    "snowflake": SnowflakeQueryCanceller(),
+    "sqlite": InterruptQueryCanceller(),
+    "duckdb": InterruptQueryCanceller(),
+}
+
+
+def run_with_timeout(
+    engine: Engine, func: Callable[[Connection], Any], timeout: int | None = None
+) -> Any:
+    """Runs func with a connection of the engine, raising TimeoutError once the timeout is reached.
+
+    Where the dialect allows it the query gets a server-side statement timeout and is cancelled
+    from the watchdog thread, so the calling thread and the connection are released right away.
+    Otherwise func runs in a bounded pool and is abandoned, the database keeps running it.
+    """
+    timeout = timeout or SQL_EXECUTION_TIMEOUT
+    canceller = QUERY_CANCELLERS.get(engine.dialect.name)
+    if canceller is None:
+        future = fallback_executor.submit(_run_in_connection, engine, func)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError as e:
+            raise TimeoutError("Function execution exceeded the timeout") from e
+
+    with engine.connect() as connection:
+        with _cancel_on_timeout(engine, connection, canceller, timeout):
+            return func(connection)
+
+
+def _run_in_connection(engine: Engine, func: Callable[[Connection], Any]) -> Any:
+    with engine.connect() as connection:
+        return func(connection)
+
+
+@contextmanager
+def _cancel_on_timeout(
+    engine: Engine, connection: Connection, canceller: QueryCanceller, timeout: int
+):
+    dbapi_connection = connection.connection.dbapi_connection
+    cursors = []
+    timed_out = threading.Event()
+    finished = False
+    lock = threading.Lock()
+
+    def track_cursor(**kwargs):
+        cursors.append(kwargs["cursor"])
+
+    def cancel():
+        # The lock prevents cancelling a later query once the connection is back in the pool
+        with lock:
+            if finished:
+                return
+            timed_out.set()
+            try:
+                canceller.cancel(
+                    engine, dbapi_connection, cursors[-1] if cursors else None
+                )
+            except Exception as e:
+                logger.warning(f"Unable to cancel the query: {str(e)}")
+
+    event.listen(connection, "before_cursor_execute", track_cursor, named=True)
+    canceller.set_timeout(connection, timeout)
+    start = time.monotonic()
+    handle = watchdog.schedule(timeout, cancel)
+    try:
+        yield
+    except Exception as e:
+        if timed_out.is_set() or time.monotonic() - start >= timeout:
+            raise TimeoutError("Function execution exceeded the timeout") from e
+        raise
+    finally:
+        watchdog.unschedule(handle)
+        with lock:
+            finished = True
+        event.remove(connection, "before_cursor_execute", track_cursor)
+        try:
+            canceller.reset_timeout(connection)
+        except Exception:
+            # Never return a connection with a short statement timeout to the pool
+            connection.invalidate()
@@ -55,12 +55,12 @@ class DatabaseConnectionService:
                     database_connection.dialect.value,
                 )
             )
-        return SQLDatabase.get_sql_engine(database_connection, True)
+        return SQLDatabase.get_sql_engine(database_connection)
 
     def get_current_schema(
         self, database_connection: DatabaseConnection
     ) -> list[str] | None:
-        sql_database = SQLDatabase.get_sql_engine(database_connection, True)
+        sql_database = SQLDatabase.get_sql_engine(database_connection)
         inspector = inspect(sql_database.engine)
         if inspector.default_schema_name and database_connection.dialect not in [
             "mssql",
@@ -124,6 +124,7 @@ class DatabaseConnectionService:
             ssh_settings=database_connection_request.ssh_settings,
             file_storage=database_connection_request.file_storage,
             metadata=database_connection_request.metadata,
+            sql_validation=database_connection_request.sql_validation,
         )
         if database_connection.schemas and database_connection.dialect in [
             "redshift",
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, List
+
+from dataherald.db_scanner.models.types import TableDescription, TableDescriptionStatus
+from dataherald.db_scanner.repository.base import TableDescriptionRepository
+from dataherald.sql_generator.schema_catalog import SchemaCatalog
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_CONTEXT_TTL = int(os.getenv("CONNECTION_CONTEXT_TTL", "300"))
+
+
+class ConnectionContext:
+    """What the agents reuse across the questions of a db connection: the scanned tables,
+    the instructions, the LLM and embedding clients and the formatted agent prompts."""
+
+    def __init__(self, db_connection_id: str):
+        self.db_connection_id = db_connection_id
+        self.created_at = time.monotonic()
+        self.values = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def get(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self.values:
+                return self.values[key]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        # Built under the lock of its key so concurrent questions don't all build the same
+        # value, while the other values of the db connection can still be read and built
+        with key_lock:
+            with self.lock:
+                if key in self.values:
+                    return self.values[key]
+            value = factory()
+            with self.lock:
+                self.values[key] = value
+                self.key_locks.pop(key, None)
+            return value
+
+    def get_db_scan(self, storage) -> List[TableDescription]:
+        db_scan = self.get(
+            ("db_scan",),
+            lambda: TableDescriptionRepository(storage).get_all_tables_by_db(
+                {
+                    "db_connection_id": str(self.db_connection_id),
+                    "status": TableDescriptionStatus.SCANNED.value,
+                }
+            ),
+        )
+        return list(db_scan)
+
+    def get_schema_catalog(
+        self, storage, schemas: List[str] | None = None
+    ) -> SchemaCatalog:
+        """Catalog of the scanned tables of the schemas, or of all the tables"""
+
+        def build() -> SchemaCatalog:
+            db_scan = self.get_db_scan(storage)
+            if schemas:
+                db_scan = [table for table in db_scan if table.schema_name in schemas]
+            return SchemaCatalog(db_scan)
+
+        return self.get(("schema_catalog", tuple(schemas or [])), build)
+
+
+class ConnectionContextCache:
+    """Keeps a ConnectionContext per db connection until the scan, the table descriptions,
+    the instructions or the connection change. Contexts also expire after
+    CONNECTION_CONTEXT_TTL seconds to pick up the changes made by other processes."""
+
+    def __init__(self, ttl: int = CONNECTION_CONTEXT_TTL):
+        self.ttl = ttl
+        self.contexts = {}
+        self.lock = threading.Lock()
+
+    def get(self, db_connection_id: str) -> ConnectionContext:
+        db_connection_id = str(db_connection_id)
+        with self.lock:
+            context = self.contexts.get(db_connection_id)
+            if context is None or time.monotonic() - context.created_at > self.ttl:
+                context = ConnectionContext(db_connection_id)
+                self.contexts[db_connection_id] = context
+            return context
+
+    def invalidate(self, db_connection_id: str):
+        with self.lock:
+            if self.contexts.pop(str(db_connection_id), None) is not None:
+                logger.info(
+                    f"Dropped the cached context of db connection {db_connection_id}"
+                )
+
+
+connection_contexts = ConnectionContextCache()
@@ -1,8 +1,6 @@
-import os
-
 from dataherald.sql_database.base import SQLDatabase, SQLInjectionError
+from dataherald.sql_database.query_timeout import SQL_EXECUTION_TIMEOUT
 from dataherald.types import SQLGeneration
-from dataherald.utils.timeout_utils import run_with_timeout
 
 
 def format_error_message(
@@ -31,11 +29,7 @@ def create_sql_query_status(
     else:
         try:
             query = db.parser_to_filter_commands(query)
-            run_with_timeout(
-                db.run_sql,
-                args=(query,),
-                timeout_duration=int(os.getenv("SQL_EXECUTION_TIMEOUT", "60")),
-            )
+            db.validate_sql(query, timeout=SQL_EXECUTION_TIMEOUT)
             sql_generation.status = "VALID"
             sql_generation.error = None
         except TimeoutError:
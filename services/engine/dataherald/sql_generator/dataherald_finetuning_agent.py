@@ -6,9 +6,7 @@ from queue import Queue
 from threading import Thread
 from typing import Any, Callable, Dict, List, Type
 
-import numpy as np
 import openai
-import pandas as pd
 from google.api_core.exceptions import GoogleAPIError
 from langchain.agents.agent import AgentExecutor
 from langchain.agents.agent_toolkits.base import BaseToolkit
@@ -21,6 +19,7 @@ from langchain.callbacks.manager import (
 from langchain.chains.llm import LLMChain
 from langchain.tools.base import BaseTool
 from langchain_community.callbacks import get_openai_callback
+from langchain_core.embeddings import Embeddings
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from openai import OpenAI
 from overrides import override
@@ -30,18 +29,21 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from dataherald.context_store import ContextStore
 from dataherald.db import DB
-from dataherald.db_scanner.models.types import TableDescription, TableDescriptionStatus
-from dataherald.db_scanner.repository.base import TableDescriptionRepository
+from dataherald.db_scanner.models.types import TableDescription
 from dataherald.finetuning.openai_finetuning import OpenAIFineTuning
-from dataherald.repositories.finetunings import FinetuningsRepository
+from dataherald.finetuning.status_cache import finetuning_status_cache
 from dataherald.repositories.sql_generations import (
     SQLGenerationRepository,
 )
+from dataherald.services.table_embeddings import TableEmbeddingService
 from dataherald.sql_database.base import SQLDatabase, SQLInjectionError
 from dataherald.sql_database.models.types import (
     DatabaseConnection,
 )
+from dataherald.sql_database.query_timeout import SQL_EXECUTION_TIMEOUT
 from dataherald.sql_generator import EngineTimeOutORItemLimitError, SQLGenerator
+from dataherald.sql_generator.connection_context import connection_contexts
+from dataherald.sql_generator.schema_catalog import SchemaCatalog
 from dataherald.types import FineTuningStatus, Prompt, SQLGeneration
 from dataherald.utils.agent_prompts import (
     ERROR_PARSING_MESSAGE,
@@ -51,8 +53,9 @@ from dataherald.utils.agent_prompts import (
     FINETUNING_SYSTEM_INFORMATION,
     FORMAT_INSTRUCTIONS,
 )
+from dataherald.utils.embedding_cache import CachedEmbeddings
 from dataherald.utils.models_context_window import OPENAI_FINETUNING_MODELS_WINDOW_SIZES
-from dataherald.utils.timeout_utils import run_with_timeout
+from dataherald.utils.similarity import cosine_similarities, top_k
 
 logger = logging.getLogger(__name__)
 
@@ -163,7 +166,8 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     Use this tool to identify the relevant tables for the given question.
     """
     db_scan: List[TableDescription]
-    embedding: OpenAIEmbeddings
+    embedding: Embeddings
+    storage: Any = Field(exclude=True)
     few_shot_examples: List[dict] | None = Field(exclude=True, default=None)
 
     def get_embedding(
@@ -173,85 +177,71 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
         text = text.replace("\n", " ")
         return self.embedding.embed_query(text)
 
-    def get_docs_embedding(
-        self,
-        docs: List[str],
-    ) -> List[List[float]]:
-        return self.embedding.embed_documents(docs)
-
-    def cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        return round(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)), 4)
-
-    def similar_tables_based_on_few_shot_examples(self, df: pd.DataFrame) -> List[str]:
+    def similar_tables_based_on_few_shot_examples(
+        self, tables: List[tuple]
+    ) -> List[tuple]:
+        """Moves out of the ranked tables the ones used by the few shot examples"""
         most_similar_tables = set()
         if self.few_shot_examples is not None:
+            ranked_tables = {table[1] for table in tables}
             for example in self.few_shot_examples:
-                try:
-                    tables = Parser(example["sql"]).tables
-                except Exception as e:
-                    logger.error(f"Error parsing SQL: {str(e)}")
-                for table in tables:
-                    found_tables = df[df.table_name == table]
-                    for _, row in found_tables.iterrows():
-                        most_similar_tables.add((row["schema_name"], row["table_name"]))
-            df.drop(
-                df[
-                    df.table_name.isin([table[1] for table in most_similar_tables])
-                ].index,
-                inplace=True,
-            )
+                example_tables = example.get("tables")
+                if example_tables is None:
+                    try:
+                        example_tables = Parser(example["sql"]).tables
+                    except Exception as e:
+                        logger.error(f"Error parsing SQL: {str(e)}")
+                        continue
+                for table in example_tables:
+                    if table in ranked_tables:
+                        most_similar_tables.update(
+                            (row[0], row[1]) for row in tables if row[1] == table
+                        )
+            tables[:] = [
+                row
+                for row in tables
+                if row[1] not in {table[1] for table in most_similar_tables}
+            ]
         return most_similar_tables
 
+    @staticmethod
+    def format_table_name(schema_name: str | None, table_name: str) -> str:
+        if schema_name is not None:
+            return schema_name + "." + table_name
+        return table_name
+
     @catch_exceptions()
-    def _run(  # noqa: PLR0912
+    def _run(
         self,
         user_question: str,
         run_manager: CallbackManagerForToolRun | None = None,  # noqa: ARG002
     ) -> str:
         """Use the concatenation of table name, columns names, and the description of the table as the table representation"""
-        question_embedding = self.get_embedding(user_question)
-        table_representations = []
-        for table in self.db_scan:
-            col_rep = ""
-            for column in table.columns:
-                if column.description:
-                    col_rep += f"{column.name}: {column.description}, "
-                else:
-                    col_rep += f"{column.name}, "
-            if table.description:
-                table_rep = f"Table {table.table_name} contain columns: [{col_rep}], this tables has: {table.description}"
-            else:
-                table_rep = f"Table {table.table_name} contain columns: [{col_rep}]"
-            table_representations.append(
-                [table.schema_name, table.table_name, table_rep]
-            )
-        df = pd.DataFrame(
-            table_representations,
-            columns=["schema_name", "table_name", "table_representation"],
+        table_embeddings = TableEmbeddingService(self.storage).get_cached_embeddings(
+            self.db_scan, self.embedding, EMBEDDING_MODEL
         )
-        df["table_embedding"] = self.get_docs_embedding(df.table_representation)
-        df["similarities"] = df.table_embedding.apply(
-            lambda x: self.cosine_similarity(x, question_embedding)
+        similarities = cosine_similarities(
+            table_embeddings, self.get_embedding(user_question)
         )
-        df = df.sort_values(by="similarities", ascending=True)
-        df = df.tail(TOP_TABLES)
-        most_similar_tables = self.similar_tables_based_on_few_shot_examples(df)
-        table_relevance = ""
-        for _, row in df.iterrows():
-            if row["schema_name"] is not None:
-                table_name = row["schema_name"] + "." + row["table_name"]
-            else:
-                table_name = row["table_name"]
-            table_relevance += (
-                f'Table: `{table_name}`, relevance score: {row["similarities"]}\n'
+        tables = [
+            (
+                self.db_scan[index].schema_name,
+                self.db_scan[index].table_name,
+                round(float(similarities[index]), 4),
             )
-        if len(most_similar_tables) > 0:
-            for table in most_similar_tables:
-                if table[0] is not None:
-                    table_name = table[0] + "." + table[1]
-                else:
-                    table_name = table[1]
-                table_relevance += f"Table: `{table_name}`, relevance score: {max(df['similarities'])}\n"
+            for index in top_k(similarities, TOP_TABLES)
+        ]
+        top_score = tables[0][2] if tables else 0
+        most_similar_tables = self.similar_tables_based_on_few_shot_examples(tables)
+        if tables:
+            top_score = max(table[2] for table in tables)
+        # the finetuned models were trained with the most relevant tables listed last
+        tables.reverse()
+        table_relevance = ""
+        for schema_name, table_name, score in tables:
+            table_relevance += f"Table: `{self.format_table_name(schema_name, table_name)}`, relevance score: {score}\n"
+        for schema_name, table_name in most_similar_tables:
+            table_relevance += f"Table: `{self.format_table_name(schema_name, table_name)}`, relevance score: {top_score}\n"
         return table_relevance
 
     async def _arun(
@@ -286,11 +276,8 @@ class QuerySQLDataBaseTool(BaseSQLDatabaseTool, BaseTool):
             query = query.replace("```sql", "").replace("```", "")
 
         try:
-            return run_with_timeout(
-                self.db.run_sql,
-                args=(query,),
-                kwargs={"top_k": TOP_K},
-                timeout_duration=int(os.getenv("SQL_EXECUTION_TIMEOUT", "60")),
+            return self.db.run_sql(
+                query, top_k=TOP_K, timeout=SQL_EXECUTION_TIMEOUT
             )[0]
         except TimeoutError:
             return "SQL query execution time exceeded, proceed without query execution"
@@ -319,7 +306,8 @@ class GenerateSQL(BaseSQLDatabaseTool, BaseTool):
     db_scan: List[TableDescription]
     api_key: str = Field(exclude=True)
     openai_fine_tuning: OpenAIFineTuning = Field(exclude=True)
-    embedding: OpenAIEmbeddings = Field(exclude=True)
+    embedding: Embeddings = Field(exclude=True)
+    storage: Any = Field(exclude=True)
 
     @catch_exceptions()
     def _run(
@@ -328,12 +316,9 @@ class GenerateSQL(BaseSQLDatabaseTool, BaseTool):
         run_manager: CallbackManagerForToolRun | None = None,  # noqa: ARG002
     ) -> str:
         """Execute the query, return the results or an error message."""
-        table_representations = []
-        for table in self.db_scan:
-            table_representations.append(
-                self.openai_fine_tuning.create_table_representation(table)
-            )
-        table_embeddings = self.embedding.embed_documents(table_representations)
+        table_embeddings = TableEmbeddingService(self.storage).get_cached_embeddings(
+            self.db_scan, self.embedding, EMBEDDING_MODEL
+        )
         system_prompt = (
             FINETUNING_SYSTEM_INFORMATION
             + self.openai_fine_tuning.format_dataset(
@@ -374,10 +359,10 @@ class SchemaSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     Use this tool to find the schema of the specified tables, if you are unsure about the schema of the tables when editing the SQL query.
     Example Input: table1, table2, table3
     """
-    db_scan: List[TableDescription]
+    catalog: SchemaCatalog = Field(exclude=True)
 
     @catch_exceptions()
-    def _run(  # noqa: C901
+    def _run(
         self,
         table_names: str,
         run_manager: CallbackManagerForToolRun | None = None,  # noqa: ARG002
@@ -391,26 +376,10 @@ class SchemaSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
                 processed_table_names.append(formatted_table.split(".")[1])
             else:
                 processed_table_names.append(formatted_table)
-        tables_schema = ""
-        for table in self.db_scan:
-            if table.table_name in processed_table_names:
-                tables_schema += "```sql\n"
-                tables_schema += table.table_schema + "\n"
-                descriptions = []
-                if table.description is not None:
-                    if table.schema_name:
-                        table_name = f"{table.schema_name}.{table.table_name}"
-                    else:
-                        table_name = table.table_name
-                    descriptions.append(f"Table `{table_name}`: {table.description}\n")
-                    for column in table.columns:
-                        if column.description is not None:
-                            descriptions.append(
-                                f"Column `{column.name}`: {column.description}\n"
-                            )
-                if len(descriptions) > 0:
-                    tables_schema += f"/*\n{''.join(descriptions)}*/\n"
-                tables_schema += "```\n"
+        tables_schema = "".join(
+            f"```sql\n{table_schema}```\n"
+            for table_schema in self.catalog.get_table_schema(processed_table_names)
+        )
         if tables_schema == "":
             tables_schema += "Tables not found in the database"
         return tables_schema
@@ -429,12 +398,14 @@ class SQLDatabaseToolkit(BaseToolkit):
     db: SQLDatabase = Field(exclude=True)
     instructions: List[dict] | None = Field(exclude=True, default=None)
     db_scan: List[TableDescription] = Field(exclude=True)
+    catalog: SchemaCatalog = Field(exclude=True)
     api_key: str = Field(exclude=True)
     finetuning_model_id: str = Field(exclude=True)
     use_finetuned_model_only: bool = Field(exclude=True, default=None)
     model_name: str = Field(exclude=True)
     openai_fine_tuning: OpenAIFineTuning = Field(exclude=True)
-    embedding: OpenAIEmbeddings = Field(exclude=True)
+    embedding: Embeddings = Field(exclude=True)
+    storage: Any = Field(exclude=True)
     few_shot_examples: List[dict] | None = Field(exclude=True, default=None)
 
     @property
@@ -452,12 +423,13 @@ class SQLDatabaseToolkit(BaseToolkit):
         tools = []
         if not self.use_finetuned_model_only:
             tools.append(SystemTime(db=self.db))
-            tools.append(SchemaSQLDatabaseTool(db=self.db, db_scan=self.db_scan))
+            tools.append(SchemaSQLDatabaseTool(db=self.db, catalog=self.catalog))
             tools.append(
                 TablesSQLDatabaseTool(
                     db=self.db,
                     db_scan=self.db_scan,
                     embedding=self.embedding,
+                    storage=self.storage,
                     few_shot_examples=self.few_shot_examples,
                 )
             )
@@ -471,6 +443,7 @@ class SQLDatabaseToolkit(BaseToolkit):
                 model_name=self.model_name,
                 openai_fine_tuning=self.openai_fine_tuning,
                 embedding=self.embedding,
+                storage=self.storage,
             )
         )
         return tools
@@ -537,6 +510,19 @@ class DataheraldFinetuningAgent(SQLGenerator):
             **(agent_executor_kwargs or {}),
         )
 
+    def create_embedding(self, database_connection: DatabaseConnection) -> Embeddings:
+        if self.system.settings["azure_api_key"] is not None:
+            embedding = AzureOpenAIEmbeddings(
+                openai_api_key=database_connection.decrypt_api_key(),
+                model=EMBEDDING_MODEL,
+            )
+        else:
+            embedding = OpenAIEmbeddings(
+                openai_api_key=database_connection.decrypt_api_key(),
+                model=EMBEDDING_MODEL,
+            )
+        return CachedEmbeddings(embedding, EMBEDDING_MODEL)
+
     @override
     def generate_response(
         self,
@@ -565,58 +551,52 @@ class DataheraldFinetuningAgent(SQLGenerator):
             llm_config=self.llm_config,
             finetuning_id=self.finetuning_id,
         )
-        self.llm = self.model.get_model(
-            database_connection=database_connection,
-            temperature=0,
-            model_name=self.llm_config.llm_name,
-            api_base=self.llm_config.api_base,
-        )
-        repository = TableDescriptionRepository(storage)
-        db_scan = repository.get_all_tables_by_db(
-            {
-                "db_connection_id": str(database_connection.id),
-                "status": TableDescriptionStatus.SCANNED.value,
-            }
+        connection_context = connection_contexts.get(database_connection.id)
+        self.llm = connection_context.get(
+            ("llm", self.llm_config.llm_name, self.llm_config.api_base, False),
+            lambda: self.model.get_model(
+                database_connection=database_connection,
+                temperature=0,
+                model_name=self.llm_config.llm_name,
+                api_base=self.llm_config.api_base,
+            ),
         )
+        db_scan = connection_context.get_db_scan(storage)
         if not db_scan:
             raise ValueError("No scanned tables found for database")
         db_scan = SQLGenerator.filter_tables_by_schema(
             db_scan=db_scan, prompt=user_prompt
         )
+        catalog = connection_context.get_schema_catalog(storage, user_prompt.schemas)
         few_shot_examples, instructions = context_store.retrieve_context_for_question(
             user_prompt, number_of_samples=5
         )
-        finetunings_repository = FinetuningsRepository(storage)
-        finetuning = finetunings_repository.find_by_id(self.finetuning_id)
-        openai_fine_tuning = OpenAIFineTuning(self.system, storage, finetuning)
-        finetuning = openai_fine_tuning.retrieve_finetuning_job()
+        finetuning = finetuning_status_cache.get(
+            self.system, storage, self.finetuning_id
+        )
         if finetuning.status != FineTuningStatus.SUCCEEDED.value:
             raise FinetuningNotAvailableError(
                 f"Finetuning({self.finetuning_id}) has the status {finetuning.status}."
                 f"Finetuning should have the status {FineTuningStatus.SUCCEEDED.value} to generate SQL queries."
             )
+        openai_fine_tuning = OpenAIFineTuning(self.system, storage, finetuning)
         self.database = SQLDatabase.get_sql_engine(database_connection)
-        if self.system.settings["azure_api_key"] is not None:
-            embedding = AzureOpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
-        else:
-            embedding = OpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
+        embedding = connection_context.get(
+            ("embedding",), lambda: self.create_embedding(database_connection)
+        )
         toolkit = SQLDatabaseToolkit(
             db=self.database,
             instructions=instructions,
             few_shot_examples=few_shot_examples,
             db_scan=db_scan,
+            catalog=catalog,
             api_key=database_connection.decrypt_api_key(),
             finetuning_model_id=finetuning.model_id,
             use_finetuned_model_only=self.use_fintuned_model_only,
             model_name=finetuning.base_llm.model_name,
             openai_fine_tuning=openai_fine_tuning,
             embedding=embedding,
+            storage=storage,
         )
         agent_executor = self.create_sql_agent(
             toolkit=toolkit,
@@ -677,58 +657,52 @@ class DataheraldFinetuningAgent(SQLGenerator):
         context_store = self.system.instance(ContextStore)
         storage = self.system.instance(DB)
         sql_generation_repository = SQLGenerationRepository(storage)
-        self.llm = self.model.get_model(
-            database_connection=database_connection,
-            temperature=0,
-            model_name=self.llm_config.llm_name,
-            api_base=self.llm_config.api_base,
-            streaming=True,
-        )
-        repository = TableDescriptionRepository(storage)
-        db_scan = repository.get_all_tables_by_db(
-            {
-                "db_connection_id": str(database_connection.id),
-                "status": TableDescriptionStatus.SCANNED.value,
-            }
+        connection_context = connection_contexts.get(database_connection.id)
+        self.llm = connection_context.get(
+            ("llm", self.llm_config.llm_name, self.llm_config.api_base, True),
+            lambda: self.model.get_model(
+                database_connection=database_connection,
+                temperature=0,
+                model_name=self.llm_config.llm_name,
+                api_base=self.llm_config.api_base,
+                streaming=True,
+            ),
         )
+        db_scan = connection_context.get_db_scan(storage)
         if not db_scan:
             raise ValueError("No scanned tables found for database")
         db_scan = SQLGenerator.filter_tables_by_schema(
             db_scan=db_scan, prompt=user_prompt
         )
+        catalog = connection_context.get_schema_catalog(storage, user_prompt.schemas)
         _, instructions = context_store.retrieve_context_for_question(
             user_prompt, number_of_samples=1
         )
-        finetunings_repository = FinetuningsRepository(storage)
-        finetuning = finetunings_repository.find_by_id(self.finetuning_id)
-        openai_fine_tuning = OpenAIFineTuning(self.system, storage, finetuning)
-        finetuning = openai_fine_tuning.retrieve_finetuning_job()
+        finetuning = finetuning_status_cache.get(
+            self.system, storage, self.finetuning_id
+        )
         if finetuning.status != FineTuningStatus.SUCCEEDED.value:
             raise FinetuningNotAvailableError(
                 f"Finetuning({self.finetuning_id}) has the status {finetuning.status}."
                 f"Finetuning should have the status {FineTuningStatus.SUCCEEDED.value} to generate SQL queries."
             )
+        openai_fine_tuning = OpenAIFineTuning(self.system, storage, finetuning)
         self.database = SQLDatabase.get_sql_engine(database_connection)
-        if self.system.settings["azure_api_key"] is not None:
-            embedding = AzureOpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
-        else:
-            embedding = OpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
+        embedding = connection_context.get(
+            ("embedding",), lambda: self.create_embedding(database_connection)
+        )
         toolkit = SQLDatabaseToolkit(
             db=self.database,
             instructions=instructions,
             db_scan=db_scan,
+            catalog=catalog,
             api_key=database_connection.decrypt_api_key(),
             finetuning_model_id=finetuning.model_id,
             use_finetuned_model_only=self.use_fintuned_model_only,
             model_name=finetuning.base_llm.model_name,
             openai_fine_tuning=openai_fine_tuning,
             embedding=embedding,
+            storage=storage,
         )
         agent_executor = self.create_sql_agent(
             toolkit=toolkit,
@@ -7,9 +7,8 @@ from queue import Queue
 from threading import Thread
 from typing import Any, Callable, Dict, List
 
-import numpy as np
 import openai
-import pandas as pd
+import sqlalchemy
 from google.api_core.exceptions import GoogleAPIError
 from langchain.agents.agent import AgentExecutor
 from langchain.agents.agent_toolkits.base import BaseToolkit
@@ -20,8 +19,10 @@ from langchain.callbacks.manager import (
     CallbackManagerForToolRun,
 )
 from langchain.chains.llm import LLMChain
+from langchain.prompts import PromptTemplate
 from langchain.tools.base import BaseTool
 from langchain_community.callbacks import get_openai_callback
+from langchain_core.embeddings import Embeddings
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
 from overrides import override
 from pydantic import BaseModel, Field
@@ -30,17 +31,27 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from dataherald.context_store import ContextStore
 from dataherald.db import DB
-from dataherald.db_scanner.models.types import TableDescription, TableDescriptionStatus
-from dataherald.db_scanner.repository.base import TableDescriptionRepository
+from dataherald.db_scanner.models.types import TableDescription
 from dataherald.repositories.sql_generations import (
     SQLGenerationRepository,
 )
+from dataherald.services.entity_index import EntityIndex, EntityIndexService
+from dataherald.services.table_embeddings import TableEmbeddingService
 from dataherald.sql_database.base import SQLDatabase, SQLInjectionError
 from dataherald.sql_database.models.types import (
     DatabaseConnection,
 )
+from dataherald.sql_database.query_timeout import (
+    SQL_EXECUTION_TIMEOUT,
+    run_with_timeout,
+)
 from dataherald.sql_generator import EngineTimeOutORItemLimitError, SQLGenerator
-from dataherald.types import Prompt, SQLGeneration
+from dataherald.sql_generator.connection_context import (
+    ConnectionContext,
+    connection_contexts,
+)
+from dataherald.sql_generator.schema_catalog import SchemaCatalog
+from dataherald.types import Prompt, SQLGeneration, SQLGenerationPath
 from dataherald.utils.agent_prompts import (
     AGENT_PREFIX,
     ERROR_PARSING_MESSAGE,
@@ -52,7 +63,8 @@ from dataherald.utils.agent_prompts import (
     SUFFIX_WITH_FEW_SHOT_SAMPLES,
     SUFFIX_WITHOUT_FEW_SHOT_SAMPLES,
 )
-from dataherald.utils.timeout_utils import run_with_timeout
+from dataherald.utils.embedding_cache import CachedEmbeddings
+from dataherald.utils.similarity import cosine_similarities, top_k
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +72,33 @@ logger = logging.getLogger(__name__)
 TOP_K = SQLGenerator.get_upper_bound_limit()
 EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL","text-embedding-3-large")
 TOP_TABLES = 20
+# Values containing the entity read from the columns without a complete entity index
+ENTITY_FALLBACK_LIMIT = 1000
+# Shorter words of the entity match too many values to be searched on their own
+MIN_ENTITY_WORD_LENGTH = 3
+
+
+def parse_semantic_match_threshold(value: str | None) -> float | None:
+    """Returns the threshold as a float, None when it is missing or empty which disables the
+    semantic match"""
+    if value is None or not value.strip():
+        return None
+    try:
+        threshold = float(value)
+    except ValueError as e:
+        raise ValueError(
+            f"SEMANTIC_MATCH_THRESHOLD must be a number between 0 and 1, got {value}"
+        ) from e
+    if not 0 <= threshold <= 1:
+        raise ValueError(
+            f"SEMANTIC_MATCH_THRESHOLD must be a number between 0 and 1, got {value}"
+        )
+    return threshold
+
+
+SEMANTIC_MATCH_THRESHOLD = parse_semantic_match_threshold(
+    os.environ.get("SEMANTIC_MATCH_THRESHOLD")
+)
 
 
 def catch_exceptions():  # noqa: C901
@@ -167,11 +206,8 @@ class QuerySQLDataBaseTool(BaseSQLDatabaseTool, BaseTool):
             query = query.replace("```sql", "").replace("```", "")
 
         try:
-            return run_with_timeout(
-                self.db.run_sql,
-                args=(query,),
-                kwargs={"top_k": top_k},
-                timeout_duration=int(os.getenv("SQL_EXECUTION_TIMEOUT", "60")),
+            return self.db.run_sql(
+                query, top_k=top_k, timeout=SQL_EXECUTION_TIMEOUT
             )[0]
         except TimeoutError:
             return "SQL query execution time exceeded, proceed without query execution"
@@ -224,7 +260,8 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     Use this tool to identify the relevant tables for the given question.
     """
     db_scan: List[TableDescription]
-    embedding: OpenAIEmbeddings
+    embedding: Embeddings
+    storage: Any = Field(exclude=True)
     few_shot_examples: List[dict] | None = Field(exclude=True, default=None)
 
     def get_embedding(
@@ -234,85 +271,69 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
         text = text.replace("\n", " ")
         return self.embedding.embed_query(text)
 
-    def get_docs_embedding(
-        self,
-        docs: List[str],
-    ) -> List[List[float]]:
-        return self.embedding.embed_documents(docs)
-
-    def cosine_similarity(self, a: List[float], b: List[float]) -> float:
-        return round(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)), 4)
-
-    def similar_tables_based_on_few_shot_examples(self, df: pd.DataFrame) -> List[str]:
+    def similar_tables_based_on_few_shot_examples(
+        self, tables: List[tuple]
+    ) -> List[tuple]:
+        """Moves out of the ranked tables the ones used by the few shot examples"""
         most_similar_tables = set()
         if self.few_shot_examples is not None:
+            ranked_tables = {table[1] for table in tables}
             for example in self.few_shot_examples:
-                try:
-                    tables = Parser(example["sql"]).tables
-                except Exception as e:
-                    logger.error(f"Error parsing SQL: {str(e)}")
-                for table in tables:
-                    found_tables = df[df.table_name == table]
-                    for _, row in found_tables.iterrows():
-                        most_similar_tables.add((row["schema_name"], row["table_name"]))
-            df.drop(
-                df[
-                    df.table_name.isin([table[1] for table in most_similar_tables])
-                ].index,
-                inplace=True,
-            )
+                example_tables = example.get("tables")
+                if example_tables is None:
+                    try:
+                        example_tables = Parser(example["sql"]).tables
+                    except Exception as e:
+                        logger.error(f"Error parsing SQL: {str(e)}")
+                        continue
+                for table in example_tables:
+                    if table in ranked_tables:
+                        most_similar_tables.update(
+                            (row[0], row[1]) for row in tables if row[1] == table
+                        )
+            tables[:] = [
+                row
+                for row in tables
+                if row[1] not in {table[1] for table in most_similar_tables}
+            ]
         return most_similar_tables
 
+    @staticmethod
+    def format_table_name(schema_name: str | None, table_name: str) -> str:
+        if schema_name is not None:
+            return schema_name + "." + table_name
+        return table_name
+
     @catch_exceptions()
-    def _run(  # noqa: PLR0912
+    def _run(
         self,
         user_question: str,
         run_manager: CallbackManagerForToolRun | None = None,  # noqa: ARG002
     ) -> str:
         """Use the concatenation of table name, columns names, and the description of the table as the table representation"""
-        question_embedding = self.get_embedding(user_question)
-        table_representations = []
-        for table in self.db_scan:
-            col_rep = ""
-            for column in table.columns:
-                if column.description is not None:
-                    col_rep += f"{column.name}: {column.description}, "
-                else:
-                    col_rep += f"{column.name}, "
-            if table.description is not None:
-                table_rep = f"Table {table.table_name} contain columns: [{col_rep}], this tables has: {table.description}"
-            else:
-                table_rep = f"Table {table.table_name} contain columns: [{col_rep}]"
-            table_representations.append(
-                [table.schema_name, table.table_name, table_rep]
-            )
-        df = pd.DataFrame(
-            table_representations,
-            columns=["schema_name", "table_name", "table_representation"],
+        table_embeddings = TableEmbeddingService(self.storage).get_cached_embeddings(
+            self.db_scan, self.embedding, EMBEDDING_MODEL
         )
-        df["table_embedding"] = self.get_docs_embedding(df.table_representation)
-        df["similarities"] = df.table_embedding.apply(
-            lambda x: self.cosine_similarity(x, question_embedding)
+        similarities = cosine_similarities(
+            table_embeddings, self.get_embedding(user_question)
         )
-        df = df.sort_values(by="similarities", ascending=False)
-        df = df.head(TOP_TABLES)
-        most_similar_tables = self.similar_tables_based_on_few_shot_examples(df)
-        table_relevance = ""
-        for _, row in df.iterrows():
-            if row["schema_name"] is not None:
-                table_name = row["schema_name"] + "." + row["table_name"]
-            else:
-                table_name = row["table_name"]
-            table_relevance += (
-                f'Table: `{table_name}`, relevance score: {row["similarities"]}\n'
+        tables = [
+            (
+                self.db_scan[index].schema_name,
+                self.db_scan[index].table_name,
+                round(float(similarities[index]), 4),
             )
-        if len(most_similar_tables) > 0:
-            for table in most_similar_tables:
-                if table[0] is not None:
-                    table_name = table[0] + "." + table[1]
-                else:
-                    table_name = table[1]
-                table_relevance += f"Table: `{table_name}`, relevance score: {max(df['similarities'])}\n"
+            for index in top_k(similarities, TOP_TABLES)
+        ]
+        top_score = tables[0][2] if tables else 0
+        most_similar_tables = self.similar_tables_based_on_few_shot_examples(tables)
+        if tables:
+            top_score = max(table[2] for table in tables)
+        table_relevance = ""
+        for schema_name, table_name, score in tables:
+            table_relevance += f"Table: `{self.format_table_name(schema_name, table_name)}`, relevance score: {score}\n"
+        for schema_name, table_name in most_similar_tables:
+            table_relevance += f"Table: `{self.format_table_name(schema_name, table_name)}`, relevance score: {top_score}\n"
         return table_relevance
 
     async def _arun(
@@ -334,8 +355,55 @@ class ColumnEntityChecker(BaseSQLDatabaseTool, BaseTool):
 
     Example Input: table1 -> column2, entity
     """
-    db_scan: List[TableDescription]
+    catalog: SchemaCatalog = Field(exclude=True)
     is_multiple_schema: bool
+    storage: Any = Field(exclude=True)
+
+    def find_table(self, table_name: str) -> TableDescription | None:
+        schema_name = None
+        if "." in table_name:
+            schema_name, table_name = table_name.split(".", 1)
+            schema_name = schema_name.strip()
+        for table in self.catalog.get_tables([table_name.strip()]):
+            if schema_name is None or table.schema_name == schema_name:
+                return table
+        return None
+
+    def get_entity_index(self, table_name: str, column_name: str) -> EntityIndex | None:
+        table = self.find_table(table_name)
+        if table is None:
+            return None
+        return connection_contexts.get(table.db_connection_id).get(
+            ("entity_index", table.id, column_name),
+            lambda: EntityIndexService(self.storage).get_index(table.id, column_name),
+        )
+
+    def search_column(self, table_name: str, column_name: str, entity: str) -> list:
+        """Fallback for the columns without a complete entity index. The values containing
+        the entity or one of its words are returned, at most ENTITY_FALLBACK_LIMIT of them,
+        but the database still scans the whole column to find them"""
+        column = sqlalchemy.literal_column(column_name)
+        words = {entity.strip().lower()} | {
+            word
+            for word in entity.lower().split()
+            if len(word) >= MIN_ENTITY_WORD_LENGTH
+        }
+        query = (
+            sqlalchemy.select([column])
+            .select_from(sqlalchemy.text(table_name))
+            .where(
+                sqlalchemy.or_(
+                    *[sqlalchemy.func.lower(column).like(f"%{word}%") for word in words]
+                )
+            )
+            .distinct()
+            .limit(ENTITY_FALLBACK_LIMIT)
+        )
+        return run_with_timeout(
+            self.db.engine,
+            lambda connection: connection.execute(query).fetchall(),
+            SQL_EXECUTION_TIMEOUT,
+        )
 
     def find_similar_strings(
         self, input_list: List[tuple], target_string: str, threshold=0.4
@@ -367,29 +435,31 @@ class ColumnEntityChecker(BaseSQLDatabaseTool, BaseTool):
                 )
         except ValueError:
             return "Invalid input format, use following format: table_name -> column_name, entity (entity should be a string without ',')"
-        search_pattern = f"%{entity.strip().lower()}%"
-        search_query = f"SELECT DISTINCT {column_name} FROM {table_name} WHERE {column_name} ILIKE :search_pattern"  # noqa: S608
-        try:
-            search_results = self.db.engine.execute(
-                search_query, {"search_pattern": search_pattern}
-            ).fetchall()
-            search_results = search_results[:25]
-        except SQLAlchemyError:
-            search_results = []
-        distinct_query = (
-            f"SELECT DISTINCT {column_name} FROM {table_name}"  # noqa: S608
-        )
-        results = self.db.engine.execute(distinct_query).fetchall()
-        results = self.find_similar_strings(results, entity)
+        entity_index = self.get_entity_index(table_name, column_name)
+        target = entity.strip().lower()
+        values = entity_index.search(entity) if entity_index is not None else []
+        # A sampled index may miss the value, the column is queried unless it was found
+        if entity_index is None or (
+            entity_index.sampled and target not in (value.lower() for value in values)
+        ):
+            try:
+                search_results = self.search_column(table_name, column_name, entity)
+            except SQLAlchemyError:
+                search_results = []
+            values += [
+                item[0] for item in self.find_similar_strings(search_results, entity)
+            ]
+            values += [
+                str(item[0]).strip()
+                for item in search_results
+                if target in str(item[0]).lower()
+            ][:25]
         similar_items = "Similar items:\n"
         already_added = {}
-        for item in results:
-            similar_items += f"{item[0]}\n"
-            already_added[item[0]] = True
-        if len(search_results) > 0:
-            for item in search_results:
-                if item[0] not in already_added:
-                    similar_items += f"{item[0]}\n"
+        for value in values:
+            if value not in already_added:
+                similar_items += f"{value}\n"
+                already_added[value] = True
         return similar_items
 
     async def _arun(
@@ -411,7 +481,7 @@ class SchemaSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
 
     Example Input: table1, table2, table3
     """
-    db_scan: List[TableDescription]
+    catalog: SchemaCatalog = Field(exclude=True)
 
     @catch_exceptions()
     def _run(  # noqa: C901
@@ -428,28 +498,10 @@ class SchemaSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
                 processed_table_names.append(formatted_table.split(".")[1])
             else:
                 processed_table_names.append(formatted_table)
-        tables_schema = "```sql\n"
-        for table in self.db_scan:
-            if table.table_name in processed_table_names:
-                tables_schema += table.table_schema + "\n"
-                descriptions = []
-                if table.description is not None:
-                    if table.schema_name:
-                        table_name = f"{table.schema_name}.{table.table_name}"
-                    else:
-                        table_name = table.table_name
-                    descriptions.append(f"Table `{table_name}`: {table.description}\n")
-                    for column in table.columns:
-                        if column.description is not None:
-                            descriptions.append(
-                                f"Column `{column.name}`: {column.description}\n"
-                            )
-                if len(descriptions) > 0:
-                    tables_schema += f"/*\n{''.join(descriptions)}*/\n"
-        tables_schema += "```\n"
-        if tables_schema == "":
-            tables_schema += "Tables not found in the database"
-        return tables_schema
+        tables_schema = self.catalog.get_table_schema(processed_table_names)
+        if not tables_schema:
+            return "Tables not found in the database"
+        return f"```sql\n{''.join(tables_schema)}```\n"
 
     async def _arun(
         self,
@@ -470,7 +522,7 @@ class InfoRelevantColumns(BaseSQLDatabaseTool, BaseTool):
 
     Example Input: table1 -> column1, table1 -> column2, table2 -> column1
     """
-    db_scan: List[TableDescription]
+    catalog: SchemaCatalog = Field(exclude=True)
 
     @catch_exceptions()
     def _run(  # noqa: C901, PLR0912
@@ -480,39 +532,23 @@ class InfoRelevantColumns(BaseSQLDatabaseTool, BaseTool):
     ) -> str:
         """Get the column level information."""
         items_list = column_names.split(", ")
-        column_full_info = ""
+        column_full_info = []
         for item in items_list:
-            if " -> " in item:
-                table_name, column_name = item.split(" -> ")
-                if "." in table_name:
-                    table_name = table_name.split(".")[1]
-                table_name = replace_unprocessable_characters(table_name)
-                column_name = replace_unprocessable_characters(column_name)
-                found = False
-                for table in self.db_scan:
-                    if table_name == table.table_name:
-                        col_info = ""
-                        for column in table.columns:
-                            if column_name == column.name:
-                                found = True
-                                col_info += f"Description: {column.description},"
-                                if column.low_cardinality:
-                                    col_info += f" categories = {column.categories},"
-                        col_info += " Sample rows: "
-                        if found:
-                            for row in table.examples:
-                                col_info += row[column_name] + ", "
-                            col_info = col_info[:-2]
-                            if table.schema_name:
-                                schema_table = f"{table.schema_name}.{table.table_name}"
-                            else:
-                                schema_table = table.table_name
-                            column_full_info += f"Table: {schema_table}, column: {column_name}, additional info: {col_info}\n"
-            else:
+            if " -> " not in item:
                 return "Malformed input, input should be in the following format Example Input: table1 -> column1, table1 -> column2, table2 -> column1"  # noqa: E501
-            if not found:
-                column_full_info += f"Table: {table_name}, column: {column_name} not found in database\n"
-        return column_full_info
+            table_name, column_name = item.split(" -> ")
+            if "." in table_name:
+                table_name = table_name.split(".")[1]
+            table_name = replace_unprocessable_characters(table_name)
+            column_name = replace_unprocessable_characters(column_name)
+            column_info = self.catalog.get_column_info(table_name, column_name)
+            if column_info:
+                column_full_info.extend(column_info)
+            else:
+                column_full_info.append(
+                    f"Table: {table_name}, column: {column_name} not found in database\n"
+                )
+        return "".join(column_full_info)
 
     async def _arun(
         self,
@@ -571,7 +607,9 @@ class SQLDatabaseToolkit(BaseToolkit):
     few_shot_examples: List[dict] | None = Field(exclude=True, default=None)
     instructions: List[dict] | None = Field(exclude=True, default=None)
     db_scan: List[TableDescription] = Field(exclude=True)
-    embedding: OpenAIEmbeddings = Field(exclude=True)
+    catalog: SchemaCatalog = Field(exclude=True)
+    embedding: Embeddings = Field(exclude=True)
+    storage: Any = Field(exclude=True)
     is_multiple_schema: bool = False
 
     @property
@@ -602,22 +640,24 @@ class SQLDatabaseToolkit(BaseToolkit):
             context=self.context,
             db_scan=self.db_scan,
             embedding=self.embedding,
+            storage=self.storage,
             few_shot_examples=self.few_shot_examples,
         )
         tools.append(tables_sql_db_tool)
         schema_sql_db_tool = SchemaSQLDatabaseTool(
-            db=self.db, context=self.context, db_scan=self.db_scan
+            db=self.db, context=self.context, catalog=self.catalog
         )
         tools.append(schema_sql_db_tool)
         info_relevant_tool = InfoRelevantColumns(
-            db=self.db, context=self.context, db_scan=self.db_scan
+            db=self.db, context=self.context, catalog=self.catalog
         )
         tools.append(info_relevant_tool)
         column_sample_tool = ColumnEntityChecker(
             db=self.db,
             context=self.context,
-            db_scan=self.db_scan,
+            catalog=self.catalog,
             is_multiple_schema=self.is_multiple_schema,
+            storage=self.storage,
         )
         tools.append(column_sample_tool)
         if self.few_shot_examples is not None:
@@ -645,9 +685,47 @@ class DataheraldSQLAgent(SQLGenerator):
                 returned_result.append(example)
         return returned_result
 
+    def generate_response_from_similar_question(
+        self, user_prompt: Prompt, few_shot_examples: List[dict] | None
+    ) -> SQLGeneration | None:
+        """Returns the SQL of the closest golden SQL without running the agent when its question
+        is similar enough to the prompt and the SQL is still valid. The similarity is the score
+        the vector store returned for the golden SQL"""
+        if SEMANTIC_MATCH_THRESHOLD is None or not few_shot_examples:
+            return None
+        matches = [
+            example
+            for example in few_shot_examples
+            if example.get("similarity") is not None
+        ]
+        if not matches:
+            return None
+        best_match = max(matches, key=lambda example: example["similarity"])
+        if best_match["similarity"] < SEMANTIC_MATCH_THRESHOLD:
+            return None
+
+        logger.info(
+            f"Prompt matches the golden SQL question {best_match['prompt_text']} "
+            f"with a similarity of {best_match['similarity']:.4f}"
+        )
+        response = SQLGeneration(
+            prompt_id=user_prompt.id,
+            llm_config=self.llm_config,
+            created_at=datetime.datetime.now(),
+            sql=best_match["sql"],
+            tokens_used=0,
+            generation_path=SQLGenerationPath.SEMANTIC_MATCH.value,
+        )
+        response = self.create_sql_query_status(self.database, response.sql, response)
+        if response.status != "VALID":
+            return None
+        response.completed_at = datetime.datetime.now()
+        return response
+
     def create_sql_agent(
         self,
         toolkit: SQLDatabaseToolkit,
+        *,
         callback_manager: BaseCallbackManager | None = None,
         prefix: str = AGENT_PREFIX,
         suffix: str | None = None,
@@ -662,22 +740,90 @@ class DataheraldSQLAgent(SQLGenerator):
         early_stopping_method: str = "generate",
         verbose: bool = False,
         agent_executor_kwargs: Dict[str, Any] | None = None,
+        connection_context: ConnectionContext | None = None,
         **kwargs: Dict[str, Any],
     ) -> AgentExecutor:
         """Construct an SQL agent from an LLM and tools."""
         tools = toolkit.get_tools()
+        if connection_context is not None:
+            # The prompt only depends on the tools and the dialect, which don't change for a db connection
+            prompt = connection_context.get(
+                (
+                    "prompt",
+                    type(self).__name__,
+                    prefix,
+                    suffix,
+                    format_instructions,
+                    tuple(input_variables or []),
+                    max_examples,
+                    number_of_instructions,
+                ),
+                lambda: self.create_prompt(
+                    toolkit,
+                    tools,
+                    prefix,
+                    suffix,
+                    format_instructions,
+                    input_variables,
+                    max_examples,
+                    number_of_instructions,
+                ),
+            )
+        else:
+            prompt = self.create_prompt(
+                toolkit,
+                tools,
+                prefix,
+                suffix,
+                format_instructions,
+                input_variables,
+                max_examples,
+                number_of_instructions,
+            )
+        llm_chain = LLMChain(
+            llm=self.llm,
+            prompt=prompt,
+            callback_manager=callback_manager,
+        )
+        tool_names = [tool.name for tool in tools]
+        agent = ZeroShotAgent(llm_chain=llm_chain, allowed_tools=tool_names, **kwargs)
+        return AgentExecutor.from_agent_and_tools(
+            agent=agent,
+            tools=tools,
+            callback_manager=callback_manager,
+            verbose=verbose,
+            max_iterations=max_iterations,
+            max_execution_time=max_execution_time,
+            early_stopping_method=early_stopping_method,
+            **(agent_executor_kwargs or {}),
+        )
+
+    def create_prompt(  # noqa: PLR0913, PLR0917
+        self,
+        toolkit: SQLDatabaseToolkit,
+        tools: List[BaseTool],
+        prefix: str,
+        suffix: str | None,
+        format_instructions: str,
+        input_variables: List[str] | None,
+        max_examples: int,
+        number_of_instructions: int,
+    ) -> PromptTemplate:
+        """Builds the prompt of the agent, the suffix defaults to the one matching the plan"""
         if max_examples > 0 and number_of_instructions > 0:
             plan = PLAN_WITH_FEWSHOT_EXAMPLES_AND_INSTRUCTIONS
-            suffix = SUFFIX_WITH_FEW_SHOT_SAMPLES
+            default_suffix = SUFFIX_WITH_FEW_SHOT_SAMPLES
         elif max_examples > 0:
             plan = PLAN_WITH_FEWSHOT_EXAMPLES
-            suffix = SUFFIX_WITH_FEW_SHOT_SAMPLES
+            default_suffix = SUFFIX_WITH_FEW_SHOT_SAMPLES
         elif number_of_instructions > 0:
             plan = PLAN_WITH_INSTRUCTIONS
-            suffix = SUFFIX_WITHOUT_FEW_SHOT_SAMPLES
+            default_suffix = SUFFIX_WITHOUT_FEW_SHOT_SAMPLES
         else:
             plan = PLAN_BASE
-            suffix = SUFFIX_WITHOUT_FEW_SHOT_SAMPLES
+            default_suffix = SUFFIX_WITHOUT_FEW_SHOT_SAMPLES
+        if suffix is None:
+            suffix = default_suffix
         plan = plan.format(
             dialect=toolkit.dialect,
             max_examples=max_examples,
@@ -685,30 +831,88 @@ class DataheraldSQLAgent(SQLGenerator):
         prefix = prefix.format(
             dialect=toolkit.dialect, max_examples=max_examples, agent_plan=plan
         )
-        prompt = ZeroShotAgent.create_prompt(
+        return ZeroShotAgent.create_prompt(
             tools,
             prefix=prefix,
             suffix=suffix,
             format_instructions=format_instructions,
             input_variables=input_variables,
         )
-        llm_chain = LLMChain(
-            llm=self.llm,
-            prompt=prompt,
-            callback_manager=callback_manager,
+
+    def create_embedding(self, database_connection: DatabaseConnection) -> Embeddings:
+        # Set Embeddings class depending on azure / not azure
+        if self.system.settings["azure_api_key"] is not None:
+            embedding = AzureOpenAIEmbeddings(
+                openai_api_key=database_connection.decrypt_api_key(),
+                model=EMBEDDING_MODEL,
+            )
+        else:
+            embedding = OpenAIEmbeddings(
+                openai_api_key=database_connection.decrypt_api_key(),
+                model=EMBEDDING_MODEL,
+            )
+        return CachedEmbeddings(embedding, EMBEDDING_MODEL)
+
+    def get_llm(
+        self,
+        database_connection: DatabaseConnection,
+        connection_context: ConnectionContext,
+        streaming: bool = False,
+    ) -> Any:
+        """The LLM client of the db connection, reused across its questions"""
+        return connection_context.get(
+            ("llm", self.llm_config.llm_name, self.llm_config.api_base, streaming),
+            lambda: self.model.get_model(
+                database_connection=database_connection,
+                temperature=0,
+                model_name=self.llm_config.llm_name,
+                api_base=self.llm_config.api_base,
+                **({"streaming": True} if streaming else {}),
+            ),
         )
-        tool_names = [tool.name for tool in tools]
-        agent = ZeroShotAgent(llm_chain=llm_chain, allowed_tools=tool_names, **kwargs)
-        return AgentExecutor.from_agent_and_tools(
-            agent=agent,
-            tools=tools,
-            callback_manager=callback_manager,
-            verbose=verbose,
-            max_iterations=max_iterations,
-            max_execution_time=max_execution_time,
-            early_stopping_method=early_stopping_method,
-            **(agent_executor_kwargs or {}),
+
+    def retrieve_question_context(
+        self,
+        user_prompt: Prompt,
+        connection_context: ConnectionContext,
+        storage: DB,
+    ) -> dict:
+        """Returns the scanned tables of the question schemas with their catalog, and the
+        few-shot examples and instructions retrieved for the question"""
+        db_scan = connection_context.get_db_scan(storage)
+        if not db_scan:
+            raise ValueError("No scanned tables found for database")
+        context_store = self.system.instance(ContextStore)
+        few_shot_examples, instructions = context_store.retrieve_context_for_question(
+            user_prompt, number_of_samples=self.max_number_of_examples
         )
+        if few_shot_examples is not None:
+            few_shot_examples = self.remove_duplicate_examples(few_shot_examples)
+        return {
+            "db_scan": SQLGenerator.filter_tables_by_schema(
+                db_scan=db_scan, prompt=user_prompt
+            ),
+            "catalog": connection_context.get_schema_catalog(
+                storage, user_prompt.schemas
+            ),
+            "few_shot_examples": few_shot_examples,
+            "instructions": instructions,
+        }
+
+    def create_agent_executor(
+        self, toolkit: SQLDatabaseToolkit, connection_context: ConnectionContext
+    ) -> AgentExecutor:
+        agent_executor = self.create_sql_agent(
+            toolkit=toolkit,
+            verbose=True,
+            max_examples=len(toolkit.few_shot_examples or []),
+            number_of_instructions=len(toolkit.instructions or []),
+            max_execution_time=int(os.environ.get("DH_ENGINE_TIMEOUT", 150)),
+            connection_context=connection_context,
+        )
+        agent_executor.return_intermediate_steps = True
+        agent_executor.handle_parsing_errors = ERROR_PARSING_MESSAGE
+        return agent_executor
 
     @override
     def generate_response(  # noqa: PLR0912
@@ -718,78 +922,35 @@ class DataheraldSQLAgent(SQLGenerator):
         context: List[dict] = None,
         metadata: dict = None,
     ) -> SQLGeneration:  # noqa: PLR0912
-        context_store = self.system.instance(ContextStore)
         storage = self.system.instance(DB)
         response = SQLGeneration(
             prompt_id=user_prompt.id,
             llm_config=self.llm_config,
             created_at=datetime.datetime.now(),
         )
-        self.llm = self.model.get_model(
-            database_connection=database_connection,
-            temperature=0,
-            model_name=self.llm_config.llm_name,
-            api_base=self.llm_config.api_base,
+        connection_context = connection_contexts.get(database_connection.id)
+        self.llm = self.get_llm(database_connection, connection_context)
+        question_context = self.retrieve_question_context(
+            user_prompt, connection_context, storage
         )
-        repository = TableDescriptionRepository(storage)
-        db_scan = repository.get_all_tables_by_db(
-            {
-                "db_connection_id": str(database_connection.id),
-                "status": TableDescriptionStatus.SCANNED.value,
-            }
-        )
-        if not db_scan:
-            raise ValueError("No scanned tables found for database")
-        db_scan = SQLGenerator.filter_tables_by_schema(
-            db_scan=db_scan, prompt=user_prompt
-        )
-        few_shot_examples, instructions = context_store.retrieve_context_for_question(
-            user_prompt, number_of_samples=self.max_number_of_examples
-        )
-        if few_shot_examples is not None:
-            new_fewshot_examples = self.remove_duplicate_examples(few_shot_examples)
-            number_of_samples = len(new_fewshot_examples)
-        else:
-            new_fewshot_examples = None
-            number_of_samples = 0
         logger.info(f"Generating SQL response to question: {str(user_prompt.dict())}")
         self.database = SQLDatabase.get_sql_engine(database_connection)
-        # Set Embeddings class depending on azure / not azure
-        if self.system.settings["azure_api_key"] is not None:
-            toolkit = SQLDatabaseToolkit(
-                db=self.database,
-                context=context,
-                few_shot_examples=new_fewshot_examples,
-                instructions=instructions,
-                is_multiple_schema=True if user_prompt.schemas else False,
-                db_scan=db_scan,
-                embedding=AzureOpenAIEmbeddings(
-                    openai_api_key=database_connection.decrypt_api_key(),
-                    model=EMBEDDING_MODEL,
-                ),
-            )
-        else:
-            toolkit = SQLDatabaseToolkit(
-                db=self.database,
-                context=context,
-                few_shot_examples=new_fewshot_examples,
-                instructions=instructions,
-                is_multiple_schema=True if user_prompt.schemas else False,
-                db_scan=db_scan,
-                embedding=OpenAIEmbeddings(
-                    openai_api_key=database_connection.decrypt_api_key(),
-                    model=EMBEDDING_MODEL,
-                ),
-            )
-        agent_executor = self.create_sql_agent(
-            toolkit=toolkit,
-            verbose=True,
-            max_examples=number_of_samples,
-            number_of_instructions=len(instructions) if instructions is not None else 0,
-            max_execution_time=int(os.environ.get("DH_ENGINE_TIMEOUT", 150)),
+        similar_question_response = self.generate_response_from_similar_question(
+            user_prompt, question_context["few_shot_examples"]
         )
-        agent_executor.return_intermediate_steps = True
-        agent_executor.handle_parsing_errors = ERROR_PARSING_MESSAGE
+        if similar_question_response is not None:
+            return similar_question_response
+        toolkit = SQLDatabaseToolkit(
+            db=self.database,
+            context=context,
+            is_multiple_schema=True if user_prompt.schemas else False,
+            embedding=connection_context.get(
+                ("embedding",), lambda: self.create_embedding(database_connection)
+            ),
+            storage=storage,
+            **question_context,
+        )
+        agent_executor = self.create_agent_executor(toolkit, connection_context)
         with get_openai_callback() as cb:
             try:
                 result = agent_executor.invoke(
@@ -819,9 +980,10 @@ class DataheraldSQLAgent(SQLGenerator):
         print("CBCBCBCBCBCBCBCBCBCB",str(cb))
         logger.info(f"cost: {str(cb.total_cost)} tokens: {str(cb.total_tokens)}")
         response.sql = replace_unprocessable_characters(sql_query)
+        response.generation_path = SQLGenerationPath.AGENT.value
         response.tokens_used = cb.total_tokens
         response.completed_at = datetime.datetime.now()
-        if number_of_samples > 0:
+        if toolkit.few_shot_examples:
             suffix = SUFFIX_WITH_FEW_SHOT_SAMPLES
         else:
             suffix = SUFFIX_WITHOUT_FEW_SHOT_SAMPLES
@@ -843,68 +1005,26 @@ class DataheraldSQLAgent(SQLGenerator):
         queue: Queue,
         metadata: dict = None,
     ):
-        context_store = self.system.instance(ContextStore)
         storage = self.system.instance(DB)
         sql_generation_repository = SQLGenerationRepository(storage)
-        self.llm = self.model.get_model(
-            database_connection=database_connection,
-            temperature=0,
-            model_name=self.llm_config.llm_name,
-            api_base=self.llm_config.api_base,
-            streaming=True,
-        )
-        repository = TableDescriptionRepository(storage)
-        db_scan = repository.get_all_tables_by_db(
-            {
-                "db_connection_id": str(database_connection.id),
-                "status": TableDescriptionStatus.SCANNED.value,
-            }
+        connection_context = connection_contexts.get(database_connection.id)
+        self.llm = self.get_llm(database_connection, connection_context, streaming=True)
+        question_context = self.retrieve_question_context(
+            user_prompt, connection_context, storage
         )
-        if not db_scan:
-            raise ValueError("No scanned tables found for database")
-        db_scan = SQLGenerator.filter_tables_by_schema(
-            db_scan=db_scan, prompt=user_prompt
-        )
-        few_shot_examples, instructions = context_store.retrieve_context_for_question(
-            user_prompt, number_of_samples=self.max_number_of_examples
-        )
-        if few_shot_examples is not None:
-            new_fewshot_examples = self.remove_duplicate_examples(few_shot_examples)
-            number_of_samples = len(new_fewshot_examples)
-        else:
-            new_fewshot_examples = None
-            number_of_samples = 0
         self.database = SQLDatabase.get_sql_engine(database_connection)
-        # Set Embeddings class depending on azure / not azure
-        if self.system.settings["azure_api_key"] is not None:
-            embedding = AzureOpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
-        else:
-            embedding = OpenAIEmbeddings(
-                openai_api_key=database_connection.decrypt_api_key(),
-                model=EMBEDDING_MODEL,
-            )
         toolkit = SQLDatabaseToolkit(
             queuer=queue,
             db=self.database,
             context=[{}],
-            few_shot_examples=new_fewshot_examples,
-            instructions=instructions,
             is_multiple_schema=True if user_prompt.schemas else False,
-            db_scan=db_scan,
-            embedding=embedding,
-        )
-        agent_executor = self.create_sql_agent(
-            toolkit=toolkit,
-            verbose=True,
-            max_examples=number_of_samples,
-            number_of_instructions=len(instructions) if instructions is not None else 0,
-            max_execution_time=int(os.environ.get("DH_ENGINE_TIMEOUT", 150)),
+            embedding=connection_context.get(
+                ("embedding",), lambda: self.create_embedding(database_connection)
+            ),
+            storage=storage,
+            **question_context,
         )
-        agent_executor.return_intermediate_steps = True
-        agent_executor.handle_parsing_errors = ERROR_PARSING_MESSAGE
+        agent_executor = self.create_agent_executor(toolkit, connection_context)
         thread = Thread(
             target=self.stream_agent_steps,
             args=(
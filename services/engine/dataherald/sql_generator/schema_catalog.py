@@ -0,0 +1,86 @@
+from typing import Iterable, List
+
+from dataherald.db_scanner.models.types import ColumnDetail, TableDescription
+
+
+class SchemaCatalog:
+    """Indexes the scanned tables by name and by column and renders their schema once, so the
+    agent tools and the evaluator don't scan db_scan on every call"""
+
+    def __init__(self, db_scan: List[TableDescription]):
+        self.db_scan = db_scan
+        self.positions = {}
+        self.columns = {}
+        for position, table in enumerate(db_scan):
+            self.positions.setdefault(table.table_name, []).append(position)
+            for column in table.columns:
+                self.columns.setdefault((table.table_name, column.name), []).append(
+                    (position, column)
+                )
+        self.table_schemas = {}
+        self.column_infos = {}
+
+    def get_tables(self, table_names: Iterable[str]) -> List[TableDescription]:
+        """Returns the tables with one of the names in the order of db_scan"""
+        positions = set()
+        for table_name in table_names:
+            positions.update(self.positions.get(table_name, []))
+        return [self.db_scan[position] for position in sorted(positions)]
+
+    def get_table_schema(self, table_names: Iterable[str]) -> List[str]:
+        """Returns the DDL of the tables followed by their table and column descriptions"""
+        result = []
+        positions = set()
+        for table_name in table_names:
+            positions.update(self.positions.get(table_name, []))
+        for position in sorted(positions):
+            if position not in self.table_schemas:
+                self.table_schemas[position] = self.render_table_schema(
+                    self.db_scan[position]
+                )
+            result.append(self.table_schemas[position])
+        return result
+
+    def get_column_info(self, table_name: str, column_name: str) -> List[str]:
+        """Returns the description, categories and sample values of the column of every table
+        with the name"""
+        result = []
+        for position, column in self.columns.get((table_name, column_name), []):
+            key = (position, column_name)
+            if key not in self.column_infos:
+                self.column_infos[key] = self.render_column_info(
+                    self.db_scan[position], column
+                )
+            result.append(self.column_infos[key])
+        return result
+
+    @staticmethod
+    def get_full_table_name(table: TableDescription) -> str:
+        if table.schema_name:
+            return f"{table.schema_name}.{table.table_name}"
+        return table.table_name
+
+    def render_table_schema(self, table: TableDescription) -> str:
+        table_schema = f"{table.table_schema}\n"
+        if table.description is None:
+            return table_schema
+        descriptions = [
+            f"Table `{self.get_full_table_name(table)}`: {table.description}\n"
+        ]
+        descriptions.extend(
+            f"Column `{column.name}`: {column.description}\n"
+            for column in table.columns
+            if column.description is not None
+        )
+        return f"{table_schema}/*\n{''.join(descriptions)}*/\n"
+
+    def render_column_info(self, table: TableDescription, column: ColumnDetail) -> str:
+        col_info = f"Description: {column.description},"
+        if column.low_cardinality:
+            col_info += f" categories = {column.categories},"
+        sample_rows = "".join(f"{row.get(column.name)}, " for row in table.examples)
+        col_info = f"{col_info} Sample rows: {sample_rows}"[:-2]
+        return (
+            f"Table: {self.get_full_table_name(table)}, column: {column.name}, "
+            f"additional info: {col_info}\n"
+        )
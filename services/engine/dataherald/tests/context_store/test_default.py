@@ -0,0 +1,34 @@
+import pytest
+
+from dataherald.context_store.default import (
+    RRF_K,
+    MalformedGoldenSQLError,
+    reciprocal_rank_fusion,
+    validate_golden_sql,
+)
+
+
+def test_reciprocal_rank_fusion_sums_the_rankings():
+    scores = reciprocal_rank_fusion([["a", "b"], ["b", "c"]])
+
+    assert scores["a"] == 1 / (RRF_K + 1)
+    assert scores["b"] == 1 / (RRF_K + 2) + 1 / (RRF_K + 1)
+    assert scores["c"] == 1 / (RRF_K + 2)
+    assert sorted(scores, key=scores.get, reverse=True)[0] == "b"
+
+
+def test_reciprocal_rank_fusion_empty():
+    assert reciprocal_rank_fusion([]) == {}
+    assert reciprocal_rank_fusion([[], []]) == {}
+
+
+def test_validate_golden_sql_returns_the_sql_metadata():
+    metadata = validate_golden_sql("SELECT id FROM sales.orders", ["sales"])
+
+    assert metadata["tables"] == ["sales.orders"]
+    assert metadata["schemas"] == ["sales"]
+
+
+def test_validate_golden_sql_rejects_other_schemas():
+    with pytest.raises(MalformedGoldenSQLError):
+        validate_golden_sql("SELECT id FROM sales.orders", ["finance"])
@@ -38,6 +38,18 @@ class TestDB(DB):
 
         return ObjectId("651f2d76275132d5b65175eb")
 
+    @override
+    def insert_many(self, collection: str, objs: list[dict]) -> list:
+        return [self.insert_one(collection, obj) for obj in objs]
+
+    @override
+    def upsert_many(self, collection: str, objs: list[dict]) -> list:
+        return [self.insert_one(collection, obj) for obj in objs]
+
+    @override
+    def update_one(self, collection: str, query: dict, update: dict) -> int:  # noqa: ARG002
+        return 0
+
     @override
     def find_one(self, collection: str, query: dict) -> dict:  # noqa: ARG002
         if collection in self.memory:
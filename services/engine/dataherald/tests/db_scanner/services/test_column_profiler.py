@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine
+from sqlalchemy.sql import func
+
+from dataherald.db_scanner.services.base_scanner import BaseScanner
+from dataherald.db_scanner.services.column_profiler import (
+    MAX_CATEGORY_VALUE,
+    build_column_profiles,
+    count_distinct_values,
+    select_distinct_values,
+)
+from dataherald.sql_database.base import SQLDatabase
+
+ROWS_NUMBER = 150
+DISTINCT_VALUES = 2
+VALUES_LIMIT = 10
+
+
+@pytest.fixture
+def table_and_database():
+    engine = create_engine("sqlite://")
+    table = Table(
+        "orders",
+        MetaData(),
+        Column("id", Integer),
+        Column("status", String),
+        Column("constant", String),
+    )
+    table.create(engine)
+    engine.execute(
+        table.insert(),
+        [
+            {"id": id, "status": "open" if id % 2 else "closed", "constant": "a"}
+            for id in range(ROWS_NUMBER)
+        ],
+    )
+    return table, SQLDatabase(engine)
+
+
+def test_select_distinct_values_is_bounded(table_and_database):
+    table, database = table_and_database
+    values = select_distinct_values([table.c.id, table.c.status], database, VALUES_LIMIT)
+
+    assert len(values["id"]) == VALUES_LIMIT
+    assert sorted(values["status"]) == ["closed", "open"]
+
+
+def test_count_distinct_values(table_and_database):
+    table, database = table_and_database
+    counts = count_distinct_values(
+        [table.c.id, table.c.status],
+        database,
+        lambda column: func.count(func.distinct(column)),
+    )
+
+    assert counts == {"id": ROWS_NUMBER, "status": DISTINCT_VALUES}
+
+
+def test_build_column_profiles_only_selects_the_categories(table_and_database):
+    table, database = table_and_database
+    profiles = build_column_profiles(
+        [table.c.id, table.c.status, table.c.constant],
+        database,
+        {"id": ROWS_NUMBER, "status": DISTINCT_VALUES, "constant": None},
+    )
+
+    assert profiles["id"].categories is None
+    assert sorted(profiles["status"].categories) == ["closed", "open"]
+    assert profiles["constant"].distinct_count is None
+    assert profiles["constant"].categories is None
+
+
+def test_base_scanner_profile_columns(table_and_database):
+    table, database = table_and_database
+    profiles = BaseScanner().profile_columns(
+        [table.c.id, table.c.status, table.c.constant], database
+    )
+
+    assert profiles["id"].distinct_count is None
+    assert profiles["id"].categories is None
+    assert profiles["status"].distinct_count == DISTINCT_VALUES
+    assert sorted(profiles["status"].categories) == ["closed", "open"]
+    assert profiles["constant"].distinct_count == 1
+    assert profiles["constant"].categories is None
+    assert ROWS_NUMBER > MAX_CATEGORY_VALUE
@@ -0,0 +1,87 @@
+import threading
+
+from bson.objectid import ObjectId
+
+from dataherald.finetuning.status_cache import FinetuningStatusCache
+from dataherald.types import Finetuning, FineTuningStatus
+
+STORAGE_READS = 2
+
+
+class FinetuningStorage:
+    def __init__(self, rows: list[dict]):
+        self.rows = {row["_id"]: row for row in rows}
+        self.reads = 0
+
+    def find_one(self, collection: str, query: dict) -> dict | None:  # noqa: ARG002
+        self.reads += 1
+        row = self.rows.get(query["_id"])
+        return dict(row) if row else None
+
+
+class RetrievingStatusCache(FinetuningStatusCache):
+    """Moves the jobs to the next status instead of calling the provider"""
+
+    def __init__(self, statuses: list[str], refresh_interval: int = 60):
+        super().__init__(refresh_interval)
+        self.statuses = statuses
+        self.retrieved = threading.Event()
+
+    def retrieve(
+        self, system, storage, finetuning: Finetuning
+    ) -> Finetuning:  # noqa: ARG002
+        self.retrieved.set()
+        status = self.statuses.pop(0) if self.statuses else finetuning.status
+        return finetuning.copy(update={"status": status})
+
+
+def finetuning_row(status: str) -> dict:
+    return {"_id": ObjectId(), "status": status, "schemas": None, "metadata": None}
+
+
+def test_terminal_jobs_are_served_from_memory():
+    row = finetuning_row(FineTuningStatus.SUCCEEDED.value)
+    storage = FinetuningStorage([row])
+    cache = RetrievingStatusCache([])
+
+    assert cache.get(None, storage, str(row["_id"])).status == "SUCCEEDED"
+    assert cache.get(None, storage, str(row["_id"])).status == "SUCCEEDED"
+    assert storage.reads == 1
+    assert not cache.retrieved.is_set()
+    assert cache.refresh_thread is None
+
+
+def test_missing_jobs_are_not_cached():
+    cache = RetrievingStatusCache([])
+
+    assert cache.get(None, FinetuningStorage([]), str(ObjectId())) is None
+    assert cache.finetunings == {}
+
+
+def test_jobs_in_progress_are_refreshed_until_they_end():
+    row = finetuning_row(FineTuningStatus.QUEUED.value)
+    cache = RetrievingStatusCache(
+        [FineTuningStatus.RUNNING.value, FineTuningStatus.SUCCEEDED.value],
+        refresh_interval=0,
+    )
+
+    assert cache.get(None, FinetuningStorage([row]), str(row["_id"])).status == (
+        "RUNNING"
+    )
+    # The thread clears itself once no job is in progress
+    refresh_thread = cache.refresh_thread
+    if refresh_thread is not None:
+        refresh_thread.join(timeout=5)
+    assert cache.refresh_thread is None
+    assert cache.finetunings[str(row["_id"])].status == "SUCCEEDED"
+
+
+def test_invalidate():
+    row = finetuning_row(FineTuningStatus.FAILED.value)
+    storage = FinetuningStorage([row])
+    cache = RetrievingStatusCache([])
+    cache.get(None, storage, str(row["_id"]))
+    cache.invalidate(str(row["_id"]))
+    cache.get(None, storage, str(row["_id"]))
+
+    assert storage.reads == STORAGE_READS
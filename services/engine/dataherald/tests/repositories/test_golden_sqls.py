@@ -0,0 +1,54 @@
+from bson.objectid import ObjectId
+
+from dataherald.repositories.golden_sqls import GoldenSQLRepository
+
+
+class GoldenSQLStorage:
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.queries = []
+
+    def find(self, collection: str, query: dict) -> list:  # noqa: ARG002
+        self.queries.append(query)
+        ids = query["_id"]["$in"]
+        # Mongo doesn't keep the order of $in
+        return [dict(row) for row in reversed(self.rows) if row["_id"] in ids]
+
+
+def golden_sql_row(prompt_text: str) -> dict:
+    return {
+        "_id": ObjectId(),
+        "prompt_text": prompt_text,
+        "sql": "SELECT 1",
+        "db_connection_id": ObjectId(),
+        "metadata": None,
+    }
+
+
+def test_find_by_ids_keeps_the_order_of_the_ids():
+    rows = [golden_sql_row("first"), golden_sql_row("second"), golden_sql_row("third")]
+    storage = GoldenSQLStorage(rows)
+    ids = [str(rows[2]["_id"]), str(rows[0]["_id"]), str(rows[1]["_id"])]
+
+    golden_sqls = GoldenSQLRepository(storage).find_by_ids(ids)
+
+    assert [golden_sql.prompt_text for golden_sql in golden_sqls] == [
+        "third",
+        "first",
+        "second",
+    ]
+    assert golden_sqls[0].db_connection_id == str(rows[2]["db_connection_id"])
+    assert len(storage.queries) == 1
+
+
+def test_find_by_ids_skips_the_invalid_and_missing_ids():
+    rows = [golden_sql_row("first")]
+    storage = GoldenSQLStorage(rows)
+
+    golden_sqls = GoldenSQLRepository(storage).find_by_ids(
+        ["invalid", str(ObjectId()), str(rows[0]["_id"])]
+    )
+
+    assert [golden_sql.prompt_text for golden_sql in golden_sqls] == ["first"]
+    assert GoldenSQLRepository(storage).find_by_ids(["invalid"]) == []
+    assert len(storage.queries) == 1
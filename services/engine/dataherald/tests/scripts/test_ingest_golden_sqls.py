@@ -0,0 +1,150 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from bson.objectid import ObjectId
+
+from dataherald.scripts.ingest_golden_sqls import (
+    ingest,
+    load_checkpoint,
+    read_batches,
+    save_checkpoint,
+)
+
+DB_CONNECTION_ID = str(ObjectId())
+BATCH_SIZE = 2
+LINES = 5
+VALID_LINES = 4
+
+
+class IngestStorage:
+    def __init__(self):
+        self.golden_sqls = {}
+
+    def find_one(self, collection: str, query: dict) -> dict | None:  # noqa: ARG002
+        if str(query["_id"]) != DB_CONNECTION_ID:
+            return None
+        return {
+            "_id": query["_id"],
+            "alias": "test",
+            "connection_uri": "sqlite:///test.db",
+            "schemas": None,
+        }
+
+    def insert_many(self, collection: str, objs: list[dict]) -> list:  # noqa: ARG002
+        ids = []
+        for obj in objs:
+            assert obj["_id"] not in self.golden_sqls
+            self.golden_sqls[obj["_id"]] = obj
+            ids.append(obj["_id"])
+        return ids
+
+    def upsert_many(self, collection: str, objs: list[dict]) -> list:  # noqa: ARG002
+        for obj in objs:
+            self.golden_sqls[obj["_id"]] = obj
+        return [obj["_id"] for obj in objs]
+
+
+class IngestVectorStore:
+    def __init__(self, fail_on_add: bool = False):
+        self.fail_on_add = fail_on_add
+        self.records = {}
+
+    def add_records(self, golden_sqls: list, collection: str):  # noqa: ARG002
+        if self.fail_on_add:
+            raise ConnectionError("vector store unavailable")
+        for golden_sql in golden_sqls:
+            self.records[golden_sql.id] = golden_sql
+
+    def delete_record(self, collection: str, id: str):  # noqa: ARG002
+        del self.records[id]
+
+
+@pytest.fixture
+def golden_sqls_file(tmp_path):
+    path = tmp_path / "golden_sqls.jsonl"
+    lines = [
+        {
+            "prompt_text": f"question {number}",
+            "sql": f"SELECT * FROM table_{number}",
+            "db_connection_id": DB_CONNECTION_ID,
+        }
+        for number in range(VALID_LINES)
+    ]
+    rows = [json.dumps(line) for line in lines]
+    rows.insert(1, "not json")
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+def run_ingest(path: str, storage, vector_store) -> dict:
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return ingest(
+            path,
+            storage=storage,
+            vector_store=vector_store,
+            collection="golden_sqls",
+            pool=pool,
+            workers=1,
+            batch_size=BATCH_SIZE,
+            checkpoint_path=f"{path}.checkpoint",
+        )
+
+
+def test_load_checkpoint_defaults_and_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    checkpoint = load_checkpoint(path)
+    assert checkpoint == {
+        "line": 0,
+        "stored": 0,
+        "skipped": 0,
+        "pending": {},
+        "pending_line": 0,
+    }
+
+    checkpoint["line"] = BATCH_SIZE
+    checkpoint["pending"] = {"3": str(ObjectId())}
+    save_checkpoint(path, checkpoint)
+    assert load_checkpoint(path) == checkpoint
+
+
+def test_read_batches_starts_after_the_checkpoint_line(golden_sqls_file):
+    batches = list(read_batches(golden_sqls_file, BATCH_SIZE, BATCH_SIZE))
+
+    assert [end_line for end_line, _ in batches] == [4, 5]
+    assert [line_number for line_number, _ in batches[0][1]] == [3, 4]
+    assert [line_number for line_number, _ in batches[1][1]] == [5]
+
+
+def test_ingest_stores_the_valid_lines(golden_sqls_file):
+    storage = IngestStorage()
+    vector_store = IngestVectorStore()
+
+    checkpoint = run_ingest(golden_sqls_file, storage, vector_store)
+
+    assert checkpoint["line"] == LINES
+    assert checkpoint["stored"] == VALID_LINES
+    assert checkpoint["skipped"] == 1
+    assert checkpoint["pending"] == {}
+    assert len(storage.golden_sqls) == VALID_LINES
+    assert {str(id) for id in storage.golden_sqls} == set(vector_store.records)
+
+
+def test_ingest_resumes_the_interrupted_batch_with_the_same_ids(golden_sqls_file):
+    storage = IngestStorage()
+    with pytest.raises(ConnectionError):
+        run_ingest(golden_sqls_file, storage, IngestVectorStore(fail_on_add=True))
+    checkpoint = load_checkpoint(f"{golden_sqls_file}.checkpoint")
+    assert checkpoint["line"] == 0
+    assert checkpoint["pending_line"] == BATCH_SIZE
+    pending_ids = set(checkpoint["pending"].values())
+    assert {str(id) for id in storage.golden_sqls} == pending_ids
+
+    vector_store = IngestVectorStore()
+    checkpoint = run_ingest(golden_sqls_file, storage, vector_store)
+
+    assert checkpoint["line"] == LINES
+    assert checkpoint["stored"] == VALID_LINES
+    assert len(storage.golden_sqls) == VALID_LINES
+    assert pending_ids <= set(vector_store.records)
+    assert {str(id) for id in storage.golden_sqls} == set(vector_store.records)
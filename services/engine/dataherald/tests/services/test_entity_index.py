@@ -0,0 +1,29 @@
+from dataherald.services.entity_index import EntityIndex, trigrams
+
+CANDIDATES_LIMIT = 3
+
+
+def test_trigrams_are_padded_and_lowercased():
+    assert trigrams("Ab") == {"  a", " ab", "ab "}
+
+
+def test_entity_index_search_finds_similar_values():
+    index = EntityIndex(["New York", "Newark", "York", "Los Angeles"])
+
+    assert index.search("new york")[0] == "New York"
+    assert "Los Angeles" not in index.search("new york")
+
+
+def test_entity_index_search_returns_values_containing_the_entity():
+    index = EntityIndex(["International Business Machines", "Apple"])
+
+    assert index.search("business", threshold=0.9) == [
+        "International Business Machines"
+    ]
+
+
+def test_entity_index_candidates_are_limited():
+    index = EntityIndex([f"value {number}" for number in range(10)])
+
+    assert len(index.candidates("value", limit=CANDIDATES_LIMIT)) == CANDIDATES_LIMIT
+    assert EntityIndex([]).search("value") == []
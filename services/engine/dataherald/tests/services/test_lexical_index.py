@@ -0,0 +1,173 @@
+from bson.objectid import ObjectId
+
+from dataherald.services.lexical_index import (
+    BM25Index,
+    GoldenSQLLexicalIndexes,
+    tokenize,
+)
+from dataherald.types import GoldenSQL
+
+REBUILDS = 2
+
+
+class GoldenSQLStorage:
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.queries = []
+
+    def find(
+        self, collection: str, query: dict, page: int = 0, limit: int = 0
+    ):  # noqa: ARG002
+        self.queries.append(query)
+        return [
+            dict(row)
+            for row in self.rows
+            if row["db_connection_id"] == query["db_connection_id"]
+        ]
+
+
+def golden_sql(id: str, prompt_text: str, sql: str, db_connection_id: str = "1"):
+    return GoldenSQL(
+        id=id, prompt_text=prompt_text, sql=sql, db_connection_id=db_connection_id
+    )
+
+
+def test_tokenize_splits_snake_case_identifiers():
+    assert tokenize("SELECT order_id") == ["select", "order_id", "order", "id"]
+
+
+def test_bm25_index_ranks_matching_golden_sqls():
+    index = BM25Index()
+    index.add(golden_sql("1", "Total sales by region", "SELECT region FROM sales"))
+    index.add(golden_sql("2", "Number of users", "SELECT COUNT(*) FROM users"))
+    index.add(golden_sql("3", "Active users", "SELECT * FROM users WHERE active"))
+    index.add(golden_sql("4", "Orders per day", "SELECT day FROM orders"))
+
+    assert [match.id for match in index.search("sales per region", 2)][0] == "1"
+    assert {match.id for match in index.search("users", 5)} == {"2", "3"}
+
+
+def test_bm25_index_remove_and_replace():
+    index = BM25Index()
+    index.add(golden_sql("1", "Total sales", "SELECT * FROM sales"))
+    index.add(golden_sql("1", "Number of users", "SELECT * FROM users"))
+    index.add(golden_sql("2", "Orders per day", "SELECT * FROM orders"))
+
+    assert index.search("sales", 5) == []
+    assert index.remove("1")
+    assert not index.remove("1")
+    assert "users" not in index.postings
+    assert index.total_length == index.lengths["2"]
+
+
+def test_bm25_index_empty():
+    assert BM25Index().search("sales", 5) == []
+
+
+def test_lexical_indexes_build_once_and_add():
+    storage = GoldenSQLStorage(
+        [
+            {
+                "_id": ObjectId(),
+                "prompt_text": "Total sales by region",
+                "sql": "SELECT region FROM sales",
+                "db_connection_id": "1",
+                "metadata": None,
+            }
+        ]
+    )
+    indexes = GoldenSQLLexicalIndexes()
+
+    assert len(indexes.search(storage, "1", "sales", 5)) == 1
+    indexes.add([golden_sql("2", "Sales per day", "SELECT day FROM sales")])
+    indexes.add([golden_sql("3", "Sales per day", "SELECT day FROM sales", "2")])
+
+    assert [match.id for match in indexes.search(storage, "1", "day", 5)] == ["2"]
+    assert len(storage.queries) == 1
+    assert "2" not in indexes.indexes
+    indexes.remove(["2"])
+    assert indexes.search(storage, "1", "day", 5) == []
+
+
+def test_lexical_indexes_drop_least_recently_used():
+    storage = GoldenSQLStorage([])
+    indexes = GoldenSQLLexicalIndexes(max_indexes=2)
+    indexes.search(storage, "1", "sales", 5)
+    indexes.search(storage, "2", "sales", 5)
+    indexes.search(storage, "1", "sales", 5)
+    indexes.search(storage, "3", "sales", 5)
+
+    assert list(indexes.indexes) == ["1", "3"]
+
+
+def test_lexical_indexes_rebuild_in_the_background_after_ttl():
+    storage = GoldenSQLStorage([])
+    indexes = GoldenSQLLexicalIndexes(ttl=-1)
+    indexes.search(storage, "1", "sales", 5)
+    stale_entry = indexes.indexes["1"]
+    assert indexes.search(storage, "1", "sales", 5) == []
+
+    stale_entry["rebuild_thread"].join(timeout=5)
+    assert len(storage.queries) == REBUILDS
+    assert indexes.indexes["1"] is not stale_entry
+    assert indexes.builds == {}
+
+
+class ChangingGoldenSQLStorage(GoldenSQLStorage):
+    """Adds and removes golden sqls while the index is read from the storage"""
+
+    def __init__(self, rows: list[dict], indexes: GoldenSQLLexicalIndexes):
+        super().__init__(rows)
+        self.indexes = indexes
+
+    def find(
+        self, collection: str, query: dict, page: int = 0, limit: int = 0
+    ):  # noqa: ARG002
+        rows = super().find(collection, query, page, limit)
+        self.indexes.add([golden_sql("2", "Sales per day", "SELECT day FROM sales")])
+        self.indexes.remove([str(self.rows[0]["_id"])])
+        return rows
+
+
+def test_lexical_indexes_keep_the_changes_made_while_building():
+    indexes = GoldenSQLLexicalIndexes(ttl=-1)
+    storage = ChangingGoldenSQLStorage(
+        [
+            {
+                "_id": ObjectId(),
+                "prompt_text": "Total sales by region",
+                "sql": "SELECT region FROM sales",
+                "db_connection_id": "1",
+                "metadata": None,
+            }
+        ],
+        indexes,
+    )
+
+    assert [match.id for match in indexes.search(storage, "1", "sales", 5)] == ["2"]
+    stale_entry = indexes.indexes["1"]
+    indexes.search(storage, "1", "sales", 5)
+    stale_entry["rebuild_thread"].join(timeout=5)
+
+    assert [match.id for match in indexes.search(storage, "1", "sales", 5)] == ["2"]
+
+
+class FailingGoldenSQLStorage(GoldenSQLStorage):
+    def find(
+        self, collection: str, query: dict, page: int = 0, limit: int = 0
+    ):  # noqa: ARG002
+        if self.queries:
+            raise ConnectionError("storage unavailable")
+        return super().find(collection, query, page, limit)
+
+
+def test_lexical_indexes_keep_the_index_when_the_rebuild_fails():
+    storage = FailingGoldenSQLStorage([])
+    indexes = GoldenSQLLexicalIndexes(ttl=-1)
+    indexes.search(storage, "1", "sales", 5)
+    stale_entry = indexes.indexes["1"]
+    indexes.search(storage, "1", "sales", 5)
+    stale_entry["rebuild_thread"].join(timeout=5)
+
+    assert indexes.indexes["1"] is stale_entry
+    assert indexes.builds == {}
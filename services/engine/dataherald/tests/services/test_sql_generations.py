@@ -0,0 +1,11 @@
+from dataherald.services.sql_generations import csv_chunks
+
+
+def test_csv_chunks_writes_a_chunk_per_batch():
+    chunks = list(csv_chunks(["id", "name"], iter([[(1, "a,b")], [(2, None)]])))
+
+    assert chunks == ['id,name\n1,"a,b"\n', "2,\n"]
+
+
+def test_csv_chunks_without_rows():
+    assert list(csv_chunks(["id"], iter([]))) == ["id\n"]
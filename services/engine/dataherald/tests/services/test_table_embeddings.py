@@ -0,0 +1,87 @@
+from typing import List
+
+from bson.objectid import ObjectId
+from langchain_core.embeddings import Embeddings
+
+from dataherald.db_scanner.models.types import ColumnDetail, TableDescription
+from dataherald.services.table_embeddings import TableEmbeddingService
+from dataherald.sql_generator.connection_context import connection_contexts
+
+EMBEDDING_CALLS = 2
+
+
+class TableEmbeddingStorage:
+    def __init__(self):
+        self.rows = []
+        self.finds = 0
+
+    def find(self, collection: str, query: dict) -> list:  # noqa: ARG002
+        self.finds += 1
+        ids = query["table_description_id"]
+        ids = ids["$in"] if isinstance(ids, dict) else [ids]
+        return [dict(row) for row in self.rows if row["table_description_id"] in ids]
+
+    def update_or_create(self, collection: str, query: dict, obj: dict):  # noqa: ARG002
+        self.rows = [
+            row
+            for row in self.rows
+            if row["table_description_id"] != query["table_description_id"]
+        ]
+        self.rows.append({"_id": ObjectId(), **obj})
+        return self.rows[-1]["_id"]
+
+    def delete_by_id(self, collection: str, id: str) -> int:  # noqa: ARG002
+        self.rows = [row for row in self.rows if str(row["_id"]) != id]
+        return 1
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def table(id: str, table_name: str) -> TableDescription:
+    return TableDescription(
+        id=id,
+        db_connection_id="table-embeddings",
+        table_name=table_name,
+        columns=[ColumnDetail(name="id")],
+    )
+
+
+def test_get_embeddings_only_embeds_the_changed_tables():
+    storage = TableEmbeddingStorage()
+    embedding = CountingEmbeddings()
+    service = TableEmbeddingService(storage)
+    service.get_embeddings([table("1", "users")], embedding, "model")
+    matrix = service.get_embeddings(
+        [table("1", "users"), table("2", "orders")], embedding, "model"
+    )
+
+    assert matrix.shape == (2, 2)
+    assert len(embedding.calls) == EMBEDDING_CALLS
+    assert len(embedding.calls[1]) == 1
+
+
+def test_get_cached_embeddings_reads_the_storage_once():
+    storage = TableEmbeddingStorage()
+    embedding = CountingEmbeddings()
+    service = TableEmbeddingService(storage)
+    tables = [table("1", "users"), table("2", "orders")]
+    connection_contexts.invalidate("table-embeddings")
+
+    first = service.get_cached_embeddings(tables, embedding, "model")
+    assert service.get_cached_embeddings(tables, embedding, "model") is first
+    assert storage.finds == 1
+
+    service.invalidate("1", "table-embeddings")
+    assert service.get_cached_embeddings(tables, embedding, "model") is not first
+    assert embedding.calls[-1] == embedding.calls[0][:1]
+    assert service.get_cached_embeddings([], embedding, "model").shape == (0, 0)
@@ -0,0 +1,76 @@
+from dataherald.config import Settings, System
+from dataherald.smart_cache.in_memory import InMemorySmartCache, normalize_prompt
+from dataherald.types import SQLGeneration
+
+MAX_SIZE = 2
+HITS = 2
+
+
+def smart_cache(max_size: int = 1000, ttl: int = 3600) -> InMemorySmartCache:
+    cache = InMemorySmartCache(System(Settings()))
+    cache.max_size = max_size
+    cache.ttl = ttl
+    return cache
+
+
+def sql_generation(sql: str = "SELECT 1") -> SQLGeneration:
+    return SQLGeneration(prompt_id="1", sql=sql, status="VALID")
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  How many   Users? ") == "how many users"
+
+
+def test_create_key_normalizes_the_prompt():
+    cache = smart_cache()
+
+    assert cache.create_key("1", "How many users?", {}) == cache.create_key(
+        "1", "how many  users", {}
+    )
+    assert cache.create_key("1", "How many users", {}) != cache.create_key(
+        "1", "How many users", {"evaluate": True}
+    )
+    assert cache.create_key("1", "How many users", {}) != cache.create_key(
+        "2", "How many users", {}
+    )
+
+
+def test_lookup_returns_a_copy():
+    cache = smart_cache()
+    key = cache.create_key("1", "How many users", {})
+    cache.add(key, sql_generation())
+
+    cached = cache.lookup(key)
+    cached.sql = "SELECT 2"
+    assert cache.lookup(key).sql == "SELECT 1"
+    assert cache.lookup("missing") is None
+    assert cache.metrics()["hits"] == HITS
+
+
+def test_entries_expire_and_are_evicted():
+    cache = smart_cache(max_size=MAX_SIZE)
+    for prompt in ["a", "b", "c"]:
+        cache.add(cache.create_key("1", prompt, {}), sql_generation())
+
+    assert cache.lookup(cache.create_key("1", "a", {})) is None
+    assert cache.lookup(cache.create_key("1", "c", {})) is not None
+    assert cache.metrics()["evictions"] == 1
+
+    expired = smart_cache(ttl=-1)
+    key = expired.create_key("1", "a", {})
+    expired.add(key, sql_generation())
+    assert expired.lookup(key) is None
+
+
+def test_invalidate_changes_the_keys_of_the_db_connection():
+    cache = smart_cache()
+    key = cache.create_key("1", "How many users", {})
+    other_key = cache.create_key("2", "How many users", {})
+    cache.add(key, sql_generation())
+    cache.add(other_key, sql_generation())
+
+    cache.invalidate("1")
+    assert cache.lookup(key) is None
+    assert cache.create_key("1", "How many users", {}) != key
+    assert cache.lookup(other_key) is not None
+    assert cache.metrics()["size"] == 1
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from dataherald.sql_database import base
+from dataherald.sql_database.base import DBConnections, SQLDatabase
+from dataherald.sql_database.models.types import DatabaseConnection, SQLValidationMode
+
+
+def sqlite_database(sql_validation: str) -> SQLDatabase:
+    database = SQLDatabase(create_engine("sqlite://"))
+    database.sql_validation = sql_validation
+    return database
+
+
+def test_get_validation_query_explain():
+    database = sqlite_database(SQLValidationMode.AUTO.value)
+
+    assert database.get_validation_query(" SELECT 1; ") == "EXPLAIN SELECT 1"
+
+
+def test_get_validation_query_limit():
+    database = sqlite_database(SQLValidationMode.LIMIT.value)
+
+    assert database.get_validation_query("SELECT 1 ;\n") == (
+        "SELECT * FROM (\nSELECT 1\n) AS validation_query LIMIT 1"
+    )
+
+
+def test_get_validation_query_limit_with_trailing_comment():
+    database = sqlite_database(SQLValidationMode.LIMIT.value)
+
+    database.validate_sql("SELECT 1 AS number -- the number")
+
+
+def test_get_validation_query_execute():
+    database = sqlite_database(SQLValidationMode.EXECUTE.value)
+
+    assert database.get_validation_query("SELECT 1;") == "SELECT 1"
+
+
+@pytest.fixture
+def numbers_database(tmp_path) -> SQLDatabase:
+    database = SQLDatabase(
+        create_engine(f"sqlite:///{tmp_path / 'numbers.db'}", poolclass=QueuePool)
+    )
+    database.engine.execute("CREATE TABLE numbers (number INTEGER)")
+    database.engine.execute(
+        "INSERT INTO numbers VALUES " + ", ".join(f"({number})" for number in range(5))
+    )
+    return database
+
+
+def test_stream_sql_yields_batches(numbers_database):
+    columns, batches = numbers_database.stream_sql(
+        "SELECT number FROM numbers ORDER BY number", batch_size=2
+    )
+
+    assert columns == ["number"]
+    assert [[row[0] for row in rows] for rows in batches] == [[0, 1], [2, 3], [4]]
+    assert numbers_database.engine.pool.checkedout() == 0
+
+
+def test_stream_sql_releases_the_connection_when_closed(numbers_database):
+    _, batches = numbers_database.stream_sql("SELECT number FROM numbers", 2)
+    next(batches)
+    batches.close()
+
+    assert numbers_database.engine.pool.checkedout() == 0
+
+
+def test_stream_sql_without_rows(numbers_database):
+    assert numbers_database.stream_sql("PRAGMA user_version = 1") is None
+    assert numbers_database.engine.pool.checkedout() == 0
+
+
+def test_run_sql_reads_top_k_rows(numbers_database):
+    _, result = numbers_database.run_sql("SELECT number FROM numbers", top_k=2)
+
+    assert [row[0] for row in result["result"]] == [0, 1]
+
+
+@pytest.fixture
+def db_connections(monkeypatch):
+    monkeypatch.setattr(DBConnections, "db_connections", {})
+    monkeypatch.setattr(DBConnections, "retired", [])
+    monkeypatch.setattr(DBConnections, "request_slots", {})
+    monkeypatch.setattr(DBConnections, "fingerprints", OrderedDict())
+    monkeypatch.setattr(
+        DBConnections, "counters", {"hits": 0, "misses": 0, "evictions": 0}
+    )
+    return DBConnections
+
+
+def test_db_connections_get_and_add(db_connections, numbers_database):
+    db_connections.add("1", "fingerprint", numbers_database)
+
+    assert db_connections.get("1", "fingerprint") is numbers_database
+    assert db_connections.get("1", "other") is None
+    assert db_connections.metrics()["hits"] == 1
+    assert db_connections.metrics()["misses"] == 1
+
+
+def test_db_connections_retire_engines_in_use(db_connections, numbers_database):
+    db_connections.add("1", "fingerprint", numbers_database)
+    connection = numbers_database.engine.connect()
+    db_connections.invalidate("1")
+
+    assert db_connections.retired
+    assert db_connections.counters["evictions"] == 0
+    connection.close()
+    assert db_connections.get("1", "fingerprint") is None
+    assert db_connections.retired == []
+    assert db_connections.counters["evictions"] == 1
+
+
+def test_db_connections_evict_idle_engines(
+    db_connections, numbers_database, monkeypatch
+):
+    monkeypatch.setattr(base, "DB_ENGINE_IDLE_TIMEOUT", -1)
+    db_connections.add("1", "fingerprint", numbers_database)
+
+    assert db_connections.get("1", "fingerprint") is None
+    assert db_connections.metrics()["engines"] == 0
+
+
+def test_connection_fingerprint_is_memoized(db_connections, monkeypatch):
+    computed = []
+    compute_connection_fingerprint = SQLDatabase.compute_connection_fingerprint
+    monkeypatch.setattr(
+        SQLDatabase,
+        "compute_connection_fingerprint",
+        lambda database_info: computed.append(database_info)
+        or compute_connection_fingerprint(database_info),
+    )
+    database_connection = DatabaseConnection(
+        id="1", alias="numbers", connection_uri="sqlite:///numbers.db"
+    )
+    fingerprint = SQLDatabase.get_connection_fingerprint(database_connection)
+
+    assert SQLDatabase.get_connection_fingerprint(database_connection) == fingerprint
+    assert len(computed) == 1
+    reencrypted = DatabaseConnection(
+        id="1", alias="numbers", connection_uri="sqlite:///numbers.db"
+    )
+    assert reencrypted.connection_uri != database_connection.connection_uri
+    assert SQLDatabase.get_connection_fingerprint(reencrypted) == fingerprint
+
+
+def test_request_scope_holds_a_slot_per_db_connection(db_connections):
+    with db_connections.request_scope():
+        db_connections.acquire_request_slot("1")
+        db_connections.acquire_request_slot("1")
+        assert db_connections.request_slots["1"]["holders"] == 1
+    assert db_connections.request_slots["1"]["holders"] == 0
+
+    db_connections.acquire_request_slot("2")
+    assert "2" not in db_connections.request_slots
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from dataherald.sql_database import query_timeout
+from dataherald.sql_database.query_timeout import Watchdog, run_with_timeout
+
+ENDLESS_QUERY = (
+    "WITH RECURSIVE numbers(number) AS "
+    "(SELECT 1 UNION ALL SELECT number + 1 FROM numbers) "
+    "SELECT COUNT(*) FROM numbers"
+)
+QUERY_TIMEOUT = 1
+
+
+def test_watchdog_fires_the_callbacks_reaching_their_deadline():
+    watchdog = Watchdog(max_workers=1)
+    fired = threading.Event()
+    watchdog.schedule(0.01, fired.set)
+
+    assert fired.wait(QUERY_TIMEOUT)
+    assert watchdog.scheduled == set()
+
+
+def test_watchdog_unschedule():
+    watchdog = Watchdog(max_workers=1)
+    fired = threading.Event()
+    handle = watchdog.schedule(0.05, fired.set)
+    watchdog.unschedule(handle)
+
+    assert not fired.wait(0.2)
+    assert watchdog.scheduled == set()
+    assert watchdog.deadlines == []
+
+
+def test_watchdog_unschedule_after_the_deadline():
+    watchdog = Watchdog(max_workers=1)
+    fired = threading.Event()
+    handle = watchdog.schedule(0, fired.set)
+    assert fired.wait(QUERY_TIMEOUT)
+    watchdog.unschedule(handle)
+
+    assert watchdog.scheduled == set()
+
+
+def test_run_with_timeout_returns_the_result():
+    engine = create_engine("sqlite://")
+
+    assert (
+        run_with_timeout(
+            engine, lambda connection: connection.execute(text("SELECT 1")).scalar()
+        )
+        == 1
+    )
+
+
+def test_run_with_timeout_cancels_the_query():
+    engine = create_engine("sqlite://")
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        run_with_timeout(
+            engine,
+            lambda connection: connection.execute(text(ENDLESS_QUERY)).scalar(),
+            QUERY_TIMEOUT,
+        )
+
+    assert time.monotonic() - start < QUERY_TIMEOUT + 1
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_run_with_timeout_without_canceller(monkeypatch):
+    monkeypatch.setattr(query_timeout, "QUERY_CANCELLERS", {})
+    engine = create_engine("sqlite://")
+
+    with pytest.raises(TimeoutError):
+        run_with_timeout(engine, lambda connection: time.sleep(0.5), 0.05)
@@ -0,0 +1,46 @@
+from dataherald.db_scanner.models.types import ColumnDetail, TableDescription
+from dataherald.sql_generator.schema_catalog import SchemaCatalog
+
+
+def table(table_name: str, schema_name: str | None = None, description=None):
+    return TableDescription(
+        db_connection_id="1",
+        schema_name=schema_name,
+        table_name=table_name,
+        description=description,
+        table_schema=f"CREATE TABLE {table_name} (id int, name text)",
+        columns=[
+            ColumnDetail(name="id", description="Identifier"),
+            ColumnDetail(name="name", low_cardinality=True, categories=["a", "b"]),
+        ],
+        examples=[{"id": 1, "name": "a"}, {"id": 2, "name": "b"}],
+    )
+
+
+def test_get_tables_keeps_the_db_scan_order():
+    db_scan = [table("users"), table("orders"), table("users", "sales")]
+    catalog = SchemaCatalog(db_scan)
+
+    assert catalog.get_tables(["users", "orders"]) == db_scan
+    assert catalog.get_tables(["missing"]) == []
+
+
+def test_get_table_schema_renders_the_descriptions():
+    catalog = SchemaCatalog([table("users", "public", "The users"), table("orders")])
+
+    assert catalog.get_table_schema(["users", "orders"]) == [
+        "CREATE TABLE users (id int, name text)\n/*\nTable `public.users`: The users\n"
+        "Column `id`: Identifier\n*/\n",
+        "CREATE TABLE orders (id int, name text)\n",
+    ]
+    assert list(catalog.table_schemas) == [0, 1]
+
+
+def test_get_column_info():
+    catalog = SchemaCatalog([table("users", "public")])
+
+    assert catalog.get_column_info("users", "name") == [
+        "Table: public.users, column: name, additional info: Description: None, "
+        "categories = ['a', 'b'], Sample rows: a, b\n"
+    ]
+    assert catalog.get_column_info("users", "missing") == []
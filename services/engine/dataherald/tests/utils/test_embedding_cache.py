@@ -0,0 +1,62 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from dataherald.utils.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_cached_embeddings_embed_each_normalized_text_once():
+    embedding = CountingEmbeddings()
+    cached = CachedEmbeddings(embedding, "model", EmbeddingCache(directory=None))
+
+    assert cached.embed_documents(["a  b", "a b", "c"]) == [
+        [4.0, 1.0],
+        [4.0, 1.0],
+        [1.0, 1.0],
+    ]
+    assert cached.embed_query(" c ") == [1.0, 1.0]
+    assert embedding.texts == ["a  b", "c"]
+
+
+def test_cached_embeddings_are_keyed_by_provider_and_model():
+    cache = EmbeddingCache(directory=None)
+    embedding = CountingEmbeddings()
+    CachedEmbeddings(embedding, "model", cache).embed_query("a")
+    CachedEmbeddings(embedding, "other", cache).embed_query("a")
+
+    assert embedding.texts == ["a", "a"]
+    assert CachedEmbeddings(embedding, "model", cache).cache_key == (
+        "CountingEmbeddings::model"
+    )
+
+
+def test_embedding_cache_size_and_ttl():
+    cache = EmbeddingCache(size=1, directory=None)
+    cache.put_many("model", {"a": [1.0], "b": [2.0]})
+    assert cache.get_many("model", ["a", "b"]) == {"b": [2.0]}
+
+    expired = EmbeddingCache(ttl=-1, directory=None)
+    expired.put_many("model", {"a": [1.0]})
+    assert expired.get_many("model", ["a"]) == {}
+
+
+def test_embedding_cache_is_stored_in_the_directory(tmp_path):
+    cache = EmbeddingCache(directory=str(tmp_path))
+    assert cache.connection is None
+    cache.put_many("model", {"a": [1.5, 2.5]})
+
+    assert EmbeddingCache(directory=str(tmp_path)).get_many("model", ["a"]) == {
+        "a": [1.5, 2.5]
+    }
@@ -0,0 +1,24 @@
+import numpy as np
+
+from dataherald.utils.similarity import cosine_similarities, normalize_rows, top_k
+
+
+def test_normalize_rows():
+    matrix = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+
+    assert matrix.dtype == np.float32
+    assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_normalize_rows_single_and_empty():
+    assert normalize_rows([3.0, 4.0]).shape == (1, 2)
+    assert normalize_rows([]).shape == (0, 0)
+    assert cosine_similarities(normalize_rows([]), [1.0, 0.0]).shape == (0,)
+
+
+def test_top_k():
+    scores = np.asarray([0.1, 0.9, 0.5, 0.9])
+
+    assert top_k(scores, 2).tolist() == [1, 3]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+    assert top_k(scores, 0).tolist() == []
@@ -0,0 +1,55 @@
+from dataherald.types import GoldenSQL
+from dataherald.utils.sql_utils import (
+    extract_sql_metadata,
+    filter_golden_records_based_on_schema,
+    get_golden_sql_tables,
+)
+
+SQL = (
+    "SELECT o.id, c.name FROM sales.orders o "
+    "JOIN public.customers c ON o.customer_id = c.id"
+)
+
+
+def test_extract_sql_metadata_returns_tables_schemas_and_columns():
+    assert extract_sql_metadata(SQL) == {
+        "tables": ["sales.orders", "public.customers"],
+        "schemas": ["sales", "public"],
+        "columns": [
+            "sales.orders.id",
+            "public.customers.name",
+            "sales.orders.customer_id",
+            "public.customers.id",
+        ],
+    }
+
+
+def test_extract_sql_metadata_without_schemas():
+    metadata = extract_sql_metadata("SELECT COUNT(*) FROM (SELECT a FROM t) x")
+
+    assert metadata["tables"] == ["t"]
+    assert metadata["schemas"] == []
+
+
+def test_get_golden_sql_tables_prefers_the_stored_tables():
+    golden_sql = GoldenSQL(
+        prompt_text="Orders", sql=SQL, db_connection_id="1", tables=["stored"]
+    )
+    assert get_golden_sql_tables(golden_sql) == ["stored"]
+
+    golden_sql.tables = None
+    assert get_golden_sql_tables(golden_sql) == ["sales.orders", "public.customers"]
+
+
+def test_filter_golden_records_based_on_schema_uses_the_stored_schemas():
+    stored = GoldenSQL(
+        prompt_text="Orders", sql=SQL, db_connection_id="1", schemas=["finance"]
+    )
+    parsed = GoldenSQL(prompt_text="Orders", sql=SQL, db_connection_id="1")
+
+    assert filter_golden_records_based_on_schema([stored, parsed], ["finance"]) == [
+        stored
+    ]
+    assert filter_golden_records_based_on_schema([stored, parsed], ["sales"]) == [
+        parsed
+    ]
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from dataherald.vector_store.hnsw import HNSW, Partition, partition_version
+
+COLLECTION = "golden_sqls"
+MAX_PARTITIONS = 2
+QUERY_TIMEOUT = 5
+
+
+class FakeEmbeddings:
+    def embed_query(self, text: str) -> list[float]:
+        return [1.0, float(len(text))]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def hnsw(tmp_path, monkeypatch):
+    monkeypatch.setenv("HNSW_DIRECTORY", str(tmp_path))
+    store = HNSW(None, max_partitions=MAX_PARTITIONS)
+    monkeypatch.setattr(
+        store,
+        "get_embedding",
+        lambda db_connection_id, model: FakeEmbeddings(),  # noqa: ARG005
+    )
+    return store
+
+
+def add_golden_sql(store: HNSW, db_connection_id: str, id: str):
+    store.add_record(
+        "question",
+        db_connection_id,
+        COLLECTION,
+        [{"prompt_text": "question", "sql": f"SELECT {id}"}],
+        [id],
+    )
+
+
+def test_partition_add_query_and_replace(tmp_path):
+    partition = Partition(str(tmp_path / "partition"))
+    partition.add(
+        ["1", "2"], [[1.0, 0.0], [0.0, 1.0]], [{"sql": "one"}, {"sql": "two"}]
+    )
+    partition.add(["1"], [[0.0, -1.0]], [{"sql": "three"}])
+
+    matches = partition.query([1.0, 0.1], 5)
+    assert [match["id"] for match in matches] == ["2", "1"]
+    assert matches[0]["sql"] == "two"
+    assert matches[1]["sql"] == "three"
+
+
+def test_partition_delete(tmp_path):
+    partition = Partition(str(tmp_path / "partition"))
+    partition.add(["1", "2"], [[1.0, 0.0], [0.0, 1.0]], [{}, {}])
+
+    assert partition.delete("1")
+    assert not partition.delete("1")
+    assert [match["id"] for match in partition.query([1.0, 0.0], 5)] == ["2"]
+
+
+def test_partition_save_and_load(tmp_path):
+    path = str(tmp_path / "partition")
+    partition = Partition(path)
+    assert partition_version(path) is None
+    assert partition.query([1.0, 0.0], 5) == []
+    partition.add(["1"], [[1.0, 0.0]], [{"sql": "one"}])
+    partition.save()
+
+    loaded = Partition(path)
+    assert loaded.version == partition_version(path) == partition.version
+    assert loaded.query([1.0, 0.0], 5)[0]["sql"] == "one"
+    loaded.add(["2"], [[0.0, 1.0]], [{}])
+    loaded.save()
+    assert partition_version(path) != partition.version
+
+
+def test_hnsw_evicts_the_least_recently_used_partitions(hnsw):
+    add_golden_sql(hnsw, "1", "a")
+    add_golden_sql(hnsw, "2", "b")
+    hnsw.query(["question"], "1", COLLECTION, 5)
+    add_golden_sql(hnsw, "3", "c")
+
+    assert list(hnsw.partitions) == [
+        hnsw.get_partition_path(COLLECTION, "1"),
+        hnsw.get_partition_path(COLLECTION, "3"),
+    ]
+    # The evicted partition is loaded again from the disk
+    matches = hnsw.query(["question"], "2", COLLECTION, 5)
+    assert [match["sql"] for match in matches] == ["SELECT b"]
+    assert len(hnsw.partitions) == MAX_PARTITIONS
+
+
+def test_hnsw_query_does_not_wait_for_other_partitions(hnsw):
+    add_golden_sql(hnsw, "1", "a")
+    add_golden_sql(hnsw, "2", "b")
+    matches = []
+
+    with hnsw.get_entry(hnsw.get_partition_path(COLLECTION, "2"))["lock"]:
+        thread = threading.Thread(
+            target=lambda: matches.extend(hnsw.query(["question"], "1", COLLECTION, 5))
+        )
+        thread.start()
+        thread.join(QUERY_TIMEOUT)
+        assert not thread.is_alive()
+
+    assert [match["sql"] for match in matches] == ["SELECT a"]
@@ -6,7 +6,11 @@ from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from pydantic import BaseModel, Field, validator
 
-from dataherald.sql_database.models.types import FileStorage, SSHSettings
+from dataherald.sql_database.models.types import (
+    FileStorage,
+    SQLValidationMode,
+    SSHSettings,
+)
 from dataherald.utils.models_context_window import OPENAI_FINETUNING_MODELS_WINDOW_SIZES
 
 
@@ -62,6 +66,10 @@ class GoldenSQL(BaseModel):
     db_connection_id: str
     created_at: datetime = Field(default_factory=datetime.now)
     metadata: dict | None
+    # Parsed from the sql when it is stored, None for the golden sqls stored before
+    tables: list[str] | None = None
+    schemas: list[str] | None = None
+    columns: list[str] | None = None
 
 
 class SQLGenerationStatus(Enum):
@@ -70,6 +78,12 @@ class SQLGenerationStatus(Enum):
     INVALID = "INVALID"
 
 
+class SQLGenerationPath(Enum):
+    AGENT = "AGENT"
+    SMART_CACHE = "SMART_CACHE"
+    SEMANTIC_MATCH = "SEMANTIC_MATCH"
+
+
 class SupportedDatabase(Enum):
     POSTGRES = "POSTGRES"
     DATABRICKS = "DATABRICKS"
@@ -103,6 +117,7 @@ class DatabaseConnectionRequest(BaseModel):
     ssh_settings: SSHSettings | None
     file_storage: FileStorage | None
     metadata: dict | None
+    sql_validation: SQLValidationMode | None
 
 
 class ForeignKeyDetail(BaseModel):
@@ -212,6 +227,7 @@ class SQLGeneration(BaseModel):
     tokens_used: int | None
     confidence_score: float | None
     error: str | None
+    generation_path: str | None
     created_at: datetime = Field(default_factory=datetime.now)
     metadata: dict | None
 
@@ -0,0 +1,159 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """LRU cache of the embeddings keyed by (model, normalized text). The entries expire after
+    ttl seconds, when a directory is set they are also stored in a sqlite file so they survive
+    restarts and are shared by the processes of the engine. The file is opened the first time
+    the cache is used."""
+
+    def __init__(
+        self,
+        size: int = EMBEDDING_CACHE_SIZE,
+        ttl: int = EMBEDDING_CACHE_TTL,
+        directory: str | None = EMBEDDING_CACHE_DIR,
+    ):
+        self.size = size
+        self.ttl = ttl
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def get_connection(self) -> sqlite3.Connection | None:
+        """Opens the sqlite file of the directory, called with the lock held"""
+        if self.connection is None and self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self.connection = sqlite3.connect(
+                os.path.join(self.directory, "embeddings.db"), check_same_thread=False
+            )
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text TEXT, "
+                    "created_at REAL, embedding BLOB, PRIMARY KEY (model, text))"
+                )
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE created_at < ?",
+                    (time.time() - self.ttl,),
+                )
+        return self.connection
+
+    def get_many(self, model: str, texts: List[str]) -> dict:
+        """Returns the cached embeddings of the texts by text"""
+        found = {}
+        missing = []
+        expired_at = time.time() - self.ttl
+        with self.lock:
+            for text in texts:
+                entry = self.entries.get((model, text))
+                if entry is not None and entry[0] >= expired_at:
+                    self.entries.move_to_end((model, text))
+                    found[text] = entry[1]
+                else:
+                    missing.append(text)
+            connection = self.get_connection()
+            if connection is None or not missing:
+                return found
+            for text in missing:
+                row = connection.execute(
+                    "SELECT created_at, embedding FROM embeddings "
+                    "WHERE model = ? AND text = ? AND created_at >= ?",
+                    (model, text, expired_at),
+                ).fetchone()
+                if row is not None:
+                    found[text] = array("d", row[1]).tolist()
+                    self.set(model, text, row[0], found[text])
+        return found
+
+    def put_many(self, model: str, embeddings: dict):
+        created_at = time.time()
+        with self.lock:
+            for text, embedding in embeddings.items():
+                self.set(model, text, created_at, embedding)
+            connection = self.get_connection()
+            if connection is None:
+                return
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                    [
+                        (model, text, created_at, array("d", embedding).tobytes())
+                        for text, embedding in embeddings.items()
+                    ],
+                )
+
+    def set(self, model: str, text: str, created_at: float, embedding: List[float]):
+        self.entries[(model, text)] = (created_at, embedding)
+        self.entries.move_to_end((model, text))
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+embedding_cache = EmbeddingCache()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings which are looked up in the embedding cache before calling the model, so a
+    text is embedded once whichever vector store or agent tool asks for it. The entries are
+    keyed by the provider, its endpoint and the model, and by the normalized text, the model
+    always gets the original text."""
+
+    def __init__(
+        self, embedding: Embeddings, model: str, cache: EmbeddingCache = embedding_cache
+    ):
+        self.embedding = embedding
+        self.model = model
+        self.cache = cache
+        endpoint = (
+            getattr(embedding, "azure_endpoint", None)
+            or getattr(embedding, "openai_api_base", None)
+            or ""
+        )
+        self.cache_key = f"{type(embedding).__name__}:{endpoint}:{model}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [normalize_text(text) for text in texts]
+        found = self.cache.get_many(self.cache_key, keys)
+        # The first text of each missing key is embedded
+        missing = {}
+        for key, text in zip(keys, texts, strict=True):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            embeddings = dict(
+                zip(
+                    missing,
+                    self.embedding.embed_documents(list(missing.values())),
+                    strict=True,
+                )
+            )
+            self.cache.put_many(self.cache_key, embeddings)
+            found.update(embeddings)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        found = self.cache.get_many(self.cache_key, [key])
+        if key not in found:
+            found[key] = self.embedding.embed_query(text)
+            self.cache.put_many(self.cache_key, {key: found[key]})
+        return found[key]
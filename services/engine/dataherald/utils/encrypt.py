@@ -1,12 +1,20 @@
+from functools import lru_cache
+
 from cryptography.fernet import Fernet
 
 from dataherald.config import Settings
 
 
+@lru_cache(maxsize=1)
+def get_fernet() -> Fernet:
+    """The key doesn't change while the process runs, the settings are only read once"""
+    settings = Settings()
+    return Fernet(settings.require("encrypt_key"))
+
+
 class FernetEncrypt:
     def __init__(self):
-        settings = Settings()
-        self.fernet_key = Fernet(settings.require("encrypt_key"))
+        self.fernet_key = get_fernet()
 
     def encrypt(self, input: str) -> str:
         if not input:
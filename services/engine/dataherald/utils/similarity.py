@@ -0,0 +1,35 @@
+from typing import List
+
+import numpy as np
+
+
+def normalize_rows(embeddings: List[List[float]] | np.ndarray) -> np.ndarray:
+    """Returns the embeddings as a contiguous float32 matrix with unit length rows"""
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        # An empty list has no rows, a non empty one is a single embedding
+        matrix = matrix.reshape(0, 0) if matrix.size == 0 else matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def cosine_similarities(
+    normalized_embeddings: np.ndarray, query_embedding: List[float] | np.ndarray
+) -> np.ndarray:
+    """Computes the cosine similarity of the query against every row of a matrix
+    returned by normalize_rows with a single matmul"""
+    if len(normalized_embeddings) == 0:
+        return np.empty(0, dtype=np.float32)
+    return normalized_embeddings @ normalize_rows(query_embedding)[0]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Returns the indexes of the k highest scores sorted from the highest to the lowest"""
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        indexes = np.argpartition(-scores, k - 1)[:k]
+    else:
+        indexes = np.arange(len(scores))
+    return indexes[np.argsort(-scores[indexes], kind="stable")]
@@ -6,7 +6,32 @@ from dataherald.types import FineTuningRequest, GoldenSQL
 
 
 def extract_the_schemas_from_sql(sql: str) -> list[str]:
-    table_names = Parser(sql).tables
+    return extract_the_schemas_from_tables(Parser(sql).tables)
+
+
+def extract_sql_metadata(sql: str) -> dict:
+    """Returns the tables, schemas and columns used by the sql, stored on the golden sqls so
+    they are parsed once"""
+    parser = Parser(sql)
+    tables = parser.tables
+    try:
+        columns = parser.columns
+    except Exception:
+        columns = []
+    return {
+        "tables": tables,
+        "schemas": extract_the_schemas_from_tables(tables),
+        "columns": columns,
+    }
+
+
+def get_golden_sql_tables(golden_sql: GoldenSQL) -> list[str]:
+    if golden_sql.tables is not None:
+        return golden_sql.tables
+    return Parser(golden_sql.sql).tables
+
+
+def extract_the_schemas_from_tables(table_names: list[str]) -> list[str]:
     schemas = []
     for table_name in table_names:
         if "." in table_name:
@@ -22,7 +47,10 @@ def filter_golden_records_based_on_schema(
     if not schemas:
         return golden_sqls
     for record in golden_sqls:
-        used_schemas = extract_the_schemas_from_sql(record.sql)
+        if record.schemas is not None:
+            used_schemas = record.schemas
+        else:
+            used_schemas = extract_the_schemas_from_sql(record.sql)
         for schema in schemas:
             if schema in used_schemas:
                 filtered_records.append(record)
@@ -1,8 +1,16 @@
+import threading
 from abc import ABC, abstractmethod
 from typing import Any, List
 
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
 from dataherald.config import Component, System
+from dataherald.db import DB
+from dataherald.repositories.database_connections import DatabaseConnectionRepository
+from dataherald.sql_generator.connection_context import connection_contexts
 from dataherald.types import GoldenSQL
+from dataherald.utils.embedding_cache import CachedEmbeddings
 
 
 class VectorStore(Component, ABC):
@@ -11,6 +19,8 @@ class VectorStore(Component, ABC):
     @abstractmethod
     def __init__(self, system: System):
         self.system = system
+        self.embeddings = {}
+        self.embeddings_lock = threading.Lock()
 
     @abstractmethod
     def query(
@@ -48,3 +58,39 @@ class VectorStore(Component, ABC):
     @abstractmethod
     def delete_collection(self, collection: str):
         pass
+
+    @staticmethod
+    def golden_sql_payload(golden_sql: GoldenSQL) -> dict:
+        """Stored with the vector so the matches are returned without reading them from the DB"""
+        payload = {"prompt_text": golden_sql.prompt_text, "sql": golden_sql.sql}
+        if golden_sql.tables is not None:
+            payload["tables"] = ", ".join(golden_sql.tables)
+        return payload
+
+    @staticmethod
+    def add_golden_sql_payload(result: dict, metadata: dict | None) -> dict:
+        if metadata and "prompt_text" in metadata and "sql" in metadata:
+            result["prompt_text"] = metadata["prompt_text"]
+            result["sql"] = metadata["sql"]
+            if "tables" in metadata:
+                result["tables"] = [
+                    table for table in metadata["tables"].split(", ") if table
+                ]
+        return result
+
+    def get_embedding(self, db_connection_id: str, model: str) -> Embeddings:
+        """Returns the embedding client of the API key of the db connection, the key is read
+        once per connection context and the clients are shared by the connections using it
+        """
+        api_key = connection_contexts.get(db_connection_id).get(
+            ("api_key",),
+            lambda: DatabaseConnectionRepository(self.system.instance(DB))
+            .find_by_id(db_connection_id)
+            .decrypt_api_key(),
+        )
+        with self.embeddings_lock:
+            if (api_key, model) not in self.embeddings:
+                self.embeddings[(api_key, model)] = CachedEmbeddings(
+                    OpenAIEmbeddings(openai_api_key=api_key, model=model), model
+                )
+            return self.embeddings[(api_key, model)]
@@ -1,19 +1,18 @@
 import os
+import threading
 from typing import Any, List
 
 from astrapy.api import APIRequestError
-from astrapy.db import AstraDB
-from langchain_openai import OpenAIEmbeddings
+from astrapy.db import AstraDB, AstraDBCollection
 from overrides import override
-from sql_metadata import Parser
 
 from dataherald.config import System
-from dataherald.db import DB
-from dataherald.repositories.database_connections import DatabaseConnectionRepository
 from dataherald.types import GoldenSQL
+from dataherald.utils.sql_utils import get_golden_sql_tables
 from dataherald.vector_store import VectorStore
 
 EMBEDDING_MODEL = "text-embedding-3-small"
+INSERT_CONCURRENCY = 5
 
 
 class Astra(VectorStore):
@@ -30,10 +29,31 @@ class Astra(VectorStore):
             api_endpoint=os.environ["ASTRA_DB_API_ENDPOINT"],
             namespace="default_keyspace",
         )
+        self.astra_collections = {}
+        self.lock = threading.Lock()
 
     def collection_name_formatter(self, collection: str) -> str:
         return collection.replace("-", "_")
 
+    def get_collection(self, collection: str, create: bool = True) -> AstraDBCollection:
+        """Returns the handle of the collection, the collection is looked up or created only
+        the first time it is used"""
+        collection = self.collection_name_formatter(collection)
+        with self.lock:
+            if collection not in self.astra_collections:
+                try:
+                    existing_collections = self.db.get_collections()["status"][
+                        "collections"
+                    ]
+                except APIRequestError:
+                    existing_collections = []
+                if collection not in existing_collections:
+                    if not create:
+                        raise ValueError(f"Collection {collection} does not exist")
+                    self.create_collection(collection)
+                self.astra_collections[collection] = self.db.collection(collection)
+            return self.astra_collections[collection]
+
     @override
     def query(
         self,
@@ -42,21 +62,8 @@ class Astra(VectorStore):
         collection: str,
         num_results: int,
     ) -> list:
-        collection = self.collection_name_formatter(collection)
-        try:
-            existing_collections = self.db.get_collections()["status"]["collections"]
-        except APIRequestError:
-            existing_collections = []
-        if collection not in existing_collections:
-            raise ValueError(f"Collection {collection} does not exist")
-        astra_collection = self.db.collection(collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(db_connection_id)
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
-        )
+        astra_collection = self.get_collection(collection, create=False)
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
         xq = embedding.embed_query(query_texts[0])
         returened_results = astra_collection.vector_find(
             vector=xq,
@@ -68,22 +75,9 @@ class Astra(VectorStore):
 
     @override
     def add_records(self, golden_sqls: List[GoldenSQL], collection: str):
-        collection = self.collection_name_formatter(collection)
-        try:
-            existing_collections = self.db.get_collections()["status"]["collections"]
-        except APIRequestError:
-            existing_collections = []
-        if collection not in existing_collections:
-            self.create_collection(collection)
-        astra_collection = self.db.collection(collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(
-            str(golden_sqls[0].db_connection_id)
-        )
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
+        astra_collection = self.get_collection(collection)
+        embedding = self.get_embedding(
+            str(golden_sqls[0].db_connection_id), EMBEDDING_MODEL
         )
         embeds = embedding.embed_documents(
             [record.prompt_text for record in golden_sqls]
@@ -94,16 +88,13 @@ class Astra(VectorStore):
                 {
                     "_id": str(golden_sqls[key].id),
                     "$vector": embeds[key],
-                    "tables_used": (
-                        ", ".join(Parser(golden_sqls[key].sql))
-                        if isinstance(Parser(golden_sqls[key].sql), list)
-                        else ""
-                    ),
+                    "tables_used": ", ".join(get_golden_sql_tables(golden_sqls[key])),
                     "db_connection_id": str(golden_sqls[key].db_connection_id),
+                    **self.golden_sql_payload(golden_sqls[key]),
                 }
             )
         astra_collection.chunked_insert_many(
-            documents=records, chunk_size=10, concurrency=1
+            documents=records, chunk_size=20, concurrency=INSERT_CONCURRENCY
         )
 
     @override
@@ -115,39 +106,21 @@ class Astra(VectorStore):
         metadata: Any,
         ids: List,
     ):
-        collection = self.collection_name_formatter(collection)
-        try:
-            existing_collections = self.db.get_collections()["status"]["collections"]
-        except APIRequestError:
-            existing_collections = []
-        if collection not in existing_collections:
-            self.create_collection(collection)
-        astra_collection = self.db.collection(collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(db_connection_id)
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
-        )
+        astra_collection = self.get_collection(collection)
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
         embeds = embedding.embed_documents([documents])
         astra_collection.insert_one({"_id": ids[0], "$vector": embeds, **metadata[0]})
 
     @override
     def delete_record(self, collection: str, id: str):
-        collection = self.collection_name_formatter(collection)
-        try:
-            existing_collections = self.db.get_collections()["status"]["collections"]
-        except APIRequestError:
-            existing_collections = []
-        if collection not in existing_collections:
-            raise ValueError(f"Collection {collection} does not exist")
-        astra_collection = self.db.collection(collection)
+        astra_collection = self.get_collection(collection, create=False)
         astra_collection.delete_one(id)
 
     @override
     def delete_collection(self, collection: str):
         collection = self.collection_name_formatter(collection)
+        with self.lock:
+            self.astra_collections.pop(collection, None)
         return self.db.delete_collection(collection_name=collection)
 
     @override
@@ -159,9 +132,13 @@ class Astra(VectorStore):
         results = []
         for i in range(len(astra_results)):
             results.append(
-                {
-                    "id": astra_results[i]["_id"],
-                    "score": astra_results[i]["$similarity"],
-                }
+                self.add_golden_sql_payload(
+                    {
+                        "id": astra_results[i]["_id"],
+                        # Astra scales the cosine similarity to [0, 1]
+                        "score": 2 * astra_results[i]["$similarity"] - 1,
+                    },
+                    astra_results[i],
+                )
             )
         return results
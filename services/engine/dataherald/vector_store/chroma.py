@@ -2,12 +2,14 @@ from typing import Any, List
 
 import chromadb
 from overrides import override
-from sql_metadata import Parser
 
 from dataherald.config import System
 from dataherald.types import GoldenSQL
+from dataherald.utils.sql_utils import get_golden_sql_tables
 from dataherald.vector_store import VectorStore
 
+BATCH_SIZE = 1000
+
 
 class Chroma(VectorStore):
     def __init__(
@@ -40,22 +42,27 @@ class Chroma(VectorStore):
 
     @override
     def add_records(self, golden_sqls: List[GoldenSQL], collection: str):
-        for golden_sql in golden_sqls:
-            self.add_record(
-                golden_sql.prompt_text,
-                golden_sql.db_connection_id,
-                collection,
-                [
+        target_collection = self.chroma_client.get_or_create_collection(collection)
+        for index in range(0, len(golden_sqls), BATCH_SIZE):
+            batch = golden_sqls[index : index + BATCH_SIZE]
+            metadatas = []
+            for golden_sql in batch:
+                try:
+                    tables_used = ", ".join(get_golden_sql_tables(golden_sql))
+                except Exception:
+                    tables_used = ""
+                metadatas.append(
                     {
-                        "tables_used": (
-                            ", ".join(Parser(golden_sql.sql))
-                            if isinstance(Parser(golden_sql.sql), list)
-                            else ""
-                        ),
+                        "tables_used": tables_used,
                         "db_connection_id": str(golden_sql.db_connection_id),
+                        **self.golden_sql_payload(golden_sql),
                     }
-                ],
-                ids=[str(golden_sql.id)],
+                )
+            # Upsert keeps re-adding a batch idempotent, the questions are embedded in one call
+            target_collection.upsert(
+                documents=[golden_sql.prompt_text for golden_sql in batch],
+                metadatas=metadatas,
+                ids=[str(golden_sql.id) for golden_sql in batch],
             )
 
     @override
@@ -87,11 +94,17 @@ class Chroma(VectorStore):
 
     def convert_to_pinecone_object_model(self, chroma_results: dict) -> List:
         results = []
+        metadatas = chroma_results.get("metadatas") or [[]]
         for i in range(len(chroma_results["ids"][0])):
             results.append(
-                {
-                    "id": chroma_results["ids"][0][i],
-                    "score": chroma_results["distances"][0][i],
-                }
+                self.add_golden_sql_payload(
+                    {
+                        "id": chroma_results["ids"][0][i],
+                        # Squared l2 distance of normalized embeddings, turned into the
+                        # cosine similarity the other vector stores return
+                        "score": 1 - chroma_results["distances"][0][i] / 2,
+                    },
+                    metadatas[0][i] if i < len(metadatas[0]) else None,
+                )
             )
         return results
@@ -0,0 +1,284 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, List
+
+import hnswlib
+import numpy as np
+from overrides import override
+
+from dataherald.config import System
+from dataherald.db import DB
+from dataherald.repositories.golden_sqls import GoldenSQLRepository
+from dataherald.types import GoldenSQL
+from dataherald.vector_store import VectorStore
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 50
+INITIAL_CAPACITY = 1000
+MAX_LOADED_PARTITIONS = 100
+
+
+def partition_version(path: str) -> tuple | None:
+    """Changes every time a process saves the partition, the files are replaced on save"""
+    try:
+        stat = os.stat(f"{path}.json")
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+@contextmanager
+def partition_lock(path: str, operation: int = fcntl.LOCK_EX):
+    """Locks the partition across the processes of the engine, exclusive to reload, change and
+    save it and shared to reload it"""
+    with open(f"{path}.lock", "a") as file:
+        fcntl.flock(file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class Partition:
+    """HNSW index of the golden sqls of a db connection and the payload of each vector, saved in
+    <path>.bin and <path>.json"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = None
+        self.labels = {}
+        self.payloads = {}
+        self.next_label = 0
+        self.version = None
+        if os.path.exists(f"{path}.json"):
+            self.load()
+
+    def load(self):
+        with open(f"{self.path}.json") as file:
+            data = json.load(file)
+        self.labels = data["labels"]
+        self.payloads = {
+            int(label): payload for label, payload in data["payloads"].items()
+        }
+        self.next_label = data["next_label"]
+        self.index = hnswlib.Index(space="cosine", dim=data["dimension"])
+        self.index.load_index(f"{self.path}.bin", allow_replace_deleted=True)
+        self.index.set_ef(HNSW_EF_SEARCH)
+        self.version = partition_version(self.path)
+
+    def save(self):
+        # Written to temporary files first so a reader never loads a partial index
+        self.index.save_index(f"{self.path}.bin.tmp")
+        with open(f"{self.path}.json.tmp", "w") as file:
+            json.dump(
+                {
+                    "dimension": self.index.dim,
+                    "labels": self.labels,
+                    "payloads": self.payloads,
+                    "next_label": self.next_label,
+                },
+                file,
+            )
+        os.replace(f"{self.path}.bin.tmp", f"{self.path}.bin")
+        os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+        self.version = partition_version(self.path)
+
+    def add(self, ids: List[str], embeddings: List[List[float]], payloads: List[dict]):
+        """Adds the vectors, the vectors already stored with one of the ids are replaced"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.index is None:
+            self.index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+            self.index.init_index(
+                max_elements=max(INITIAL_CAPACITY, len(ids)),
+                M=HNSW_M,
+                ef_construction=HNSW_EF_CONSTRUCTION,
+                allow_replace_deleted=True,
+            )
+            self.index.set_ef(HNSW_EF_SEARCH)
+        for id in ids:
+            self.delete(id)
+        required = self.index.element_count + len(ids)
+        if required > self.index.max_elements:
+            self.index.resize_index(max(required, 2 * self.index.max_elements))
+        labels = list(range(self.next_label, self.next_label + len(ids)))
+        self.next_label += len(ids)
+        self.index.add_items(vectors, labels, replace_deleted=True)
+        for id, label, payload in zip(ids, labels, payloads, strict=True):
+            self.labels[id] = label
+            self.payloads[label] = {"id": id, **payload}
+
+    def delete(self, id: str) -> bool:
+        label = self.labels.pop(id, None)
+        if label is None:
+            return False
+        self.index.mark_deleted(label)
+        del self.payloads[label]
+        return True
+
+    def query(self, embedding: List[float], num_results: int) -> List[dict]:
+        num_results = min(num_results, len(self.labels))
+        if num_results == 0:
+            return []
+        self.index.set_ef(max(HNSW_EF_SEARCH, num_results))
+        labels, distances = self.index.knn_query(
+            np.asarray([embedding], dtype=np.float32), k=num_results
+        )
+        return [
+            {"score": 1 - float(distance), **self.payloads[int(label)]}
+            for label, distance in zip(labels[0], distances[0], strict=True)
+        ]
+
+
+class HNSW(VectorStore):
+    """Keeps the golden sqls in HNSW indexes on the local disk, one per collection and db
+    connection. The indexes are loaded the first time they are used and reloaded when another
+    process saves them, the changes hold a file lock so the processes don't lose each other's
+    vectors. Each partition has its own lock and only the partitions used most recently are
+    kept in memory."""
+
+    def __init__(self, system: System, max_partitions: int = MAX_LOADED_PARTITIONS):
+        super().__init__(system)
+        self.directory = os.environ.get("HNSW_DIRECTORY", "./hnsw")
+        self.max_partitions = max_partitions
+        self.partitions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_partition_path(self, collection: str, db_connection_id: str) -> str:
+        return os.path.join(self.directory, collection, str(db_connection_id))
+
+    def get_entry(self, path: str) -> dict:
+        """Returns the lock and the loaded partition of the path, the least recently used
+        partition is evicted when there are too many. A thread still holding an evicted entry
+        keeps its own copy, the next one loads the partition again."""
+        with self.lock:
+            entry = self.partitions.get(path)
+            if entry is None:
+                entry = {"lock": threading.Lock(), "partition": None}
+                self.partitions[path] = entry
+                while len(self.partitions) > self.max_partitions:
+                    self.partitions.popitem(last=False)
+            self.partitions.move_to_end(path)
+            return entry
+
+    def load_partition(self, entry: dict, path: str) -> Partition:
+        """Returns the partition, reloaded if another process saved it. Called with the lock
+        of the entry and the file lock held"""
+        partition = entry["partition"]
+        if partition is None or partition.version != partition_version(path):
+            partition = Partition(path)
+            entry["partition"] = partition
+        return partition
+
+    @override
+    def query(
+        self,
+        query_texts: List[str],
+        db_connection_id: str,
+        collection: str,
+        num_results: int,
+    ) -> list:
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
+        xq = embedding.embed_query(query_texts[0])
+        self.create_collection(collection)
+        path = self.get_partition_path(collection, db_connection_id)
+        entry = self.get_entry(path)
+        with entry["lock"]:
+            with partition_lock(path, fcntl.LOCK_SH):
+                partition = self.load_partition(entry, path)
+            matches = partition.query(xq, num_results)
+        return [
+            self.add_golden_sql_payload(
+                {"id": match["id"], "score": match["score"]}, match
+            )
+            for match in matches
+        ]
+
+    @override
+    def add_records(self, golden_sqls: List[GoldenSQL], collection: str):
+        self.create_collection(collection)
+        by_db_connection = {}
+        for golden_sql in golden_sqls:
+            by_db_connection.setdefault(str(golden_sql.db_connection_id), []).append(
+                golden_sql
+            )
+        for db_connection_id, batch in by_db_connection.items():
+            embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
+            embeds = embedding.embed_documents(
+                [golden_sql.prompt_text for golden_sql in batch]
+            )
+            path = self.get_partition_path(collection, db_connection_id)
+            entry = self.get_entry(path)
+            with entry["lock"], partition_lock(path):
+                partition = self.load_partition(entry, path)
+                partition.add(
+                    [str(golden_sql.id) for golden_sql in batch],
+                    embeds,
+                    [self.golden_sql_payload(golden_sql) for golden_sql in batch],
+                )
+                partition.save()
+
+    @override
+    def add_record(
+        self,
+        documents: str,
+        db_connection_id: str,
+        collection: str,
+        metadata: Any,
+        ids: List,
+    ):
+        self.create_collection(collection)
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
+        embeds = embedding.embed_documents([documents])
+        path = self.get_partition_path(collection, db_connection_id)
+        entry = self.get_entry(path)
+        with entry["lock"], partition_lock(path):
+            partition = self.load_partition(entry, path)
+            partition.add([str(ids[0])], embeds, [metadata[0]])
+            partition.save()
+
+    @override
+    def delete_record(self, collection: str, id: str):
+        collection_directory = os.path.join(self.directory, collection)
+        if not os.path.isdir(collection_directory):
+            return
+        # The golden sql is still stored when its vector is deleted, its db connection tells
+        # the partition. The other partitions are only searched when it isn't found.
+        golden_sql = GoldenSQLRepository(self.system.instance(DB)).find_by_id(str(id))
+        if golden_sql is not None:
+            db_connection_ids = [str(golden_sql.db_connection_id)]
+        else:
+            db_connection_ids = [
+                file_name[: -len(".json")]
+                for file_name in os.listdir(collection_directory)
+                if file_name.endswith(".json")
+            ]
+        for db_connection_id in db_connection_ids:
+            path = self.get_partition_path(collection, db_connection_id)
+            if not os.path.exists(f"{path}.json"):
+                continue
+            entry = self.get_entry(path)
+            with entry["lock"], partition_lock(path):
+                partition = self.load_partition(entry, path)
+                if partition.delete(str(id)):
+                    partition.save()
+                    return
+
+    @override
+    def delete_collection(self, collection: str):
+        collection_directory = os.path.join(self.directory, collection)
+        with self.lock:
+            for path in list(self.partitions):
+                if os.path.dirname(path) == collection_directory:
+                    del self.partitions[path]
+            shutil.rmtree(collection_directory, ignore_errors=True)
+
+    @override
+    def create_collection(self, collection: str):
+        os.makedirs(os.path.join(self.directory, collection), exist_ok=True)
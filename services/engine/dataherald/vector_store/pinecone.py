@@ -1,15 +1,13 @@
 import os
+import threading
 from typing import Any, List
 
 import pinecone
-from langchain_openai import OpenAIEmbeddings
 from overrides import override
-from sql_metadata import Parser
 
 from dataherald.config import System
-from dataherald.db import DB
-from dataherald.repositories.database_connections import DatabaseConnectionRepository
 from dataherald.types import GoldenSQL
+from dataherald.utils.sql_utils import get_golden_sql_tables
 from dataherald.vector_store import VectorStore
 
 EMBEDDING_MODEL = "text-embedding-3-small"
@@ -25,6 +23,20 @@ class Pinecone(VectorStore):
             raise ValueError("PINECONE_API_KEY environment variable not set")
 
         self.pinecone = pinecone.Pinecone(api_key=api_key)
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get_index(self, collection: str, create: bool = True) -> pinecone.Index:
+        """Returns the handle of the index, the index is looked up or created only the first
+        time it is used"""
+        with self.lock:
+            if collection not in self.indexes:
+                if collection not in self.pinecone.list_indexes().names():
+                    if not create:
+                        raise ValueError(f"Index {collection} does not exist")
+                    self.create_collection(collection)
+                self.indexes[collection] = self.pinecone.Index(name=collection)
+            return self.indexes[collection]
 
     @override
     def query(
@@ -34,14 +46,8 @@ class Pinecone(VectorStore):
         collection: str,
         num_results: int,
     ) -> list:
-        index = self.pinecone.Index(name=collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(db_connection_id)
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
-        )
+        index = self.get_index(collection, create=False)
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
         xq = embedding.embed_query(query_texts[0])
         query_response = index.query(
             vector=[xq],
@@ -51,22 +57,17 @@ class Pinecone(VectorStore):
             top_k=num_results,
             include_metadata=True,
         )
-        return query_response.to_dict()["matches"]
+        return [
+            self.add_golden_sql_payload(match, match.get("metadata"))
+            for match in query_response.to_dict()["matches"]
+        ]
 
     @override
     def add_records(self, golden_sqls: List[GoldenSQL], collection: str):
-        if collection not in self.pinecone.list_indexes().names():
-            self.create_collection(collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(
-            str(golden_sqls[0].db_connection_id)
+        index = self.get_index(collection)
+        embedding = self.get_embedding(
+            str(golden_sqls[0].db_connection_id), EMBEDDING_MODEL
         )
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
-        )
-        index = self.pinecone.Index(name=collection)
         batch_limit = 100
         for limit_index in range(0, len(golden_sqls), batch_limit):
             golden_sql_batch = golden_sqls[limit_index : limit_index + batch_limit]
@@ -76,7 +77,7 @@ class Pinecone(VectorStore):
 
             records = []
             for key in range(len(golden_sql_batch)):
-                parsed_tables = Parser(golden_sql_batch[key].sql).tables
+                parsed_tables = get_golden_sql_tables(golden_sql_batch[key])
                 if len(parsed_tables) > 0:
                     records.append(
                         (
@@ -87,6 +88,7 @@ class Pinecone(VectorStore):
                                 "db_connection_id": golden_sql_batch[
                                     key
                                 ].db_connection_id,
+                                **self.golden_sql_payload(golden_sql_batch[key]),
                             },
                         )
                     )
@@ -101,29 +103,21 @@ class Pinecone(VectorStore):
         metadata: Any,
         ids: List,
     ):
-        if collection not in self.pinecone.list_indexes().names():
-            self.create_collection(collection)
-        db_connection_repository = DatabaseConnectionRepository(
-            self.system.instance(DB)
-        )
-        database_connection = db_connection_repository.find_by_id(db_connection_id)
-        embedding = OpenAIEmbeddings(
-            openai_api_key=database_connection.decrypt_api_key(), model=EMBEDDING_MODEL
-        )
-        index = self.pinecone.Index(name=collection)
+        index = self.get_index(collection)
+        embedding = self.get_embedding(db_connection_id, EMBEDDING_MODEL)
         embeds = embedding.embed_documents([documents])
         record = [(ids[0], embeds, metadata[0])]
         index.upsert(vectors=record)
 
     @override
     def delete_record(self, collection: str, id: str):
-        if collection not in self.pinecone.list_indexes().names():
-            self.create_collection(collection)
-        index = self.pinecone.Index(name=collection)
+        index = self.get_index(collection)
         index.delete(ids=[id])
 
     @override
     def delete_collection(self, collection: str):
+        with self.lock:
+            self.indexes.pop(collection, None)
         return self.pinecone.delete_index(name=collection)
 
     @override